@@ -3,15 +3,44 @@ import asyncio
 import uuid
 import time
 import json
+import base64
+import math
+import random
+import re
+import queue
+import hashlib
+import ipaddress
+import concurrent.futures
+import sqlite3
+import threading
+import functools
+import contextlib
+import contextvars
+import hmac
+import sys
+import bisect
+import io
+import mmap
+import tempfile
+import urllib.parse
 import urllib.request
+import socket
 from pathlib import Path
-from flask import Flask, request, jsonify
-from flask_socketio import SocketIO, emit, disconnect
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+import eventlet
+from eventlet import tpool
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask_socketio import SocketIO, emit, disconnect, join_room, leave_room
+import socketio as socketio_server
 from amazon_transcribe.client import TranscribeStreamingClient
+from amazon_transcribe.auth import CredentialResolver, Credentials
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
 from dotenv import load_dotenv
+from audio_processing import AudioConverter, VoiceActivityDetector, TARGET_SAMPLE_RATE, audio_payload
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 
 # Load environment variables with explicit path
 env_path = Path(__file__).parent / '.env'
@@ -33,11 +62,48 @@ print("=" * 50)
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False  # Display Chinese characters properly in JSON
 
+# Multi-worker mode: with REDIS_URL set, workers share a session registry and
+# emit through a Redis message queue, so any worker can reach any client
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Identifies this process in the session registry
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class TpoolRedisManager(socketio_server.RedisManager):
+    """
+    Socket.IO Redis message queue for eventlet without monkey patching.
+
+    The stock RedisManager requires green sockets; here its blocking publish
+    and subscribe calls run in eventlet's thread pool instead.
+    """
+    def initialize(self):
+        # Skip RedisManager's monkey-patch check
+        socketio_server.PubSubManager.initialize(self)
+
+    def _publish(self, data):
+        return tpool.execute(super()._publish, data)
+
+    def _listen(self):
+        channel = self.channel.encode('utf-8')
+        tpool.execute(self.pubsub.subscribe, self.channel)
+        messages = self._redis_listen_with_retries()
+        while True:
+            message = tpool.execute(next, messages)
+            if message['channel'] == channel and message['type'] == 'message' and 'data' in message:
+                yield message['data']
+
+
 # Initialize SocketIO for WebSocket support
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+if REDIS_URL:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet',
+                        client_manager=TpoolRedisManager(REDIS_URL, channel='stt-socketio'))
+else:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
 # S3 client for batch transcription
 import boto3
+from boto3.s3.transfer import TransferConfig
 
 # Build AWS client configuration (supports both permanent and temporary credentials)
 aws_config = {
@@ -59,6 +125,16 @@ S3_BUCKET = os.getenv('S3_BUCKET_NAME')
 # AWS Transcribe client for batch jobs
 transcribe_client = boto3.client('transcribe', **aws_config)
 
+# Multipart transfer tuning for batch uploads: part size and parallel part uploads.
+# Streamed (non-seekable) uploads hold roughly part size x concurrency in memory.
+S3_MULTIPART_CHUNK_MB = int(os.getenv('S3_MULTIPART_CHUNK_MB', 16))
+S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', 4))
+transfer_config = TransferConfig(
+    multipart_threshold=S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+    multipart_chunksize=S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+    max_concurrency=S3_MAX_CONCURRENCY
+)
+
 
 # Helper function to convert S3 URLs to browser-accessible HTTPS URLs
 def s3_to_https_url(s3_url, region=None):
@@ -107,181 +183,3959 @@ SUMMARY_LANGUAGE_MAP = {
     'en': 'English'
 }
 
-# Session management for real-time transcription
-class RealtimeEventHandler(TranscriptResultStreamHandler):
-    """Event handler that emits transcription results via WebSocket"""
-    def __init__(self, transcript_result_stream, session_id):
-        super().__init__(transcript_result_stream)
-        self.session_id = session_id
+# ============================================================================
+# Metrics
+# ============================================================================
 
-    async def handle_transcript_event(self, transcript_event: TranscriptEvent):
-        results = transcript_event.transcript.results
-        for result in results:
-            for alt in result.alternatives:
-                # Emit to the specific client via SocketIO
-                socketio.emit('transcription_result', {
-                    'text': alt.transcript,
-                    'is_partial': result.is_partial
-                }, room=self.session_id)
+# Every metric registers itself here; GET /metrics renders them in the
+# Prometheus text format. Values are per worker process.
+metrics_registry = []
 
+# Histogram bucket bounds (seconds) for quick calls and for uploads / LLM calls
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
 
-class TranscriptionSession:
-    """Manages a real-time transcription session for a WebSocket connection"""
-    def __init__(self, session_id, language_code='en-US'):
-        self.session_id = session_id
-        self.language_code = language_code
-        self.client = None
-        self.stream = None
-        self.handler = None
-        self.is_active = False
-        self.audio_buffer = []  # Buffer to store all audio chunks for S3 upload
-        self.s3_key = None  # S3 key where audio will be saved
-        self.start_timestamp = time.time()  # For organizing files by date
 
-    async def start(self):
-        """Initialize AWS Transcribe streaming session"""
-        self.client = TranscribeStreamingClient(region=os.getenv('AWS_REGION', 'us-east-1'))
-        self.stream = await self.client.start_stream_transcription(
-            language_code=self.language_code,
-            media_sample_rate_hz=16000,
-            media_encoding='pcm',
-        )
-        self.handler = RealtimeEventHandler(self.stream.output_stream, self.session_id)
-        self.is_active = True
+def _label_text(names, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
 
-        # Generate S3 key with date folder structure
-        from datetime import datetime
-        date_folder = datetime.fromtimestamp(self.start_timestamp).strftime('%Y-%m-%d')
-        self.s3_key = f"audio/realtime/{date_folder}/session-{self.session_id}.pcm"
 
-        # Start handling events in background
-        asyncio.create_task(self.handler.handle_events())
+def _label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
 
-    async def send_audio_chunk(self, chunk):
-        """Send audio chunk to AWS Transcribe and buffer for S3"""
-        if self.is_active and self.stream:
-            # Buffer the chunk for later S3 upload
-            self.audio_buffer.append(chunk)
 
-            # Send to AWS Transcribe for real-time transcription
-            await self.stream.input_stream.send_audio_event(audio_chunk=chunk)
+class _Metric:
+    """Named metric with optional labels; one series per distinct label set"""
+    kind = None
 
-    async def save_to_s3(self):
-        """Upload buffered audio to S3"""
-        if not self.audio_buffer:
-            print(f"No audio to save for session {self.session_id}")
-            return None
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values tuple -> series state
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
 
-        if not S3_BUCKET:
-            print(f"S3_BUCKET not configured, skipping audio save for session {self.session_id}")
+    def _key(self, labels):
+        return tuple(_label_value(labels[name]) for name in self.labelnames)
+
+    def remove(self, **labels):
+        """Drop every series matching the given labels (e.g. one session's)"""
+        wanted = {self.labelnames.index(name): _label_value(value) for name, value in labels.items()}
+        with self._lock:
+            for key in [key for key in self._series if all(key[i] == v for i, v in wanted.items())]:
+                del self._series[key]
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = list(self._series.items())
+        for key, state in series:
+            lines.extend(self._expose_series(key, state))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _expose_series(self, key, value):
+        return [f'{self.name}{_label_text(self.labelnames, key)} {value}']
+
+
+class Gauge(_Metric):
+    """Current value, read from `fn` at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, fn):
+        super().__init__(name, documentation)
+        self.fn = fn
+
+    def expose(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}',
+                f'{self.name} {self.fn()}']
+
+
+class Histogram(_Metric):
+    """Thread-safe fixed-bucket histogram (upper bounds in seconds) with count and sum"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (last slot is +Inf), count, sum]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _snapshot(self, labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return (list(series[0]), series[1], series[2]) if series else None
+
+    def quantile(self, q, **labels):
+        """Upper bound of the bucket holding the q-th quantile (None when empty or in +Inf)"""
+        snapshot = self._snapshot(labels)
+        if not snapshot or not snapshot[1]:
             return None
+        counts, count, _ = snapshot
+        target = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return None
+
+    def stats(self, **labels):
+        counts, count, total = self._snapshot(labels) or ([0] * (len(self.buckets) + 1), 0, 0.0)
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets['+Inf'] = count
+        return {
+            'count': count,
+            'avg_seconds': round(total / count, 4) if count else None,
+            'p50_le': self.quantile(0.5, **labels),
+            'p95_le': self.quantile(0.95, **labels),
+            'buckets': buckets
+        }
+
+    def _expose_series(self, key, series):
+        counts, count, total = series
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket_count
+            le = f'le="{bound}"'
+            lines.append(f'{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{_label_text(self.labelnames, key)} {total}')
+        lines.append(f'{self.name}_count{_label_text(self.labelnames, key)} {count}')
+        return lines
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in metrics_registry:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+# Outbound call latency on the batch and summarization paths
+s3_upload_seconds = Histogram('stt_s3_upload_seconds', 'S3 upload duration by path', SLOW_BUCKETS, ['path'])
+transcribe_start_job_seconds = Histogram('stt_transcribe_start_job_seconds', 'start_transcription_job call duration')
+transcribe_get_job_seconds = Histogram('stt_transcribe_get_job_seconds', 'get_transcription_job call duration')
+transcript_fetch_seconds = Histogram('stt_transcript_fetch_seconds', 'Transcript JSON download duration')
+gemini_call_seconds = Histogram('stt_gemini_call_seconds', 'Gemini generate_content duration including retries',
+                                SLOW_BUCKETS, ['call'])
+
+
+# ============================================================================
+# Tracing and Profiling
+# ============================================================================
+
+# Fraction of HTTP requests / WebSocket events traced (0 disables tracing unless
+# the caller sends a sampled W3C traceparent header)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+
+# Finished spans kept in memory for GET /debug/traces
+TRACE_BUFFER_SPANS = int(os.getenv('TRACE_BUFFER_SPANS', 5000))
+
+# Optional OTLP/HTTP collector endpoint (e.g. http://localhost:4318/v1/traces) spans are pushed to
+OTLP_TRACES_ENDPOINT = os.getenv('OTLP_TRACES_ENDPOINT')
 
+# Guards the /debug endpoints and on-demand profiling (both disabled when unset)
+DEBUG_TOKEN = os.getenv('DEBUG_TOKEN')
+
+# Profiler sampling interval, longest a profile may run, and profiles kept in memory
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 300))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 20))
+
+SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+# Span of the code currently running (per greenlet / thread / asyncio task)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed operation of a trace; use as a context manager"""
+    def __init__(self, name, trace_id, parent_id, kind, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = None
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f'{exc_type.__name__}: {exc}'
         try:
-            # Combine all chunks into single audio file
-            complete_audio = b''.join(self.audio_buffer)
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended in another context than it started in (e.g. a streamed response)
+            _current_span.set(None)
+        tracer.record(self)
+        return False
+
+    def otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': SPAN_KINDS[self.kind],
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
 
-            # Upload to S3
-            s3_client.put_object(
-                Bucket=S3_BUCKET,
-                Key=self.s3_key,
-                Body=complete_audio,
-                ContentType='audio/pcm'
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def trace_span(name, kind='internal', **attributes):
+    """Child span of the current span; a shared no-op when the current work is not traced"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+def start_trace(name, traceparent=None, kind='server', **attributes):
+    """
+    Root span for an incoming request or event, or NOOP_SPAN if not sampled.
+
+    A W3C traceparent header with the sampled flag continues the caller's
+    trace regardless of TRACE_SAMPLE_RATE.
+    """
+    match = re.fullmatch(r'[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})', traceparent or '')
+    if match and int(match.group(3), 16) & 1:
+        return Span(name, match.group(1), match.group(2), kind, attributes)
+    if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE:
+        return Span(name, os.urandom(16).hex(), None, kind, attributes)
+    return NOOP_SPAN
+
+
+def run_in_context(fn):
+    """Wrap fn so it runs in the caller's context (keeps the current span across threads)"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time: run each call in its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+class Tracer:
+    """Keeps recently finished spans and optionally pushes them to an OTLP collector"""
+    def __init__(self, max_spans, endpoint=None, export_interval=5.0):
+        self.spans = deque(maxlen=max_spans)
+        self.endpoint = endpoint
+        self.export_interval = export_interval
+        self._unexported = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self.spans_recorded = 0
+        self.spans_exported = 0
+        self.export_errors = 0
+        if endpoint:
+            threading.Thread(target=self._export_loop, name='otlp-exporter', daemon=True).start()
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            self.spans_recorded += 1
+            if self.endpoint:
+                self._unexported.append(span)
+
+    def otlp(self, spans):
+        """OTLP/JSON ExportTraceServiceRequest for the given spans"""
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', 'stt-aws'),
+                                        _otlp_attribute('service.instance.id', WORKER_ID)]},
+            'scopeSpans': [{'scope': {'name': 'stt-aws'}, 'spans': [span.otlp() for span in spans]}]
+        }]}
+
+    def find(self, trace_id=None, limit=None):
+        with self._lock:
+            spans = [span for span in self.spans if trace_id is None or span.trace_id == trace_id]
+        return spans[-limit:] if limit else spans
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.export_interval)
+            with self._lock:
+                batch = list(self._unexported)
+                self._unexported.clear()
+            if not batch:
+                continue
+            export_request = urllib.request.Request(
+                self.endpoint, data=json.dumps(self.otlp(batch)).encode(),
+                headers={'Content-Type': 'application/json'}, method='POST'
             )
+            try:
+                with urllib.request.urlopen(export_request, timeout=10):
+                    pass
+                self.spans_exported += len(batch)
+            except Exception as e:
+                self.export_errors += 1
+                print(f"Could not export {len(batch)} spans to {self.endpoint}: {e}")
+
+    def stats(self):
+        return {
+            'sample_rate': TRACE_SAMPLE_RATE,
+            'spans_buffered': len(self.spans),
+            'spans_recorded': self.spans_recorded,
+            'spans_exported': self.spans_exported,
+            'export_errors': self.export_errors
+        }
 
-            s3_url = f"s3://{S3_BUCKET}/{self.s3_key}"
-            print(f"Audio saved to S3: {s3_url} ({len(complete_audio):,} bytes)")
 
-            return s3_url
+tracer = Tracer(TRACE_BUFFER_SPANS, OTLP_TRACES_ENDPOINT)
 
-        except Exception as e:
-            print(f"Error saving audio to S3: {e}")
-            return None
 
-    async def stop(self):
-        """Close the transcription stream"""
-        if self.is_active and self.stream:
-            await self.stream.input_stream.end_stream()
-            self.is_active = False
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for one greenlet or one OS thread.
+
+    A separate thread snapshots the target's Python stack every interval
+    (the suspended frame of a waiting greenlet, or the thread's running
+    frame) and counts identical stacks. The result is in folded-stack
+    format ("outer;inner;leaf count" per line), readable by flamegraph.pl
+    and speedscope. Waiting shows up as time in the hub switch / tpool
+    calls, which is where eventlet scheduling delays appear.
+    """
+    def __init__(self, profile_id, label, thread_id, target_greenlet=None,
+                 interval=PROFILE_INTERVAL_MS / 1000, max_seconds=PROFILE_MAX_SECONDS):
+        self.profile_id = profile_id
+        self.label = label
+        self.thread_id = thread_id
+        self.target_greenlet = target_greenlet
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples = {}  # folded stack -> count
+        self.sample_count = 0
+        self.started_at = time.time()
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'profiler-{profile_id}', daemon=True)
+
+    @classmethod
+    def for_current(cls, profile_id, label):
+        """Profile the calling greenlet (or thread when not in a greenlet)"""
+        try:
+            import greenlet
+            current = greenlet.getcurrent()
+            target = current if current.parent is not None else None
+        except ImportError:
+            target = None
+        return cls(profile_id, label, threading.get_ident(), target)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _frame(self):
+        if self.target_greenlet is not None:
+            if self.target_greenlet.dead:
+                return None
+            frame = self.target_greenlet.gr_frame
+            if frame is not None:
+                return frame  # Suspended
+        return sys._current_frames().get(self.thread_id)
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = self._frame()
+            if frame is None:
+                if self.target_greenlet is not None and self.target_greenlet.dead:
+                    break
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            folded = ';'.join(reversed(stack))
+            self.samples[folded] = self.samples.get(folded, 0) + 1
+            self.sample_count += 1
+        self.duration = time.time() - self.started_at
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.samples.items()))
+
+    def summary(self):
+        return {
+            'profile_id': self.profile_id,
+            'label': self.label,
+            'started_at': datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            'duration_seconds': round(self.duration, 3) if self.duration is not None else None,
+            'samples': self.sample_count,
+            'interval_ms': self.interval * 1000
+        }
 
-# Global session storage (in production, use Redis or similar)
-active_sessions = {}
+
+# Finished (and running) profiles, oldest first
+profiles = OrderedDict()
+profiles_lock = threading.Lock()
+
+
+def start_profile(label, thread_id=None):
+    """Start profiling the calling greenlet, or an OS thread by ident; returns the profiler"""
+    profile_id = uuid.uuid4().hex[:12]
+    if thread_id is None:
+        profiler = SamplingProfiler.for_current(profile_id, label)
+    else:
+        profiler = SamplingProfiler(profile_id, label, thread_id)
+    with profiles_lock:
+        profiles[profile_id] = profiler
+        while len(profiles) > PROFILE_KEEP:
+            profiles.popitem(last=False)
+    return profiler.start()
+
+
+def traced_event(name):
+    """Decorator: run a Socket.IO handler in a root span (traceparent may be sent in the event data)"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            data = args[0] if args and isinstance(args[0], dict) else {}
+            with start_trace(name, data.get('traceparent'), sid=request.sid):
+                return fn(*args)
+        return wrapper
+    return decorator
+
+
+def debug_token_valid(token):
+    return (bool(DEBUG_TOKEN) and isinstance(token, str)
+            and hmac.compare_digest(token.encode('utf-8'), DEBUG_TOKEN.encode('utf-8')))
+
+
+# Endpoints that are never traced or profiled
+UNTRACED_PATHS = ('/health', '/metrics', '/debug/')
 
 
+@app.before_request
+def begin_request_trace():
+    if request.path.startswith(UNTRACED_PATHS):
+        return
+    rule = request.url_rule.rule if request.url_rule else request.path
+    span = start_trace(f'{request.method} {rule}', request.headers.get('traceparent'),
+                       **{'http.method': request.method, 'http.route': rule})
+    g.trace_span = span.__enter__() if span is not NOOP_SPAN else None
+    # Opt-in profile of this one request: X-Profile: <DEBUG_TOKEN>
+    g.profiler = start_profile(f'{request.method} {request.path}') if debug_token_valid(request.headers.get('X-Profile')) else None
 
 
+@app.after_request
+def annotate_request_trace(response):
+    span = g.get('trace_span')
+    if span:
+        span.set(**{'http.status_code': response.status_code})
+        response.headers['traceparent'] = f'00-{span.trace_id}-{span.span_id}-01'
+    if g.get('profiler'):
+        response.headers['X-Profile-Id'] = g.profiler.profile_id
+    return response
+
+
+@app.teardown_request
+def end_request_trace(exc):
+    # Runs after streamed responses finish, so both cover the whole body
+    if g.get('profiler'):
+        g.profiler.stop()
+    span = g.get('trace_span')
+    if span:
+        span.__exit__(type(exc) if exc else None, exc, None)
+
+
+# ============================================================================
+# Real-Time Session Event Loops
+# ============================================================================
+
+# Number of dedicated asyncio event loop threads that own the real-time
+# transcription sessions. Sessions are sharded across loops by session id.
+REALTIME_LOOP_THREADS = int(os.getenv('REALTIME_LOOP_THREADS', '1'))
+
+# How long stop() waits for the final transcript results after ending the stream
+REALTIME_STOP_TIMEOUT = float(os.getenv('REALTIME_STOP_TIMEOUT', '5'))
+
+# How session audio is archived to S3:
+#   multipart - stream parts to an S3 multipart upload while the session runs
+#   buffer    - keep all audio in memory and upload it once on stop
+REALTIME_UPLOAD_MODE = os.getenv('REALTIME_UPLOAD_MODE', 'multipart')
+
+# Flush a multipart part whenever this much audio has built up (S3 minimum is 5 MB)
+REALTIME_UPLOAD_PART_SIZE = max(int(os.getenv('REALTIME_UPLOAD_PART_SIZE', 5 * 1024 * 1024)), 5 * 1024 * 1024)
+
+# A session's audio buffer spills to a memory-mapped temp file beyond this size
+REALTIME_BUFFER_SPILL_BYTES = int(os.getenv('REALTIME_BUFFER_SPILL_BYTES', 8 * 1024 * 1024))
+
+# Per-process cap on audio held in RAM; buffers spill to disk instead of exceeding it
+REALTIME_MAX_BUFFERED_BYTES = int(os.getenv('REALTIME_MAX_BUFFERED_BYTES', 256 * 1024 * 1024))
+
+# Directory for spilled audio (defaults to the system temp dir)
+REALTIME_SPILL_DIR = os.getenv('REALTIME_SPILL_DIR') or None
+
+# Voice activity detection: skip silence instead of streaming it to Transcribe.
+# REALTIME_VAD is the default; clients can override it with "vad" in start_transcription.
+REALTIME_VAD = os.getenv('REALTIME_VAD', 'false').lower() == 'true'
+REALTIME_VAD_THRESHOLD_DB = float(os.getenv('REALTIME_VAD_THRESHOLD_DB', '-45'))
+REALTIME_VAD_HANGOVER_MS = int(os.getenv('REALTIME_VAD_HANGOVER_MS', '300'))
+REALTIME_VAD_PREROLL_MS = int(os.getenv('REALTIME_VAD_PREROLL_MS', '200'))
+REALTIME_VAD_KEEPALIVE_MS = int(os.getenv('REALTIME_VAD_KEEPALIVE_MS', '1000'))
+
+
+# Coalesce forwarded audio into frames of this duration before send_audio_event (0 disables)
+REALTIME_FRAME_MS = int(os.getenv('REALTIME_FRAME_MS', '100'))
+
+# A partial frame is sent anyway once it has waited this long
+REALTIME_FRAME_MAX_DELAY_MS = int(os.getenv('REALTIME_FRAME_MAX_DELAY_MS', '150'))
+
+# Pace frames at real-time speed, allowing the stream to run at most this far ahead (0 disables pacing)
+REALTIME_PACING_LEAD_MS = int(os.getenv('REALTIME_PACING_LEAD_MS', '500'))
+
+
+# Result emission: at most this many partial results per second per session (0 = no limit)
+REALTIME_PARTIALS_PER_SECOND = float(os.getenv('REALTIME_PARTIALS_PER_SECOND', '5'))
+
+# Default transcription_result format: full (whole text each time) or delta (changed suffix only)
+REALTIME_RESULT_MODE = os.getenv('REALTIME_RESULT_MODE', 'full')
+
+RESULT_MODES = ('full', 'delta')
+
+# Encodings Transcribe Streaming accepts: media_encoding -> (archive file extension, content type).
+# Compressed audio is passed through untouched; only PCM can be converted or run through VAD.
+MEDIA_ENCODINGS = {
+    'pcm': ('pcm', 'audio/pcm'),
+    'flac': ('flac', 'audio/flac'),
+    'ogg-opus': ('ogg', 'audio/ogg'),
+}
+
+# Sample rates Transcribe accepts for compressed input
+COMPRESSED_SAMPLE_RATES = (8000, 48000)
+
+
+# Admission control: max concurrent real-time sessions across all workers (0 = unlimited),
+# and per language as "en-US=50,zh-HK=20" ("*" sets the limit for unlisted languages)
+REALTIME_MAX_SESSIONS = int(os.getenv('REALTIME_MAX_SESSIONS', '0'))
+REALTIME_MAX_SESSIONS_PER_LANGUAGE = {
+    language.strip(): int(limit)
+    for language, _, limit in (
+        item.partition('=') for item in os.getenv('REALTIME_MAX_SESSIONS_PER_LANGUAGE', '').split(',') if '=' in item
+    )
+}
+
+# Suggested wait before a refused client retries (jittered up to 2x)
+REALTIME_BUSY_RETRY_SECONDS = float(os.getenv('REALTIME_BUSY_RETRY_SECONDS', '5'))
+
+# Per-session inbound queue bound, in seconds of client audio (0 = unbounded), and what
+# happens when a client outruns its stream (e.g. catching up after a reconnect):
+#   reject      - refuse the new chunk and tell the client, which can resend later
+#   drop_oldest - skip the oldest queued audio in the transcript (it is still archived)
+#   disconnect  - end the session and disconnect the client
+REALTIME_QUEUE_MAX_SECONDS = float(os.getenv('REALTIME_QUEUE_MAX_SECONDS', '30'))
+REALTIME_QUEUE_OVERFLOW = os.getenv('REALTIME_QUEUE_OVERFLOW', 'reject')
+QUEUE_OVERFLOW_POLICIES = ('drop_oldest', 'reject', 'disconnect')
+if REALTIME_QUEUE_OVERFLOW not in QUEUE_OVERFLOW_POLICIES:
+    raise ValueError(f'REALTIME_QUEUE_OVERFLOW must be one of: {", ".join(QUEUE_OVERFLOW_POLICIES)}')
+
+
+def language_session_limit(language_code):
+    return REALTIME_MAX_SESSIONS_PER_LANGUAGE.get(language_code, REALTIME_MAX_SESSIONS_PER_LANGUAGE.get('*', 0))
+
+
+def new_vad():
+    return VoiceActivityDetector(
+        threshold_db=REALTIME_VAD_THRESHOLD_DB,
+        hangover_ms=REALTIME_VAD_HANGOVER_MS,
+        preroll_ms=REALTIME_VAD_PREROLL_MS,
+        keepalive_ms=REALTIME_VAD_KEEPALIVE_MS
+    )
+
+
+class EventLoopRunner:
+    """Runs one long-lived asyncio event loop in a dedicated OS thread"""
+    def __init__(self, name):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on this loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Schedule a plain callback on this loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+class EventLoopPool:
+    """Fixed set of event loop threads; every session is pinned to one of them"""
+    def __init__(self, size):
+        self.runners = [EventLoopRunner(f'realtime-loop-{i}') for i in range(max(1, size))]
+
+    def runner_for(self, session_id):
+        return self.runners[hash(session_id) % len(self.runners)]
+
+
+loop_pool = EventLoopPool(REALTIME_LOOP_THREADS)
+
+
+def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking call from a request or Socket.IO handler.
+
+    On the eventlet hub thread the call runs in eventlet's native thread pool
+    so the hub keeps serving other clients; elsewhere it is called directly.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+# Longest pause between checks while a hub greenlet waits on another thread's result
+HUB_POLL_MAX_INTERVAL = 0.05
+
+
+def wait_for_result(future, timeout=None):
+    """
+    Wait for a concurrent.futures.Future without blocking the eventlet hub.
+
+    On the hub thread the greenlet polls with eventlet.sleep (backing off to
+    HUB_POLL_MAX_INTERVAL) rather than parking a tpool thread, so any number
+    of queued Gemini calls or session starts cost no pool threads.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return future.result(timeout)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.001
+    while not future.done():
+        if deadline is not None and time.monotonic() >= deadline:
+            raise concurrent.futures.TimeoutError()
+        eventlet.sleep(delay)
+        delay = min(delay * 2, HUB_POLL_MAX_INTERVAL)
+    return future.result()
+
+
+def wait_for_item(items, timeout=None):
+    """
+    queue.Queue.get() for items produced on other threads; polls like
+    wait_for_result on the hub. Raises queue.Empty after timeout seconds.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return items.get(timeout=timeout)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            return items.get_nowait()
+        except queue.Empty:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise
+            eventlet.sleep(delay)
+            delay = min(delay * 2, HUB_POLL_MAX_INTERVAL)
+
+
+# Calls (emits, disconnects) queued from the event loop threads. Socket.IO is
+# not thread-safe under eventlet, so they are executed by a background task
+# running on the server's own hub.
+_socketio_calls = queue.Queue()
+
+
+def call_in_socketio(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the Socket.IO server thread (thread-safe)"""
+    _socketio_calls.put((fn, args, kwargs))
+
+
+def _drain_socketio_calls():
+    while True:
+        # Polled on the hub: a blocking get() through tpool can run inline on the hub
+        # (tpool does that while another thread holds the import lock) and freeze it
+        pending = [wait_for_item(_socketio_calls)]
+        try:
+            while True:
+                pending.append(_socketio_calls.get_nowait())
+        except queue.Empty:
+            pass
+
+        for fn, args, kwargs in pending:
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"Error in queued Socket.IO call {getattr(fn, '__name__', fn)}: {e}")
+
+
+socketio.start_background_task(_drain_socketio_calls)
+
+
+# ============================================================================
+# Transcribe Streaming Clients
+# ============================================================================
+
+# How often the shared streaming clients re-check their connection, and how
+# often cached AWS credentials are re-resolved (seconds)
+TRANSCRIBE_CLIENT_WARM_INTERVAL = float(os.getenv('TRANSCRIBE_CLIENT_WARM_INTERVAL', 60))
+TRANSCRIBE_CREDENTIAL_REFRESH = float(os.getenv('TRANSCRIBE_CREDENTIAL_REFRESH', 300))
+
+
+session_start_seconds = Histogram('stt_realtime_session_start_seconds',
+                                  'Time from start_transcription received to transcription_started sent')
+stream_handshake_seconds = Histogram('stt_realtime_stream_handshake_seconds',
+                                     'start_stream_transcription handshake duration')
+
+
+class CachedCredentialResolver(CredentialResolver):
+    """
+    Serves AWS credentials from memory so starting a stream never waits on
+    credential resolution. Resolved through boto3 (same chain and config as
+    the S3/Transcribe clients) and refreshed in the background.
+    """
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._session = boto3.Session(**aws_config)
+        self._credentials = None
+        self.refreshed_at = None
+        self.refresh_errors = 0
+
+    def refresh(self):
+        frozen = self._session.get_credentials().get_frozen_credentials()
+        self._credentials = Credentials(frozen.access_key, frozen.secret_key, frozen.token)
+        self.refreshed_at = time.time()
+
+    def start(self):
+        threading.Thread(target=self._run, name='transcribe-credentials', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"Could not refresh AWS credentials for streaming: {e}")
+            time.sleep(self.refresh_interval)
+
+    async def get_credentials(self):
+        if self._credentials is None:
+            # Not resolved yet (startup race or failing refresh): resolve now, off the loop
+            await asyncio.get_running_loop().run_in_executor(None, self.refresh)
+        return self._credentials
+
+
+class StreamingClientPool:
+    """
+    One long-lived TranscribeStreamingClient per session event loop.
+
+    A client keeps its HTTP/2 connection to the streaming endpoint open and
+    multiplexes streams over it, so once warmed a session start is just the
+    start_stream_transcription request. A background task on each loop
+    reopens the connection whenever it has been closed.
+
+    The SDK has no public warm-up call, so _warm() uses private internals of
+    amazon-transcribe 0.6.2 (pinned in requirements.txt). If a different
+    version lacks them, pre-warming is switched off and sessions open their
+    connection on first use instead.
+    """
+    def __init__(self, region, credential_resolver, warm_interval):
+        self.region = region
+        self.credential_resolver = credential_resolver
+        self.warm_interval = warm_interval
+        self._clients = {}  # EventLoopRunner name -> client
+        self.warmups = 0
+        self.warm_errors = 0
+        self.prewarm = True
+
+    def start(self, runners):
+        for runner in runners:
+            runner.submit(self._keep_warm(runner))
+
+    def client_for(self, runner):
+        """The runner's shared client (call on that runner's loop)"""
+        client = self._clients.get(runner.name)
+        if client is None:
+            client = TranscribeStreamingClient(region=self.region, credential_resolver=self.credential_resolver)
+            self._clients[runner.name] = client
+        return client
+
+    async def _keep_warm(self, runner):
+        while self.prewarm:
+            try:
+                await self._warm(self.client_for(runner))
+            except AttributeError as e:
+                # The SDK internals moved; every loop would fail the same way
+                if self.prewarm:
+                    self.prewarm = False
+                    print(f"Transcribe client pre-warming disabled: unsupported amazon-transcribe version ({e})")
+                return
+            except Exception as e:
+                self.warm_errors += 1
+                print(f"Could not warm Transcribe streaming connection on {runner.name}: {e}")
+            await asyncio.sleep(self.warm_interval)
+
+    async def _warm(self, client):
+        # Opens (or confirms) the cached HTTP/2 connection; uses the SDK's
+        # session manager directly since the client exposes no warm-up call
+        endpoint = await client._endpoint_resolver.resolve(client.region)
+        await client._session_manager._get_connection(urllib.parse.urlparse(endpoint))
+        self.warmups += 1
+
+    def stats(self):
+        return {
+            'clients': len(self._clients),
+            'warmups': self.warmups,
+            'warm_errors': self.warm_errors,
+            'prewarm': self.prewarm,
+            'credentials_refreshed_at': (utc_iso(datetime.fromtimestamp(self.credential_resolver.refreshed_at, timezone.utc))
+                                         if self.credential_resolver.refreshed_at else None),
+            'credential_refresh_errors': self.credential_resolver.refresh_errors
+        }
+
+
+streaming_credentials = CachedCredentialResolver(TRANSCRIBE_CREDENTIAL_REFRESH)
+streaming_credentials.start()
+streaming_clients = StreamingClientPool(os.getenv('AWS_REGION', 'us-east-1'), streaming_credentials,
+                                        TRANSCRIBE_CLIENT_WARM_INTERVAL)
+streaming_clients.start(loop_pool.runners)
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Read-only, seekable file object over a memoryview (reads never copy the whole buffer)"""
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class AudioBuffer:
+    """
+    Growable byte buffer for session audio.
+
+    Starts as a preallocated bytearray and spills to a memory-mapped temp file
+    once it outgrows REALTIME_BUFFER_SPILL_BYTES, or when the process would
+    exceed REALTIME_MAX_BUFFERED_BYTES of audio in RAM. Chunks are copied in
+    through memoryviews and read back with reader(), so uploads never build a
+    joined copy of the audio.
+
+    Capacity doubles as the buffer fills, but never past max_capacity when one
+    is given (multipart buffers only ever hold one part plus a chunk); beyond
+    it the buffer grows just to what a write needs.
+    """
+    INITIAL_CAPACITY = 256 * 1024  # 8 seconds of 16 kHz mono PCM
+
+    # Process-wide gauges (bytes reserved in RAM / in spill files)
+    _lock = threading.Lock()
+    memory_bytes = 0
+    spilled_bytes = 0
+
+    def __init__(self, capacity=INITIAL_CAPACITY, max_capacity=None):
+        self.size = 0
+        self.max_capacity = max_capacity
+        self._file = None
+        self._mem = None
+        self.capacity = 0
+        if self._reserve_memory(capacity):
+            self._mem = bytearray(capacity)
+            self.capacity = capacity
+        else:
+            self._spill(capacity)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    @classmethod
+    def _reserve_memory(cls, nbytes):
+        with cls._lock:
+            if cls.memory_bytes + nbytes > REALTIME_MAX_BUFFERED_BYTES:
+                return False
+            cls.memory_bytes += nbytes
+            return True
+
+    @classmethod
+    def _adjust(cls, memory=0, spilled=0):
+        with cls._lock:
+            cls.memory_bytes += memory
+            cls.spilled_bytes += spilled
+
+    def write(self, chunk):
+        view = memoryview(chunk).cast('B')
+        end = self.size + len(view)
+        if end > self.capacity:
+            self._grow(end)
+        self._mem[self.size:end] = view
+        self.size = end
+
+    def _grow(self, needed):
+        doubled = self.capacity * 2
+        if self.max_capacity:
+            doubled = min(doubled, self.max_capacity)
+        capacity = max(needed, doubled)
+
+        if self.spilled:
+            self._mem.close()
+            self._file.truncate(capacity)
+            self._mem = mmap.mmap(self._file.fileno(), capacity)
+            self._adjust(spilled=capacity - self.capacity)
+            self.capacity = capacity
+            return
+
+        if capacity <= REALTIME_BUFFER_SPILL_BYTES and self._reserve_memory(capacity - self.capacity):
+            grown = bytearray(capacity)
+            grown[:self.size] = memoryview(self._mem)[:self.size]
+            self._mem = grown
+            self.capacity = capacity
+        else:
+            self._spill(capacity)
+
+    def _spill(self, capacity):
+        """Move the buffer into a memory-mapped temp file of the given capacity"""
+        self._file = tempfile.TemporaryFile(prefix='audio-', dir=REALTIME_SPILL_DIR)
+        self._file.truncate(capacity)
+        mapped = mmap.mmap(self._file.fileno(), capacity)
+        if self.size:
+            mapped[:self.size] = memoryview(self._mem)[:self.size]
+
+        self._adjust(memory=-self.capacity, spilled=capacity)
+        self._mem = mapped
+        self.capacity = capacity
+
+    def reader(self):
+        """File object over the buffered bytes; close it before writing to the buffer again"""
+        return MemoryViewReader(memoryview(self._mem)[:self.size])
+
+    def clear(self):
+        self.size = 0
+
+    def close(self):
+        if self._mem is None:
+            return
+        if self.spilled:
+            self._mem.close()
+            self._file.close()
+            self._adjust(spilled=-self.capacity)
+        else:
+            self._adjust(memory=-self.capacity)
+        self._mem = None
+        self._file = None
+        self.capacity = 0
+        self.size = 0
+
+
+class S3MultipartUpload:
+    """
+    Incrementally uploads a byte stream to S3 as a multipart upload.
+
+    All methods are blocking boto3 calls; callers on an event loop should run
+    them in an executor. Parts must be uploaded one at a time, in order.
+    """
+    def __init__(self, bucket, key, content_type):
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.upload_id = None
+        self.parts = []
+        self.bytes_uploaded = 0
+
+    def start(self):
+        response = s3_client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            ContentType=self.content_type
+        )
+        self.upload_id = response['UploadId']
+
+    def upload_part(self, body, size):
+        part_number = len(self.parts) + 1
+        with s3_upload_seconds.time(path='realtime_part'):
+            response = s3_client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                PartNumber=part_number,
+                Body=body,
+                ContentLength=size
+            )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        self.bytes_uploaded += size
+
+    def complete(self):
+        s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+
+    def abort(self):
+        s3_client.abort_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id
+        )
+
+
+class ChunkQueue:
+    """
+    Bounded queue of audio chunks from the Socket.IO handlers (any thread)
+    to a session's event loop, limited by queued bytes.
+
+    put() never blocks: when the queue is full the overflow policy either
+    refuses the new chunk or evicts the oldest ones. Evicted chunks are not
+    discarded: get() hands them to the consumer (oldest first, ahead of the
+    next item) so they can still be archived. The consumer is woken across
+    threads only when it is actually waiting. A None sentinel is always
+    accepted, as is a single chunk larger than the whole bound.
+    """
+    def __init__(self, loop, max_bytes, overflow):
+        self._loop = loop
+        self._items = deque()  # (item, size)
+        self._evicted = []
+        self._lock = threading.Lock()
+        self._waiter = None
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.bytes = 0
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.max_bytes_queued = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item, size=0):
+        """Queue an item of `size` bytes; returns False if it was refused"""
+        with self._lock:
+            if item is not None and self.max_bytes and self._items and self.bytes + size > self.max_bytes:
+                if self.overflow != 'drop_oldest':
+                    self.rejected += 1
+                    return False
+                while self._items and self.bytes + size > self.max_bytes and self._items[0][0] is not None:
+                    evicted, evicted_size = self._items.popleft()
+                    self._evicted.append(evicted)
+                    self.bytes -= evicted_size
+                    self.dropped += 1
+            self._items.append((item, size))
+            self.bytes += size
+            if item is not None:
+                self.enqueued += 1
+                self.max_depth = max(self.max_depth, len(self._items))
+                self.max_bytes_queued = max(self.max_bytes_queued, self.bytes)
+            waiter, self._waiter = self._waiter, None
+
+        if waiter:
+            self._loop.call_soon_threadsafe(self._wake, waiter)
+        return True
+
+    @staticmethod
+    def _wake(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def get(self):
+        """Returns (evicted, item): the next item plus older items evicted since the last call"""
+        while True:
+            with self._lock:
+                if self._items:
+                    evicted, self._evicted = self._evicted, []
+                    item, size = self._items.popleft()
+                    self.bytes -= size
+                    return evicted, item
+                self._waiter = waiter = self._loop.create_future()
+            await waiter
+
+    def stats(self):
+        return {
+            'depth': len(self._items),
+            'max_depth': self.max_depth,
+            'bytes': self.bytes,
+            'max_bytes_queued': self.max_bytes_queued,
+            'capacity_bytes': self.max_bytes,
+            'overflow': self.overflow,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'rejected': self.rejected
+        }
+
+
+class AudioRechunker:
+    """
+    Coalesces 16 kHz mono PCM into fixed-duration frames for send_audio_event.
+
+    A partial frame is flushed once it has waited `max_delay_ms`, so latency
+    stays bounded when the client pauses. With `lead_ms` set, output is paced
+    at real-time speed: a burst of backlogged audio is sent no further than
+    `lead_ms` ahead of the wall clock. Runs on the session's event loop.
+    """
+    def __init__(self, send, frame_ms=100, max_delay_ms=150, lead_ms=500):
+        self._send = send
+        self.frame_bytes = TARGET_SAMPLE_RATE * 2 * frame_ms // 1000
+        self.max_delay = max_delay_ms / 1000
+        self.lead = lead_ms / 1000
+        self._pending = bytearray()
+        self._pending_since = None
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._error = None
+        self._next_due = None  # Wall-clock time the next frame would start playing
+
+        self.frames_in = 0
+        self.frames_out = 0
+        self.timer_flushes = 0
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+        self.pacing_wait_total = 0.0
+
+    async def write(self, chunk):
+        """Add forwarded audio; whole frames are sent before this returns"""
+        if self._error:
+            raise self._error
+
+        self.frames_in += 1
+        async with self._lock:
+            if not self._pending and len(chunk) == self.frame_bytes:
+                # Already frame-sized: send the client's buffer as-is
+                await self._emit(chunk, time.monotonic())
+                return
+
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending += chunk
+
+            while len(self._pending) >= self.frame_bytes:
+                frame = bytes(self._pending[:self.frame_bytes])
+                del self._pending[:self.frame_bytes]
+                await self._emit(frame, self._pending_since)
+                self._pending_since = time.monotonic() if self._pending else None
+
+        if self._pending and not self._timer:
+            self._timer = asyncio.ensure_future(self._flush_when_stale())
+
+    async def _emit(self, frame, since):
+        if self.lead:
+            now = time.monotonic()
+            if self._next_due is None or self._next_due < now:
+                self._next_due = now
+            wait = self._next_due - now - self.lead
+            if wait > 0:
+                await asyncio.sleep(wait)
+                self.pacing_wait_total += wait
+            self._next_due += len(frame) / (TARGET_SAMPLE_RATE * 2)
+
+        await self._send(frame)
+
+        delay = time.monotonic() - since
+        self.frames_out += 1
+        self.delay_total += delay
+        self.delay_max = max(self.delay_max, delay)
+
+    async def _flush_when_stale(self):
+        try:
+            while self._pending:
+                wait = self._pending_since + self.max_delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                async with self._lock:
+                    if self._pending and time.monotonic() - self._pending_since >= self.max_delay:
+                        self.timer_flushes += 1
+                        await self._emit_pending()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Surfaces on the next write
+            self._error = e
+        finally:
+            if self._timer is asyncio.current_task():
+                self._timer = None
+
+    async def _emit_pending(self):
+        frame = bytes(self._pending)
+        self._pending.clear()
+        since, self._pending_since = self._pending_since, None
+        await self._emit(frame, since)
+
+    async def flush(self):
+        """Send any partial frame and stop the flush timer"""
+        self.cancel()
+        async with self._lock:
+            if self._pending:
+                await self._emit_pending()
+
+    def cancel(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self):
+        return {
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'timer_flushes': self.timer_flushes,
+            'avg_delay_ms': round(self.delay_total / self.frames_out * 1000, 1) if self.frames_out else 0.0,
+            'max_delay_ms': round(self.delay_max * 1000, 1),
+            'pacing_wait_seconds': round(self.pacing_wait_total, 3)
+        }
+
+
+# Session management for real-time transcription
+class RealtimeEventHandler(TranscriptResultStreamHandler):
+    """
+    Event handler that emits transcription results via WebSocket.
+
+    Only the top alternative is sent. Finals go out immediately; partials
+    are rate-limited to `partials_per_second` with the latest text per
+    result winning, and unchanged partials are skipped. In delta mode a
+    partial carries only the text after `offset` characters of the
+    previous one for the same result_id.
+    """
+    def __init__(self, transcript_result_stream, session_id, partials_per_second=0.0, result_mode='full'):
+        super().__init__(transcript_result_stream)
+        self.session_id = session_id
+        self.partial_interval = 1.0 / partials_per_second if partials_per_second > 0 else 0.0
+        self.delta = result_mode == 'delta'
+        self._pending_partials = {}  # result_id -> latest partial text not yet emitted
+        self._emitted_text = {}  # result_id -> text the client currently has
+        self._last_partial_emit = 0.0
+        self._flush_handle = None
+
+        self.alternatives_received = 0
+        self.partials_received = 0
+        self.partials_emitted = 0
+        self.partials_skipped = 0
+        self.finals_emitted = 0
+        self.text_chars_emitted = 0
+        self.started_at = time.monotonic()
+        self.first_audio_at = None  # Set when the first audio chunk arrives
+        self.first_result_seconds = None
+
+    async def handle_transcript_event(self, transcript_event: TranscriptEvent):
+        results = transcript_event.transcript.results
+        for result in results:
+            if not result.alternatives:
+                continue
+            self.alternatives_received += len(result.alternatives)
+            text = result.alternatives[0].transcript
+
+            if not result.is_partial:
+                self._pending_partials.pop(result.result_id, None)
+                self._emit(result.result_id, text, is_partial=False)
+                continue
+
+            self.partials_received += 1
+            if result.result_id in self._pending_partials:
+                self.partials_skipped += 1
+            self._pending_partials[result.result_id] = text
+
+        self._schedule_partials()
+
+    def _schedule_partials(self):
+        if not self._pending_partials or self._flush_handle:
+            return
+        wait = self._last_partial_emit + self.partial_interval - time.monotonic()
+        if wait <= 0:
+            self._flush_partials()
+        else:
+            self._flush_handle = asyncio.get_running_loop().call_later(wait, self._flush_partials)
+
+    def _flush_partials(self):
+        self._flush_handle = None
+        pending, self._pending_partials = self._pending_partials, {}
+        emitted = False
+        for result_id, text in pending.items():
+            emitted = self._emit(result_id, text, is_partial=True) or emitted
+        if emitted:
+            self._last_partial_emit = time.monotonic()
+
+    def _emit(self, result_id, text, is_partial):
+        previous = self._emitted_text.get(result_id, '')
+        if is_partial and text == previous:
+            self.partials_skipped += 1
+            return False
+
+        payload = {'result_id': result_id, 'is_partial': is_partial}
+        if self.delta:
+            # Finals always carry the whole text so clients can resync
+            offset = len(os.path.commonprefix([previous, text])) if is_partial else 0
+            payload['offset'] = offset
+            payload['text'] = text[offset:]
+        else:
+            payload['text'] = text
+
+        if is_partial:
+            self._emitted_text[result_id] = text
+            self.partials_emitted += 1
+        else:
+            self._emitted_text.pop(result_id, None)
+            self.finals_emitted += 1
+        self.text_chars_emitted += len(payload['text'])
+        if self.first_result_seconds is None and self.first_audio_at is not None:
+            self.first_result_seconds = time.monotonic() - self.first_audio_at
+            first_result_seconds.observe(self.first_result_seconds)
+
+        # Emit to the specific client via SocketIO
+        call_in_socketio(socketio.emit, 'transcription_result', payload, room=self.session_id)
+        return True
+
+    def close(self):
+        """Send any partial still waiting on the rate limit"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        self._flush_partials()
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        emitted = self.partials_emitted + self.finals_emitted
+        return {
+            'result_mode': 'delta' if self.delta else 'full',
+            'alternatives_received': self.alternatives_received,
+            'partials_received': self.partials_received,
+            'partials_emitted': self.partials_emitted,
+            'partials_skipped': self.partials_skipped,
+            'finals_emitted': self.finals_emitted,
+            'text_chars_emitted': self.text_chars_emitted,
+            'emits_per_second': round(emitted / elapsed, 2),
+            'emits_saved_per_second': round((self.alternatives_received - emitted) / elapsed, 2),
+            'first_result_ms': round(self.first_result_seconds * 1000, 1) if self.first_result_seconds is not None else None
+        }
+
+
+class TranscriptionSession:
+    """Manages a real-time transcription session for a WebSocket connection"""
+    def __init__(self, session_id, language_code='en-US', runner=None, converter=None, vad=None,
+                 result_mode=REALTIME_RESULT_MODE, media_encoding='pcm', media_sample_rate=TARGET_SAMPLE_RATE):
+        self.session_id = session_id
+        self.language_code = language_code
+        self.runner = runner  # EventLoopRunner that owns this session
+        self.converter = converter  # AudioConverter when the client does not send 16 kHz mono s16
+        self.vad = vad  # VoiceActivityDetector; silence is archived but not sent to Transcribe
+        self.rechunker = None  # AudioRechunker between VAD and send_audio_event
+        self.result_mode = result_mode  # full or delta transcription_result payloads
+        self.media_encoding = media_encoding  # pcm, or flac / ogg-opus passed through as-is
+        self.media_sample_rate = media_sample_rate  # Sample rate of the audio sent to Transcribe
+        self.content_type = MEDIA_ENCODINGS[media_encoding][1]
+        self.client = None
+        self.stream = None
+        self.handler = None
+        self.is_active = False
+        self.audio_buffer = None  # AudioBuffer with audio not yet uploaded to S3
+        self._uploading_buffer = None  # AudioBuffer of the part currently being uploaded
+        self._spare_buffer = None  # Recycled AudioBuffer for the next part
+        self.s3_key = None  # S3 key where audio will be saved
+        self.upload = None  # S3MultipartUpload when streaming audio to S3
+        self._part_task = None  # In-flight multipart part upload
+        self.archive_failed = False  # Set when a part upload fails; audio is no longer archived
+        self.start_timestamp = time.time()  # For organizing files by date
+
+        # Chunk forwarding pipeline (lives on the runner's event loop)
+        self._chunk_queue = None
+        self._pump_task = None
+        self._handler_task = None
+
+        # Forwarding latency: time from handler receipt to send_audio_event completion
+        self.chunks_forwarded = 0
+        self.forward_latency_total = 0.0
+        self.forward_latency_max = 0.0
+
+        # Time spent converting client audio to 16 kHz mono PCM
+        self.convert_seconds = 0.0
+
+        # Chunks received per payload encoding
+        self.chunks_received = {'binary': 0, 'base64': 0}
+        self.overflowing = False  # Chunk queue currently refusing chunks (reject policy)
+
+        # Session start latency (stream handshake, and start_transcription to transcription_started)
+        self.handshake_seconds = None
+        self.start_seconds = None
+
+        self.profiler = None  # SamplingProfiler when the client asked for a profile
+
+    async def start(self):
+        """Initialize AWS Transcribe streaming session"""
+        # Shared, pre-warmed client for this loop: only the stream handshake happens here
+        self.client = streaming_clients.client_for(self.runner)
+        handshake_start = time.monotonic()
+        self.stream = await self.client.start_stream_transcription(
+            language_code=self.language_code,
+            media_sample_rate_hz=self.media_sample_rate,
+            media_encoding=self.media_encoding,
+        )
+        self.handshake_seconds = time.monotonic() - handshake_start
+        stream_handshake_seconds.observe(self.handshake_seconds)
+        try:
+            await self._setup()
+        except BaseException:
+            # Not active yet, so stop() would leave the stream and the upload open
+            try:
+                await self.stream.input_stream.end_stream()
+            finally:
+                await self._abort_upload()
+                self._release_buffers()
+            raise
+        # Only now can audio_chunk handlers enqueue: the queue and archive exist
+        self.is_active = True
+
+    async def _setup(self):
+        """Everything start() needs once the stream is open: result handler, archive, queue and pump"""
+        self.handler = RealtimeEventHandler(
+            self.stream.output_stream, self.session_id,
+            partials_per_second=REALTIME_PARTIALS_PER_SECOND,
+            result_mode=self.result_mode
+        )
+
+        # Generate S3 key with date folder structure
+        date_folder = datetime.fromtimestamp(self.start_timestamp).strftime('%Y-%m-%d')
+        extension = MEDIA_ENCODINGS[self.media_encoding][0]
+        self.s3_key = f"audio/realtime/{date_folder}/session-{self.session_id}.{extension}"
+
+        # Stream audio to S3 while the session runs (falls back to buffering on failure)
+        if REALTIME_UPLOAD_MODE == 'multipart' and S3_BUCKET:
+            upload = S3MultipartUpload(S3_BUCKET, self.s3_key, self.content_type)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, upload.start)
+                self.upload = upload
+            except Exception as e:
+                print(f"Could not start multipart upload for session {self.session_id}, buffering instead: {e}")
+        self.audio_buffer = self._new_buffer()
+
+        # Coalesce small client chunks into fixed frames, paced at real time (PCM only:
+        # compressed frames have no fixed byte rate to pace against)
+        if REALTIME_FRAME_MS > 0 and self.media_encoding == 'pcm':
+            self.rechunker = AudioRechunker(
+                self._send_audio_event,
+                frame_ms=REALTIME_FRAME_MS,
+                max_delay_ms=REALTIME_FRAME_MAX_DELAY_MS,
+                lead_ms=REALTIME_PACING_LEAD_MS
+            )
+
+        # Handle results and forward queued chunks in background on this loop
+        self._chunk_queue = ChunkQueue(asyncio.get_running_loop(),
+                                       int(REALTIME_QUEUE_MAX_SECONDS * self.input_bytes_per_second),
+                                       REALTIME_QUEUE_OVERFLOW)
+        self._handler_task = asyncio.create_task(self._handle_results())
+        self._pump_task = asyncio.create_task(self._pump_audio())
+
+    def enqueue_audio_chunk(self, chunk):
+        """
+        Hand an audio chunk to the session's event loop without waiting
+        (thread-safe); returns False if the full queue refused it
+        """
+        return self._chunk_queue.put((time.monotonic(), chunk), len(chunk))
+
+    @property
+    def input_bytes_per_second(self):
+        """Client audio byte rate (for compressed input, the PCM rate: an upper bound)"""
+        if self.converter:
+            return self.converter.sample_rate * self.converter.frame_size
+        return self.media_sample_rate * 2
+
+    def _convert(self, chunk):
+        if self.converter:
+            convert_start = time.perf_counter()
+            chunk = self.converter.convert(chunk)
+            self.convert_seconds += time.perf_counter() - convert_start
+        return chunk
+
+    async def _pump_audio(self):
+        """Forward queued chunks to AWS Transcribe in arrival order"""
+        while True:
+            evicted, item = await self._chunk_queue.get()
+            # Overflowed audio skips Transcribe but stays in the archive (and converter state stays continuous)
+            for _, chunk in evicted:
+                try:
+                    chunk = self._convert(chunk)
+                    if chunk and self.is_active:
+                        await self._archive_chunk(chunk)
+                except Exception as e:
+                    print(f"Error archiving dropped audio for session {self.session_id}: {e}")
+
+            if item is None:
+                break
+
+            received_at, chunk = item
+            try:
+                chunk = self._convert(chunk)
+                if not chunk:
+                    continue
+
+                await self.send_audio_chunk(chunk)
+            except Exception as e:
+                print(f"Error forwarding audio for session {self.session_id}: {e}")
+                self.is_active = False
+                call_in_socketio(socketio.emit, 'error', {
+                    'message': f'Failed to process audio chunk: {str(e)}'
+                }, room=self.session_id)
+                break
+
+            latency = time.monotonic() - received_at
+            self.chunks_forwarded += 1
+            self.forward_latency_total += latency
+            self.forward_latency_max = max(self.forward_latency_max, latency)
+
+    async def _handle_results(self):
+        """Consume the transcript result stream, reporting stream errors to the client"""
+        try:
+            await self.handler.handle_events()
+            self.handler.close()
+        except Exception as e:
+            print(f"Transcript stream error for session {self.session_id}: {e}")
+            self.is_active = False
+            call_in_socketio(socketio.emit, 'error', {
+                'message': f'Transcription stream error: {str(e)}'
+            }, room=self.session_id)
+
+    async def send_audio_chunk(self, chunk):
+        """Send audio chunk to AWS Transcribe and archive it for S3"""
+        if self.is_active and self.stream:
+            # Archive the chunk (buffered, or flushed to S3 part by part)
+            await self._archive_chunk(chunk)
+
+            # Only speech (plus keep-alives) goes to Transcribe when VAD is on
+            if self.vad:
+                chunk = self.vad.process(chunk)
+                if not chunk:
+                    return
+
+            # Send to AWS Transcribe for real-time transcription
+            if self.rechunker:
+                await self.rechunker.write(chunk)
+            else:
+                await self._send_audio_event(chunk)
+
+    async def _send_audio_event(self, chunk):
+        await self.stream.input_stream.send_audio_event(audio_chunk=chunk)
+
+    async def _archive_chunk(self, chunk):
+        if self.archive_failed:
+            return
+
+        self.audio_buffer.write(chunk)
+
+        if self.upload and self.audio_buffer.size >= REALTIME_UPLOAD_PART_SIZE:
+            await self._flush_part()
+
+    @property
+    def bytes_held(self):
+        """Audio bytes this session currently holds in its buffers"""
+        return sum(len(buffer) for buffer in (self.audio_buffer, self._uploading_buffer) if buffer is not None)
+
+    def _new_buffer(self):
+        if self.upload:
+            # Flushed at REALTIME_UPLOAD_PART_SIZE: room for one part plus the chunk that crosses it
+            return AudioBuffer(max_capacity=REALTIME_UPLOAD_PART_SIZE + AudioBuffer.INITIAL_CAPACITY)
+        return AudioBuffer()
+
+    async def _flush_part(self):
+        """Hand the buffered audio to a background part upload"""
+        # Keep at most one part in flight so memory per session stays bounded
+        if self._part_task:
+            await self._part_task
+
+        if self.archive_failed:
+            self.audio_buffer.clear()
+            return
+
+        # Swap buffers: new audio goes to the recycled buffer while the full one uploads.
+        # (AudioBuffer has __len__, so an empty buffer is falsy: compare with None.)
+        self._uploading_buffer = self.audio_buffer
+        self.audio_buffer = self._spare_buffer if self._spare_buffer is not None else self._new_buffer()
+        self._spare_buffer = None
+        self._part_task = asyncio.ensure_future(self._upload_part(self._uploading_buffer))
+
+    async def _upload_part(self, buffer):
+        loop = asyncio.get_running_loop()
+        reader = buffer.reader()
+        try:
+            await loop.run_in_executor(None, self.upload.upload_part, reader, buffer.size)
+        except Exception as e:
+            print(f"Error uploading audio part for session {self.session_id}, abandoning S3 archive: {e}")
+            self.archive_failed = True
+            await self._abort_upload()
+        finally:
+            reader.close()
+            buffer.clear()
+            self._uploading_buffer = None
+            if self._spare_buffer is not None and self._spare_buffer is not buffer:
+                self._spare_buffer.close()
+            # Recycle the buffer for the next part only while RAM is plentiful; an idle
+            # spare costs a full part per session, so under pressure it is given back
+            if not buffer.spilled and AudioBuffer.memory_bytes <= REALTIME_MAX_BUFFERED_BYTES // 2:
+                self._spare_buffer = buffer
+            else:
+                buffer.close()
+                self._spare_buffer = None
+
+    async def _abort_upload(self):
+        upload, self.upload = self.upload, None
+        if upload:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, upload.abort)
+            except Exception as e:
+                print(f"Error aborting multipart upload for session {self.session_id}: {e}")
+
+    def _release_buffers(self):
+        for buffer in (self.audio_buffer, self._uploading_buffer, self._spare_buffer):
+            if buffer is not None:
+                buffer.close()
+        self.audio_buffer = self._uploading_buffer = self._spare_buffer = None
+
+    async def save_to_s3(self):
+        """Finish archiving the session audio to S3 and return its s3:// URL"""
+        try:
+            with session_save_seconds.time():
+                if self.upload or self._part_task:
+                    return await self._complete_upload()
+                return await self._put_buffered_audio()
+        finally:
+            self._release_buffers()
+
+    async def _put_buffered_audio(self):
+        """Upload the whole buffer in one go (buffer mode)"""
+        if self.archive_failed:
+            return None
+
+        if self.audio_buffer is None or not self.audio_buffer.size:
+            print(f"No audio to save for session {self.session_id}")
+            return None
+
+        if not S3_BUCKET:
+            print(f"S3_BUCKET not configured, skipping audio save for session {self.session_id}")
+            return None
+
+        reader = self.audio_buffer.reader()
+        try:
+            # Upload straight from the buffer (or its mapped file) off the event loop
+            with s3_upload_seconds.time(path='realtime'):
+                await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                    s3_client.upload_fileobj,
+                    reader,
+                    S3_BUCKET,
+                    self.s3_key,
+                    ExtraArgs={'ContentType': self.content_type}
+                ))
+
+            s3_url = f"s3://{S3_BUCKET}/{self.s3_key}"
+            print(f"Audio saved to S3: {s3_url} ({self.audio_buffer.size:,} bytes)")
+
+            return s3_url
+
+        except Exception as e:
+            print(f"Error saving audio to S3: {e}")
+            return None
+        finally:
+            reader.close()
+
+    async def _complete_upload(self):
+        """Upload the final (possibly short) part and complete the multipart upload"""
+        if self._part_task:
+            await self._part_task
+            self._part_task = None
+
+        if self.upload and self.audio_buffer.size:
+            await self._flush_part()
+            await self._part_task
+            self._part_task = None
+
+        upload = self.upload
+        if not upload:
+            return None
+
+        if not upload.parts:
+            print(f"No audio to save for session {self.session_id}")
+            await self._abort_upload()
+            return None
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, upload.complete)
+        except Exception as e:
+            print(f"Error completing multipart upload: {e}")
+            await self._abort_upload()
+            return None
+
+        self.upload = None
+        s3_url = f"s3://{S3_BUCKET}/{self.s3_key}"
+        print(f"Audio saved to S3: {s3_url} ({upload.bytes_uploaded:,} bytes in {len(upload.parts)} parts)")
+        return s3_url
+
+    async def discard_audio(self):
+        """Drop archived audio without saving it (abandons any multipart upload)"""
+        if self._part_task:
+            await self._part_task
+            self._part_task = None
+        await self._abort_upload()
+        self._release_buffers()
+
+    async def stop(self):
+        """Drain queued audio, close the transcription stream and wait for final results"""
+        if self._pump_task:
+            self._chunk_queue.put(None)
+            await self._pump_task
+            self._pump_task = None
+
+        if self.is_active and self.stream:
+            if self.rechunker:
+                try:
+                    await self.rechunker.flush()
+                except Exception as e:
+                    print(f"Error flushing final audio for session {self.session_id}: {e}")
+            await self.stream.input_stream.end_stream()
+            self.is_active = False
+        elif self.rechunker:
+            self.rechunker.cancel()
+
+        if self._handler_task:
+            try:
+                await asyncio.wait_for(self._handler_task, timeout=REALTIME_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"Timed out waiting for final results for session {self.session_id}")
+            self._handler_task = None
+
+        if self.chunks_forwarded:
+            print(f"Session {self.session_id}: forwarded {self.chunks_forwarded} chunks, "
+                  f"avg latency {self.forward_latency_total / self.chunks_forwarded * 1000:.1f}ms, "
+                  f"max {self.forward_latency_max * 1000:.1f}ms")
+
+        if self.handler and self.handler.alternatives_received:
+            stats = self.handler.stats()
+            print(f"Session {self.session_id}: emitted {stats['partials_emitted']} partials and "
+                  f"{stats['finals_emitted']} finals for {stats['alternatives_received']} results received")
+
+# Sessions owned by this worker (the cluster-wide view is session_registry)
+active_sessions = {}
+
+# Real-time metrics; per-session series are dropped when the session is released
+first_result_seconds = Histogram('stt_realtime_first_result_seconds',
+                                 'Time from first audio chunk to first transcription_result (normally a partial)')
+session_save_seconds = Histogram('stt_realtime_save_seconds', 'save_to_s3 duration at session stop', SLOW_BUCKETS)
+realtime_chunks_received = Counter('stt_realtime_chunks_received_total', 'Audio chunks received',
+                                   ['session_id', 'encoding'])
+realtime_bytes_received = Counter('stt_realtime_audio_bytes_received_total', 'Audio bytes received', ['session_id'])
+Gauge('stt_realtime_active_sessions', 'Real-time sessions owned by this worker', lambda: len(active_sessions))
+Gauge('stt_realtime_queued_chunks', 'Chunks waiting to be forwarded to Transcribe',
+      lambda: sum(len(session._chunk_queue) for session in list(active_sessions.values()) if session._chunk_queue))
+Gauge('stt_realtime_audio_memory_bytes', 'Session audio held in RAM', lambda: AudioBuffer.memory_bytes)
+Gauge('stt_realtime_audio_spilled_bytes', 'Session audio spilled to disk', lambda: AudioBuffer.spilled_bytes)
+
+
+# ============================================================================
+# Session Registry (multi-worker)
+# ============================================================================
+
+# Workers refresh a heartbeat this often; one missing for WORKER_TTL seconds is considered dead
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv('WORKER_HEARTBEAT_INTERVAL', 5))
+WORKER_TTL = float(os.getenv('WORKER_TTL', 20))
+
+
+class LocalSessionRegistry:
+    """Single-process registry: every session lives in this worker"""
+    mode = 'local'
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.reaped_sessions = 0
+
+    def register(self, sid, max_sessions=0, max_language_sessions=0, **info):
+        """
+        Record a session unless that would exceed the limits (0 = unlimited).
+        Returns None on success, or 'global' / 'language' for the limit hit.
+        Registering a sid again replaces its entry and reuses its slots.
+        """
+        with self._lock:
+            previous = self._sessions.get(sid)
+            if previous is None and max_sessions and len(self._sessions) >= max_sessions:
+                return 'global'
+            language = info.get('language_code')
+            if (max_language_sessions and (previous is None or previous.get('language_code') != language)
+                    and self.language_counts().get(language, 0) >= max_language_sessions):
+                return 'language'
+            self._sessions[sid] = {'worker': self.worker_id, 'started_at': time.time(), **info}
+            return None
+
+    def update(self, sid, **info):
+        if sid in self._sessions:
+            self._sessions[sid].update(info)
+
+    def unregister(self, sid):
+        self._sessions.pop(sid, None)
+
+    def language_counts(self):
+        counts = {}
+        for info in list(self._sessions.values()):
+            language = info.get('language_code')
+            counts[language] = counts.get(language, 0) + 1
+        return counts
+
+    def owner(self, sid):
+        info = self._sessions.get(sid)
+        return info['worker'] if info else None
+
+    def count(self):
+        return len(self._sessions)
+
+    def heartbeat(self):
+        pass
+
+    def reap(self):
+        return []
+
+    def forget_worker_sessions(self):
+        return []
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'worker_id': self.worker_id,
+            'workers': 1,
+            'cluster_sessions': self.count(),
+            'language_sessions': self.language_counts(),
+            'reaped_sessions': self.reaped_sessions
+        }
+
+
+class RedisSessionRegistry(LocalSessionRegistry):
+    """
+    Registry shared by all workers through Redis.
+
+    Keys (prefix stt:): session:<sid> hash with the owning worker and
+    session details; sessions set of all sids; languages hash of session
+    counts per language; worker:<id>:sessions set per worker;
+    worker:<id>:alive heartbeat with a TTL; workers set of known workers.
+    reap() removes the sessions of workers whose heartbeat expired.
+    """
+    mode = 'redis'
+
+    def __init__(self, url, worker_id, ttl, prefix='stt:'):
+        import redis
+        super().__init__(worker_id)
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return self.prefix + ':'.join(parts)
+
+    def register(self, sid, max_sessions=0, max_language_sessions=0, **info):
+        fields = {'worker': self.worker_id, 'started_at': time.time(), **info}
+        language = info.get('language_code')
+        session_key = self._key('session', sid)
+        sessions_key, languages_key = self._key('sessions'), self._key('languages')
+
+        def admit(pipe):
+            # Counts are read under WATCH, so concurrent registrations retry instead of overshooting.
+            # A sid that is already registered keeps its slots rather than taking new ones.
+            owner = pipe.hget(session_key, 'worker')
+            registered = owner is not None
+            previous = pipe.hget(session_key, 'language_code') if registered else None
+            if not registered and max_sessions and pipe.scard(sessions_key) >= max_sessions:
+                return 'global'
+            language_changed = not registered or previous != language
+            if (max_language_sessions and language_changed
+                    and int(pipe.hget(languages_key, language) or 0) >= max_language_sessions):
+                return 'language'
+            pipe.multi()
+            pipe.delete(session_key)
+            pipe.hset(session_key, mapping={k: str(v) for k, v in fields.items() if v is not None})
+            pipe.sadd(sessions_key, sid)
+            pipe.sadd(self._key('worker', self.worker_id, 'sessions'), sid)
+            if registered and owner != self.worker_id:
+                pipe.srem(self._key('worker', owner, 'sessions'), sid)
+            if language_changed:
+                if previous:
+                    pipe.hincrby(languages_key, previous, -1)
+                if language:
+                    pipe.hincrby(languages_key, language, 1)
+            return None
+
+        return self.redis.transaction(admit, session_key, sessions_key, languages_key, value_from_callable=True)
+
+    def update(self, sid, **info):
+        fields = {k: str(v) for k, v in info.items() if v is not None}
+        if fields:
+            self.redis.hset(self._key('session', sid), mapping=fields)
+
+    def unregister(self, sid):
+        self._remove_session(sid, self.worker_id)
+
+    def _remove_session(self, sid, worker):
+        """Delete a session and release its language slot; returns its info ({} if already gone)"""
+        session_key = self._key('session', sid)
+
+        def remove(pipe):
+            info = pipe.hgetall(session_key)
+            pipe.multi()
+            pipe.delete(session_key)
+            pipe.srem(self._key('sessions'), sid)
+            pipe.srem(self._key('worker', worker, 'sessions'), sid)
+            if info.get('language_code'):
+                pipe.hincrby(self._key('languages'), info['language_code'], -1)
+            return info
+
+        return self.redis.transaction(remove, session_key, value_from_callable=True)
+
+    def language_counts(self):
+        return {language: int(count) for language, count in self.redis.hgetall(self._key('languages')).items()
+                if int(count) > 0}
+
+    def owner(self, sid):
+        return self.redis.hget(self._key('session', sid), 'worker')
+
+    def count(self):
+        return self.redis.scard(self._key('sessions'))
+
+    def heartbeat(self):
+        pipe = self.redis.pipeline()
+        pipe.set(self._key('worker', self.worker_id, 'alive'), time.time(), ex=int(math.ceil(self.ttl)))
+        pipe.sadd(self._key('workers'), self.worker_id)
+        pipe.execute()
+
+    def reap(self):
+        """Remove sessions of dead workers; returns their session info dicts"""
+        reaped = []
+        for worker in self.redis.smembers(self._key('workers')):
+            if worker == self.worker_id or self.redis.exists(self._key('worker', worker, 'alive')):
+                continue
+            # Only one live worker cleans up after each dead one
+            if not self.redis.set(self._key('reaping', worker), self.worker_id, nx=True, ex=60):
+                continue
+
+            reaped.extend(self._remove_worker_sessions(worker))
+            self.redis.srem(self._key('workers'), worker)
+            print(f"Reaped dead worker {worker}")
+
+        self.reaped_sessions += len(reaped)
+        return reaped
+
+    def forget_worker_sessions(self):
+        """Drop entries left under this worker's id by a previous process"""
+        return self._remove_worker_sessions(self.worker_id)
+
+    def _remove_worker_sessions(self, worker):
+        removed = []
+        worker_sessions = self._key('worker', worker, 'sessions')
+        for sid in self.redis.smembers(worker_sessions):
+            info = self._remove_session(sid, worker)
+            removed.append({'sid': sid, **info})
+        return removed
+
+    def stats(self):
+        stats = super().stats()
+        stats['workers'] = self.redis.scard(self._key('workers'))
+        return stats
+
+
+class WorkerHeartbeat:
+    """Keeps this worker's heartbeat alive and cleans up after dead workers"""
+    def __init__(self, registry, interval):
+        self.registry = registry
+        self.interval = interval
+
+    def start(self):
+        threading.Thread(target=self._run, name='worker-heartbeat', daemon=True).start()
+
+    def _run(self):
+        # A worker restarted under the same WORKER_ID inherits its predecessor's entries
+        try:
+            for info in self.registry.forget_worker_sessions():
+                self._cleanup(info)
+        except Exception as e:
+            print(f"Could not clear previous sessions for worker {self.registry.worker_id}: {e}")
+
+        while True:
+            try:
+                self.registry.heartbeat()
+                for info in self.registry.reap():
+                    self._cleanup(info)
+            except Exception as e:
+                print(f"Worker heartbeat failed: {e}")
+            time.sleep(self.interval)
+
+    def _cleanup(self, info):
+        """Abandon the S3 multipart upload of a session whose worker died"""
+        print(f"Cleaning up session {info['sid']} from dead worker {info.get('worker')}")
+        if info.get('upload_id') and info.get('s3_key') and S3_BUCKET:
+            try:
+                s3_client.abort_multipart_upload(Bucket=S3_BUCKET, Key=info['s3_key'], UploadId=info['upload_id'])
+            except Exception as e:
+                print(f"Error aborting multipart upload for session {info['sid']}: {e}")
+
+
+def release_session(sid):
+    """Forget a session in this worker and in the registry; returns the local session if any"""
+    session = active_sessions.pop(sid, None)
+    if session and session.profiler:
+        session.profiler.stop()
+    realtime_chunks_received.remove(session_id=sid)
+    realtime_bytes_received.remove(session_id=sid)
+    try:
+        run_blocking(session_registry.unregister, sid)
+    except Exception as e:
+        print(f"Error unregistering session {sid}: {e}")
+    return session
+
+
+if REDIS_URL:
+    session_registry = RedisSessionRegistry(REDIS_URL, WORKER_ID, WORKER_TTL)
+    WorkerHeartbeat(session_registry, WORKER_HEARTBEAT_INTERVAL).start()
+else:
+    session_registry = LocalSessionRegistry(WORKER_ID)
+
+
+# ============================================================================
+# Result Caches
+# ============================================================================
+
+# In-memory budget for cached job results, and optional SQLite file so they survive restarts
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+TRANSCRIPT_CACHE_DB = os.getenv('TRANSCRIPT_CACHE_DB')
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by the total size of its values, with optional expiry"""
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl  # seconds; None keeps entries until evicted
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, created_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key):
+        """Return (value, created_at) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.time() - entry[2] > self.ttl:
+                del self._entries[key]
+                self.current_bytes -= entry[1]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[2]
+
+    def put(self, key, value, size, created_at=None):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size, created_at or time.time())
+            self.current_bytes += size
+
+            # Evict least recently used entries until we are back under budget
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+
+class SQLiteKeyValueStore:
+    """Persistent key -> JSON value store backed by a single SQLite table"""
+    def __init__(self, path, table):
+        self.table = table
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+
+    def get(self, key):
+        """Return (value, created_at) or None"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, created_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, value, created_at=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), created_at or time.time())
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+
+class TranscriptResultCache:
+    """
+    Responses for transcription jobs that reached a final state (COMPLETED or FAILED).
+
+    Final jobs never change, so once cached they are served without any AWS
+    call. Entries live in an in-memory LRU tier and, when TRANSCRIPT_CACHE_DB
+    is set, in SQLite so they survive restarts.
+    """
+    def __init__(self, max_bytes, db_path=None):
+        self.memory = LRUCache(max_bytes)
+        self.disk = SQLiteKeyValueStore(db_path, 'transcript_results') if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, job_name):
+        result = self.memory.get(job_name)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        if self.disk:
+            row = self.disk.get(job_name)
+            if row is not None:
+                result = row[0]
+                self.memory.put(job_name, result, len(json.dumps(result, ensure_ascii=False)))
+                self.hits += 1
+                self.disk_hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, job_name, result):
+        self.memory.put(job_name, result, len(json.dumps(result, ensure_ascii=False)))
+        if self.disk:
+            try:
+                self.disk.put(job_name, result)
+            except Exception as e:
+                print(f"Error persisting transcript cache entry for {job_name}: {e}")
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self.memory),
+            'memory_bytes': self.memory.current_bytes,
+            'memory_limit_bytes': self.memory.max_bytes,
+            'persistent': self.disk is not None
+        }
+
+
+transcript_cache = TranscriptResultCache(TRANSCRIPT_CACHE_MAX_BYTES, TRANSCRIPT_CACHE_DB)
+
+# Summaries are cached by a hash of (model, summary_language, final prompt)
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv('SUMMARY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+SUMMARY_CACHE_TTL = float(os.getenv('SUMMARY_CACHE_TTL', 24 * 3600))
+SUMMARY_CACHE_DB = os.getenv('SUMMARY_CACHE_DB')
+
+
+class SummaryCache:
+    """
+    Content-addressed cache of Gemini summaries with TTL + LRU eviction.
+
+    Identical requests that arrive while the first one is still generating
+    wait for its result instead of making their own Gemini call.
+    """
+    def __init__(self, max_bytes, ttl, db_path=None):
+        self.ttl = ttl
+        self.memory = LRUCache(max_bytes, ttl=ttl)
+        self.disk = SQLiteKeyValueStore(db_path, 'summaries') if db_path else None
+        self._inflight = {}  # key -> concurrent.futures.Future of (summary, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(model_name, summary_language, prompt):
+        digest = hashlib.sha256()
+        for part in (model_name, summary_language, prompt):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return (summary, created_at) for a fresh entry, or None"""
+        entry = self.memory.get_entry(key)
+        if entry is None and self.disk:
+            row = self.disk.get(key)
+            if row is not None and time.time() - row[1] <= self.ttl:
+                summary, created_at = row
+                self.memory.put(key, summary, len(summary.encode('utf-8')), created_at)
+                entry = row
+        return entry
+
+    def put(self, key, summary, created_at):
+        self.memory.put(key, summary, len(summary.encode('utf-8')), created_at)
+        if self.disk:
+            try:
+                self.disk.put(key, summary, created_at)
+            except Exception as e:
+                print(f"Error persisting summary cache entry: {e}")
+
+    def get_or_generate(self, key, generate):
+        """
+        Return (summary, created_at, cached), calling generate() at most once per key at a time.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0], entry[1], True
+
+        with self._lock:
+            # A leader that finished since the check above has already stored its result
+            entry = self.get(key)
+            future = self._inflight.get(key)
+            leader = entry is None and future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+
+        if entry is not None:
+            self.hits += 1
+            return entry[0], entry[1], True
+
+        if not leader:
+            # Same request already generating: share its result
+            self.coalesced += 1
+            summary, created_at = wait_for_result(future)
+            return summary, created_at, True
+
+        self.misses += 1
+        try:
+            summary = generate()
+            created_at = time.time()
+            self.put(key, summary, created_at)
+            future.set_result((summary, created_at))
+            return summary, created_at, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._inflight),
+            'entries': len(self.memory),
+            'memory_bytes': self.memory.current_bytes,
+            'memory_limit_bytes': self.memory.max_bytes,
+            'ttl_seconds': self.ttl,
+            'persistent': self.disk is not None
+        }
+
+
+summary_cache = SummaryCache(SUMMARY_CACHE_MAX_BYTES, SUMMARY_CACHE_TTL, SUMMARY_CACHE_DB)
+
+
+# ============================================================================
+# Batch Job Completion Watcher
+# ============================================================================
+
+# Polling interval bounds (seconds) while tracked jobs are pending
+JOB_WATCH_MIN_INTERVAL = float(os.getenv('JOB_WATCH_MIN_INTERVAL', '5'))
+JOB_WATCH_MAX_INTERVAL = float(os.getenv('JOB_WATCH_MAX_INTERVAL', '60'))
+
+# Stop tracking jobs that have not finished after this many seconds
+JOB_WATCH_MAX_AGE = float(os.getenv('JOB_WATCH_MAX_AGE', 24 * 3600))
+
+# Jobs one Socket.IO connection may follow at once through subscribe_job
+JOB_SUBSCRIBE_MAX_PER_SID = int(os.getenv('JOB_SUBSCRIBE_MAX_PER_SID', 20))
+
+
+# Webhook delivery: parallel senders (a slow endpoint never delays job polling),
+# and an optional allow-list of hosts (exact names, or ".example.com" for subdomains).
+# Without an allow-list, webhooks may only target public addresses.
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+WEBHOOK_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv('WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+webhook_pool = concurrent.futures.ThreadPoolExecutor(max_workers=WEBHOOK_WORKERS, thread_name_prefix='webhook')
+
+
+class _RefuseRedirects(urllib.request.HTTPRedirectHandler):
+    """Redirects would let a validated webhook URL bounce to an internal address"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+webhook_opener = urllib.request.build_opener(_RefuseRedirects)
+
+
+def webhook_url_error(url):
+    """Why a webhook URL may not be used (scheme, allow-list, non-public address), or None"""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return 'webhook_url must be an http or https URL'
+    host = parsed.hostname.lower()
+
+    if WEBHOOK_ALLOWED_HOSTS:
+        if any(host == allowed or (allowed.startswith('.') and host.endswith(allowed)) for allowed in WEBHOOK_ALLOWED_HOSTS):
+            return None
+        return f'webhook_url host is not allowed: {host}'
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        return f'webhook_url host does not resolve: {host}'
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            return f'webhook_url must point to a public address: {host}'
+    return None
+
+
+def post_webhook(url, payload):
+    """POST a JSON payload with retries (runs on webhook_pool)"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    for attempt in range(3):
+        # Checked again at send time: the host may resolve differently than at submission
+        error = webhook_url_error(url)
+        if error:
+            print(f"Webhook delivery to {url} refused: {error}")
+            return
+        try:
+            webhook_request = urllib.request.Request(
+                url, data=body, headers={'Content-Type': 'application/json; charset=utf-8'}, method='POST'
+            )
+            with webhook_opener.open(webhook_request, timeout=10):
+                return
+        except Exception as e:
+            print(f"Webhook delivery to {url} failed (attempt {attempt + 1}): {e}")
+            time.sleep(2 ** attempt)
+
+
+def notification_error(webhook_url=None, notify_sid=None):
+    """Why requested completion notifications cannot be delivered, or None (checked before any paid work)"""
+    if webhook_url:
+        # DNS lookup: never on the hub, where a slow resolver would stall every session
+        error = run_blocking(webhook_url_error, webhook_url)
+        if error:
+            return error
+    if notify_sid and not socketio.server.manager.is_connected(notify_sid, '/'):
+        return f'notify_sid is not a Socket.IO session connected to this server: {notify_sid}'
+    return None
+
+
+def join_job_room(job_name, sid):
+    """Subscribe a client to job_completed / job_failed for a job; False if it has gone away"""
+    try:
+        join_room(f'job:{job_name}', sid=sid, namespace='/')
+        return True
+    except (KeyError, ValueError) as e:
+        print(f"Could not subscribe {sid} to job {job_name}: {e}")
+        return False
+
+
+class JobCompletionWatcher:
+    """
+    Tracks batch jobs started by this service and pushes their completion.
+
+    A single background thread polls AWS for every tracked job at once: each
+    round lists recently COMPLETED and FAILED jobs rather than calling
+    get_transcription_job per job. The interval grows while nothing finishes
+    and resets when jobs are added or complete. Finished jobs are announced
+    as job_completed / job_failed Socket.IO events to the room job:<job_name>
+    and POSTed to every webhook URL registered for the job. Webhook URLs are
+    kept in job_index, so jobs that still owe a webhook are watched again
+    after a restart.
+    """
+    def __init__(self, min_interval, max_interval, max_age):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_age = max_age
+        self.interval = min_interval
+        self._jobs = {}  # job_name -> {'tracked_at': float, 'created_at': float}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.notifications = 0
+
+    def track(self, job_name, webhook_url=None):
+        """Watch a job; tracking it again (e.g. for a duplicate submission) adds the webhook"""
+        if webhook_url:
+            job_index.add_webhook(job_name, webhook_url)
+        created_at = job_creation_timestamp(job_name)
+        with self._lock:
+            self._jobs.setdefault(job_name, {'tracked_at': time.time(), 'created_at': created_at})
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='job-watcher', daemon=True)
+                self._thread.start()
+        self.interval = self.min_interval
+        self._wakeup.set()
+
+    def is_tracking(self, job_name):
+        with self._lock:
+            return job_name in self._jobs
+
+    def stats(self):
+        with self._lock:
+            tracked = len(self._jobs)
+        return {
+            'tracked_jobs': tracked,
+            'poll_interval_seconds': round(self.interval, 1),
+            'polls': self.polls,
+            'notifications': self.notifications
+        }
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._jobs
+            # Sleep until the next round, or indefinitely while nothing is tracked
+            self._wakeup.wait(None if idle else self.interval)
+            self._wakeup.clear()
+            if idle:
+                continue
+
+            try:
+                finished = self._poll()
+            except Exception as e:
+                print(f"Job watcher poll failed: {e}")
+                finished = 0
+
+            if finished:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 1.5, self.max_interval)
+
+    def _poll(self):
+        """One polling round for all tracked jobs; returns how many finished"""
+        self.polls += 1
+        now = time.time()
+        with self._lock:
+            for job_name in [name for name, job in self._jobs.items() if now - job['tracked_at'] > self.max_age]:
+                print(f"Job watcher giving up on {job_name}")
+                del self._jobs[job_name]
+                job_index.pop_webhooks(job_name)
+            pending = dict(self._jobs)
+        if not pending:
+            return 0
+
+        oldest = min(job['created_at'] for job in pending.values())
+        finished = set()
+        for status in ('COMPLETED', 'FAILED'):
+            finished |= self._list_finished(status, set(pending), oldest)
+
+        for job_name in finished:
+            with self._lock:
+                job = self._jobs.pop(job_name, None)
+            if job and not self._notify(job_name):
+                # Result not available (throttling, network): notify on a later round
+                with self._lock:
+                    self._jobs.setdefault(job_name, job)
+        return len(finished)
+
+    def _list_finished(self, status, job_names, oldest):
+        """Names from job_names listed with the given status (newest first, stops at jobs created before oldest)"""
+        found = set()
+        params = {'Status': status, 'JobNameContains': 'transcribe-', 'MaxResults': 100}
+        while True:
+            response = transcribe_client.list_transcription_jobs(**params)
+            summaries = response.get('TranscriptionJobSummaries', [])
+            for summary in summaries:
+                if summary.get('TranscriptionJobName') in job_names:
+                    found.add(summary['TranscriptionJobName'])
+
+            # Jobs are listed newest first; nothing older than our oldest tracked job matters
+            last_created = summaries[-1].get('CreationTime') if summaries else None
+            if (found >= job_names or 'NextToken' not in response
+                    or (last_created and last_created.timestamp() < oldest - 60)):
+                return found
+            params['NextToken'] = response['NextToken']
+
+    def _notify(self, job_name):
+        """Announce a finished job; False if its result could not be fetched"""
+        try:
+            result = fetch_job_result(job_name)
+        except Exception as e:
+            print(f"Job watcher could not fetch result for {job_name}: {e}")
+            return False
+
+        event = 'job_completed' if result.get('status') == 'COMPLETED' else 'job_failed'
+        call_in_socketio(socketio.emit, event, result, room=f'job:{job_name}')
+        self.notifications += 1
+
+        # Claimed from the index, so a worker sharing it never sends the same webhook twice
+        for webhook_url in job_index.pop_webhooks(job_name):
+            webhook_pool.submit(post_webhook, webhook_url, {'event': event, **result})
+        return True
+
+
+def job_creation_timestamp(job_name):
+    """Epoch creation time of a job from job_index, or now if it is not indexed"""
+    stored = job_index.get(job_name)
+    if stored and stored['creation_time']:
+        return datetime.fromisoformat(stored['creation_time']).timestamp()
+    return time.time()
+
+
+job_watcher = JobCompletionWatcher(JOB_WATCH_MIN_INTERVAL, JOB_WATCH_MAX_INTERVAL, JOB_WATCH_MAX_AGE)
+
+
+# ============================================================================
+# Local Job Index
+# ============================================================================
+
+# SQLite file indexing the batch jobs this service started (':memory:' to disable persistence).
+# Defaults to the system temp directory, outside the source tree; set it to a persistent
+# path in production so the index survives reboots.
+JOB_INDEX_DB = os.getenv('JOB_INDEX_DB') or os.path.join(tempfile.gettempdir(), 'stt-jobs.db')
+
+# Seconds between background syncs of the index from AWS (0 disables)
+JOB_INDEX_RECONCILE_INTERVAL = float(os.getenv('JOB_INDEX_RECONCILE_INTERVAL', 300))
+
+JOB_STATUSES = ['QUEUED', 'IN_PROGRESS', 'COMPLETED', 'FAILED']
+
+
+def utc_iso(value):
+    """Normalize a datetime (or ISO string) to a sortable UTC ISO 8601 string"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec='milliseconds')
+
+
+class JobIndex:
+    """
+    SQLite index of batch jobs, written when jobs are submitted and whenever
+    their status is seen. Serves /transcribe-jobs without calling AWS.
+    """
+    FIELDS = ('status', 'language_code', 'creation_time', 'start_time',
+              'completion_time', 'failure_reason', 'media_uri')
+
+    def __init__(self, path):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_name TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    language_code TEXT,
+                    creation_time TEXT NOT NULL,
+                    start_time TEXT,
+                    completion_time TEXT,
+                    failure_reason TEXT,
+                    media_uri TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_by_creation ON jobs (creation_time, job_name);
+                CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, creation_time, job_name);
+                CREATE INDEX IF NOT EXISTS jobs_by_language ON jobs (language_code, creation_time, job_name);
+                CREATE TABLE IF NOT EXISTS job_webhooks (
+                    job_name TEXT NOT NULL,
+                    webhook_url TEXT NOT NULL,
+                    PRIMARY KEY (job_name, webhook_url)
+                );
+            ''')
+
+    def upsert(self, job_name, **fields):
+        """
+        Insert a job or update it; fields given as None keep their stored
+        value, and the first creation_time recorded is kept
+        """
+        if not fields.get('creation_time'):
+            fields['creation_time'] = utc_iso(datetime.now(timezone.utc))
+        values = [fields.get(field) for field in self.FIELDS]
+        updates = [
+            'creation_time = jobs.creation_time' if field == 'creation_time'
+            else f'{field} = COALESCE(excluded.{field}, jobs.{field})'
+            for field in self.FIELDS
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'''INSERT INTO jobs (job_name, {', '.join(self.FIELDS)}, updated_at)
+                    VALUES (?, {', '.join('?' for _ in self.FIELDS)}, ?)
+                    ON CONFLICT(job_name) DO UPDATE SET
+                    {', '.join(updates)},
+                    updated_at = excluded.updated_at''',
+                [job_name, *values, time.time()]
+            )
+
+    def update_from_aws(self, job):
+        """
+        Refresh a job already in the index from a TranscriptionJob or
+        TranscriptionJobSummary dict. Jobs this service did not start are
+        ignored; returns whether the job was indexed.
+        """
+        fields = {
+            'status': job.get('TranscriptionJobStatus'),
+            'language_code': job.get('LanguageCode'),
+            'start_time': utc_iso(job.get('StartTime')),
+            'completion_time': utc_iso(job.get('CompletionTime')),
+            'failure_reason': job.get('FailureReason'),
+            'media_uri': job.get('Media', {}).get('MediaFileUri')
+        }
+        updates = [f'{field} = COALESCE(?, {field})' for field in fields]
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {', '.join(updates)}, updated_at = ? WHERE job_name = ?",
+                [*fields.values(), time.time(), job['TranscriptionJobName']]
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_name):
+        """The stored row for a job as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE job_name = ?', (job_name,)).fetchone()
+        return dict(row) if row else None
+
+    def add_webhook(self, job_name, webhook_url):
+        """Record a webhook owed when the job finishes"""
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR IGNORE INTO job_webhooks (job_name, webhook_url) VALUES (?, ?)',
+                               (job_name, webhook_url))
+
+    def pop_webhooks(self, job_name):
+        """Remove and return the webhooks recorded for a job"""
+        with self._lock, self._conn:
+            urls = [row[0] for row in self._conn.execute(
+                'SELECT webhook_url FROM job_webhooks WHERE job_name = ? ORDER BY rowid', (job_name,)
+            )]
+            self._conn.execute('DELETE FROM job_webhooks WHERE job_name = ?', (job_name,))
+        return urls
+
+    def jobs_with_webhooks(self):
+        """Names of jobs that still owe a webhook"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT DISTINCT job_name FROM job_webhooks')]
+
+    def oldest_unfinished(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(creation_time) FROM jobs WHERE status IN ('QUEUED', 'IN_PROGRESS')"
+            ).fetchone()
+        return row[0]
+
+    @staticmethod
+    def encode_cursor(row):
+        raw = json.dumps([row['creation_time'], row['job_name']]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        creation_time, job_name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return creation_time, job_name
+
+    def query(self, status=None, language_code=None, created_after=None, created_before=None,
+              order='desc', limit=20, cursor=None):
+        """
+        Keyset-paginated listing ordered by (creation_time, job_name).
+
+        Returns (jobs, next_cursor, total, status_counts); total and
+        status_counts ignore the cursor.
+        """
+        where, params = [], []
+        if language_code:
+            where.append('language_code = ?')
+            params.append(language_code)
+        if created_after:
+            where.append('creation_time >= ?')
+            params.append(created_after)
+        if created_before:
+            where.append('creation_time < ?')
+            params.append(created_before)
+
+        # Counts per status use every filter except status itself
+        count_where = ' AND '.join(where) or '1'
+        count_params = list(params)
+
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        filter_where = ' AND '.join(where) or '1'
+        filter_params = list(params)
+
+        comparison = '<' if order == 'desc' else '>'
+        if cursor:
+            cursor_time, cursor_name = self.decode_cursor(cursor)
+            where.append(f'(creation_time {comparison} ? OR (creation_time = ? AND job_name {comparison} ?))')
+            params.extend([cursor_time, cursor_time, cursor_name])
+
+        direction = 'DESC' if order == 'desc' else 'ASC'
+        with self._lock:
+            rows = self._conn.execute(
+                f'''SELECT * FROM jobs WHERE {' AND '.join(where) or '1'}
+                    ORDER BY creation_time {direction}, job_name {direction} LIMIT ?''',
+                [*params, limit + 1]
+            ).fetchall()
+            total = self._conn.execute(
+                f'SELECT COUNT(*) FROM jobs WHERE {filter_where}', filter_params
+            ).fetchone()[0]
+            status_counts = dict(self._conn.execute(
+                f'SELECT status, COUNT(*) FROM jobs WHERE {count_where} GROUP BY status', count_params
+            ).fetchall())
+
+        next_cursor = self.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        jobs = []
+        for row in rows[:limit]:
+            job_info = {
+                'job_name': row['job_name'],
+                'status': row['status'],
+                'language_code': row['language_code'],
+                'creation_time': row['creation_time'],
+                'start_time': row['start_time'],
+                'completion_time': row['completion_time'],
+            }
+            if row['failure_reason']:
+                job_info['failure_reason'] = row['failure_reason']
+            jobs.append(job_info)
+        return jobs, next_cursor, total, status_counts
+
+
+job_index = JobIndex(JOB_INDEX_DB)
+
+# Webhooks registered before a restart are still owed
+for _job_name in job_index.jobs_with_webhooks():
+    job_watcher.track(_job_name)
+
+
+class JobIndexReconciler:
+    """
+    Background sync of job_index from AWS.
+
+    Pages through list_transcription_jobs (newest first) and refreshes the
+    jobs already in the index; other jobs in the account are skipped. After
+    the first full pass, a round stops at jobs older than the oldest
+    unfinished job in the index.
+    """
+    def __init__(self, interval, max_pages=100):
+        self.interval = interval
+        self.max_pages = max_pages
+        self.last_sync = None
+        self.last_synced_jobs = 0
+        self.errors = 0
+
+    def start(self):
+        threading.Thread(target=self._run, name='job-index-reconciler', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                self.errors += 1
+                print(f"Job index reconciliation failed: {e}")
+            time.sleep(self.interval)
+
+    def reconcile(self):
+        sync_start = time.time()
+        if self.last_sync is None:
+            horizon = None
+        else:
+            # Anything unfinished may have changed; older jobs are final already
+            horizon = job_index.oldest_unfinished() or utc_iso(datetime.fromtimestamp(self.last_sync, timezone.utc))
+
+        params = {'JobNameContains': 'transcribe-', 'MaxResults': 100}
+        synced = 0
+        for _ in range(self.max_pages):
+            response = transcribe_client.list_transcription_jobs(**params)
+            summaries = response.get('TranscriptionJobSummaries', [])
+            synced += sum(job_index.update_from_aws(summary) for summary in summaries)
+
+            last_created = utc_iso(summaries[-1].get('CreationTime')) if summaries else None
+            if 'NextToken' not in response or (horizon and last_created and last_created < horizon):
+                break
+            params['NextToken'] = response['NextToken']
+
+        self.last_sync = sync_start
+        self.last_synced_jobs = synced
+
+    def stats(self):
+        return {
+            'interval_seconds': self.interval,
+            'last_sync': utc_iso(datetime.fromtimestamp(self.last_sync, timezone.utc)) if self.last_sync else None,
+            'last_synced_jobs': self.last_synced_jobs,
+            'errors': self.errors
+        }
+
+
+job_index_reconciler = JobIndexReconciler(JOB_INDEX_RECONCILE_INTERVAL)
+if JOB_INDEX_RECONCILE_INTERVAL > 0:
+    job_index_reconciler.start()
+
+
+
+
+
+
+
+
+
+
+
+# Audio formats accepted by AWS Transcribe batch jobs
+SUPPORTED_BATCH_FORMATS = ['mp3', 'mp4', 'wav', 'flac', 'ogg', 'amr', 'webm', 'm4a']
+
+# Parallel S3 uploads / job submissions for bulk requests, and max items per request
+BATCH_UPLOAD_WORKERS = int(os.getenv('BATCH_UPLOAD_WORKERS', 8))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+
+batch_pool = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_UPLOAD_WORKERS, thread_name_prefix='batch')
+
+
+def new_batch_job(filename):
+    """Return (job_name, s3_key, file_extension) for a new batch upload"""
+    date_folder = datetime.now().strftime('%Y-%m-%d')
+    job_name = f"transcribe-{uuid.uuid4()}"
+    file_extension = os.path.splitext(filename)[1].lstrip('.')
+    s3_key = f"audio/batch/{date_folder}/{job_name}.{file_extension}"
+    return job_name, s3_key, file_extension
+
+
+def unsupported_format_error(file_extension):
+    """Error message for an unsupported batch format, or None if it is supported"""
+    if file_extension.lower() in SUPPORTED_BATCH_FORMATS:
+        return None
+    return f'Unsupported file format: {file_extension}. Supported formats: {", ".join(SUPPORTED_BATCH_FORMATS)}'
+
+
+def start_batch_job(job_name, s3_key, file_extension, language_code, webhook_url=None, notify_sid=None):
+    """Start a Transcribe job for audio already in S3 and register it with the job watcher"""
+    file_uri = f"s3://{S3_BUCKET}/{s3_key}"
+
+    with trace_span('transcribe.start_transcription_job', 'client', job_name=job_name), \
+            transcribe_start_job_seconds.time():
+        response = transcribe_client.start_transcription_job(
+            TranscriptionJobName=job_name,
+            Media={'MediaFileUri': file_uri},
+            MediaFormat=file_extension.lower(),
+            LanguageCode=language_code
+        )
+    job_status = response['TranscriptionJob']['TranscriptionJobStatus']
+
+    job_index.upsert(
+        job_name,
+        status=job_status,
+        language_code=language_code,
+        creation_time=utc_iso(response['TranscriptionJob'].get('CreationTime') or datetime.now(timezone.utc)),
+        media_uri=file_uri
+    )
+
+    # Watch the job and push its completion (Socket.IO room job:<job_name>, optional webhook)
+    job_watcher.track(job_name, webhook_url=webhook_url)
+    if notify_sid:
+        # Checked by the caller before starting; a client that left since then just misses the event
+        join_job_room(job_name, notify_sid)
+
+    return job_status
+
+
+# Optional SQLite file for the content-hash deduplication index
+DEDUP_INDEX_DB = os.getenv('DEDUP_INDEX_DB')
+
+
+class ContentHashIndex:
+    """
+    Maps sha256(audio) + language_code to the batch job that transcribes it.
+
+    claim() is atomic: the first request for new content registers its own
+    job as 'pending' and proceeds; every later request (including concurrent
+    ones) gets the existing entry back instead of uploading again.
+    """
+    def __init__(self, db_path=None):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.disk = SQLiteKeyValueStore(db_path, 'content_hashes') if db_path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(content_hash, language_code):
+        return f'{content_hash}|{language_code}'
+
+    def claim(self, content_hash, language_code, job_name, s3_key):
+        """Return the existing entry for this content, or None after claiming it for job_name"""
+        key = self._key(content_hash, language_code)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.disk:
+                row = self.disk.get(key)
+                if row is not None:
+                    entry = self._entries[key] = row[0]
+
+            if entry is not None:
+                self.hits += 1
+                return dict(entry)
+
+            self.misses += 1
+            self._entries[key] = {
+                'job_name': job_name,
+                's3_key': s3_key,
+                'language_code': language_code,
+                'state': 'pending'
+            }
+            return None
+
+    def mark_started(self, content_hash, language_code):
+        key = self._key(content_hash, language_code)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['state'] = 'started'
+            if self.disk:
+                self.disk.put(key, entry)
+
+    def release(self, content_hash, language_code, job_name):
+        """Drop the entry if it still belongs to job_name (failed upload, failed or deleted job)"""
+        key = self._key(content_hash, language_code)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['job_name'] == job_name:
+                del self._entries[key]
+                if self.disk:
+                    self.disk.delete(key)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'persistent': self.disk is not None
+        }
+
+
+content_index = ContentHashIndex(DEDUP_INDEX_DB)
+
+
+def hash_fileobj(fileobj, chunk_size=1024 * 1024):
+    """sha256 hex digest of a seekable file object, rewound afterwards"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def dedup_hit_payload(entry):
+    """
+    Response for audio that was already submitted, or None if the existing
+    job is unusable (failed or deleted) and the audio should be processed again.
+    """
+    job_name = entry['job_name']
+    payload = {
+        'job_name': job_name,
+        'dedup_hit': True,
+        'audio_url': s3_to_https_url(f"s3://{S3_BUCKET}/{entry['s3_key']}"),
+        'language_code': entry['language_code'],
+        'message': 'Identical audio was already submitted; returning the existing job.',
+        'status_endpoint': f'/transcribe-job/{job_name}'
+    }
+
+    if entry['state'] == 'pending':
+        # A concurrent request with the same audio is still uploading (or has just started its job)
+        stored = job_index.get(job_name)
+        payload['status'] = stored['status'] if stored else 'UPLOADING'
+        return payload
+
+    try:
+        result = fetch_job_result(job_name)
+    except transcribe_client.exceptions.BadRequestException:
+        return None
+    if result['status'] == 'FAILED':
+        return None
+
+    payload['status'] = result['status']
+    if result['status'] == 'COMPLETED':
+        payload['transcript'] = result['transcript']
+    return payload
+
+
+def follow_existing_job(payload, webhook_url=None, notify_sid=None):
+    """
+    Give a dedup hit the notifications its caller asked for: watch the
+    existing job for this webhook / Socket.IO client, or notify them right
+    away if the job has already finished. Call on the server thread.
+    """
+    job_name = payload['job_name']
+    if payload['status'] in ('COMPLETED', 'FAILED'):
+        result = run_blocking(fetch_job_result, job_name)
+        event = 'job_completed' if result['status'] == 'COMPLETED' else 'job_failed'
+        if webhook_url:
+            webhook_pool.submit(post_webhook, webhook_url, {'event': event, **result})
+        if notify_sid:
+            socketio.emit(event, result, room=notify_sid)
+        return
+
+    job_watcher.track(job_name, webhook_url=webhook_url)
+    if notify_sid:
+        join_job_room(job_name, notify_sid)
+
+
+def claim_content(content_hash, language_code, job_name, s3_key):
+    """
+    Claim audio content for a new job.
+
+    Returns None when the caller should upload and start job_name, or the
+    dedup_hit_payload() of the existing job for the same audio and language.
+    Only returns None once job_name holds the claim.
+    """
+    while True:
+        existing = content_index.claim(content_hash, language_code, job_name, s3_key)
+        if existing is None:
+            return None
+        payload = dedup_hit_payload(existing)
+        if payload is not None:
+            return payload
+        # Stale entry (another request may have replaced it meanwhile): forget it and claim again.
+        # Terminates: a fresh claim is 'pending', which is always a live entry
+        content_index.release(content_hash, language_code, existing['job_name'])
+
+
+@app.route('/transcribe-batch-async', methods=['POST'])
+def transcribe_audio_batch_async():
+    """
+    Async batch transcription endpoint using AWS Transcribe with S3.
+    Supports multiple audio formats: MP3, MP4, WAV, FLAC, OGG, AMR, WebM.
+    Starts the transcription job and returns immediately with job details.
+    Use /transcribe-job/<job_name> to check status and retrieve results, or
+    get notified: optional 'notify_sid' (Socket.IO session id) joins that
+    client to the job's room, optional 'webhook_url' receives a POST.
+    """
+    try:
+        # Check if S3 bucket is configured
+        if not S3_BUCKET:
+            return jsonify({'error': 'S3_BUCKET_NAME not configured in environment variables'}), 500
+
+        # Check if file is present
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+
+        file = request.files['file']
+
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        # Generate unique job name and S3 key with date folder
+        job_name, s3_key, file_extension = new_batch_job(file.filename)
+
+        # Validate file format
+        format_error = unsupported_format_error(file_extension)
+        if format_error:
+            return jsonify({'error': format_error}), 400
+
+        notify_error = notification_error(request.form.get('webhook_url'), request.form.get('notify_sid'))
+        if notify_error:
+            return jsonify({'error': notify_error}), 400
+
+        # Same audio and language already submitted? Reuse that job instead of paying again
+        language_code = request.form.get('language_code', 'en-US')
+        content_hash = run_blocking(hash_fileobj, file)
+        existing = run_blocking(claim_content, content_hash, language_code, job_name, s3_key)
+        if existing:
+            follow_existing_job(existing, request.form.get('webhook_url'), request.form.get('notify_sid'))
+            return jsonify(existing), 200
+
+        try:
+            # Upload file to S3
+            upload_start = time.time()
+            with trace_span('s3.upload_fileobj', 'client', key=s3_key):
+                run_blocking(s3_client.upload_fileobj, file, S3_BUCKET, s3_key, Config=transfer_config)
+            upload_time = time.time() - upload_start
+            s3_upload_seconds.observe(upload_time, path='batch')
+
+            # Start transcription job (non-blocking)
+            job_status = run_blocking(
+                start_batch_job, job_name, s3_key, file_extension, language_code,
+                webhook_url=request.form.get('webhook_url')
+            )
+        except Exception:
+            content_index.release(content_hash, language_code, job_name)
+            raise
+        content_index.mark_started(content_hash, language_code)
+        if request.form.get('notify_sid'):
+            # Joined here, on the server thread; a client that left since the check just misses the event
+            join_job_room(job_name, request.form.get('notify_sid'))
+
+        # Return job details immediately
+        return jsonify({
+            'job_name': job_name,
+            'status': job_status,
+            'dedup_hit': False,
+            'content_sha256': content_hash,
+            'audio_url': s3_to_https_url(f"s3://{S3_BUCKET}/{s3_key}"),
+            'upload_time_seconds': round(upload_time, 2),
+            'language_code': language_code,
+            'message': 'Transcription job started. Use /transcribe-job/<job_name> to check status.',
+            'status_endpoint': f'/transcribe-job/{job_name}'
+        }), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+class HashingReader:
+    """Non-seekable wrapper around a request body stream that counts and hashes bytes read"""
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_read = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        self.sha256.update(data)
+        return data
+
+
+# Threads uploading parts of streamed request bodies (shared by all requests; each
+# request keeps at most S3_MAX_CONCURRENCY of its parts in flight)
+STREAM_UPLOAD_WORKERS = int(os.getenv('STREAM_UPLOAD_WORKERS', 16))
+stream_part_pool = concurrent.futures.ThreadPoolExecutor(max_workers=STREAM_UPLOAD_WORKERS,
+                                                         thread_name_prefix='s3-part')
+
+
+def read_part(body, size):
+    """Read up to size bytes, fewer only at the end of the stream"""
+    chunks, remaining = [], size
+    while remaining:
+        data = body.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b''.join(chunks)
+
+
+def upload_stream_part(s3_key, upload_id, part_number, data):
+    """Upload one part of a streamed body (runs on stream_part_pool)"""
+    response = s3_client.upload_part(Bucket=S3_BUCKET, Key=s3_key, UploadId=upload_id,
+                                     PartNumber=part_number, Body=data)
+    return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+
+def stream_body_to_s3(body, s3_key):
+    """
+    Upload a request body stream to S3 in S3_MULTIPART_CHUNK_MB parts.
+
+    The body is read here, on the server thread: eventlet's wsgi input is a
+    green socket and must not be read from another OS thread. Only the S3
+    calls run elsewhere, with at most S3_MAX_CONCURRENCY parts in flight, so
+    memory stays around part size x (concurrency + 1). An empty body uploads nothing.
+    """
+    part_size = S3_MULTIPART_CHUNK_MB * 1024 * 1024
+    part = read_part(body, part_size)
+    if len(part) < part_size:
+        # Fits in one request
+        if part:
+            run_blocking(s3_client.put_object, Bucket=S3_BUCKET, Key=s3_key, Body=part)
+        return
+
+    upload_id = run_blocking(s3_client.create_multipart_upload, Bucket=S3_BUCKET, Key=s3_key)['UploadId']
+    in_flight, parts = deque(), []
+    try:
+        part_number = 0
+        while part:
+            part_number += 1
+            in_flight.append(stream_part_pool.submit(upload_stream_part, s3_key, upload_id, part_number, part))
+            if len(in_flight) >= S3_MAX_CONCURRENCY:
+                parts.append(wait_for_result(in_flight.popleft()))
+            part = read_part(body, part_size)
+        while in_flight:
+            parts.append(wait_for_result(in_flight.popleft()))
+        run_blocking(s3_client.complete_multipart_upload, Bucket=S3_BUCKET, Key=s3_key, UploadId=upload_id,
+                     MultipartUpload={'Parts': parts})
+    except BaseException:
+        for future in in_flight:
+            future.cancel()
+        try:
+            run_blocking(s3_client.abort_multipart_upload, Bucket=S3_BUCKET, Key=s3_key, UploadId=upload_id)
+        except Exception as e:
+            print(f"Error aborting streamed upload of {s3_key}: {e}")
+        raise
+
+
+def request_body_stream():
+    """
+    The raw request body as a file object, or None if it cannot be read.
+
+    Werkzeug only trusts a body without Content-Length when the server sets
+    wsgi.input_terminated, which eventlet does not; its input object decodes
+    Transfer-Encoding: chunked itself, so chunked uploads are read from it directly.
+    """
+    if request.content_length is not None:
+        return request.stream
+    raw = request.environ.get('wsgi.input')
+    if request.environ.get('wsgi.input_terminated') or getattr(raw, 'chunked_input', False):
+        return raw
+    return None
+
+
+@app.route('/transcribe-batch-async/stream', methods=['POST', 'PUT'])
+def transcribe_audio_batch_stream():
+    """
+    Streaming variant of /transcribe-batch-async for large files.
+
+    The raw request body is the audio file (no multipart form), and it is
+    piped straight into an S3 multipart upload without spooling to local
+    disk (see stream_body_to_s3; S3_MULTIPART_CHUNK_MB / S3_MAX_CONCURRENCY).
+
+    Query parameters (or headers):
+    - filename (X-Filename): original file name, used for the format
+    - language_code: defaults to en-US
+    - webhook_url, notify_sid: completion notifications, as for /transcribe-batch-async
+
+    The body needs a Content-Length or Transfer-Encoding: chunked (411 otherwise).
+    """
+    try:
+        if not S3_BUCKET:
+            return jsonify({'error': 'S3_BUCKET_NAME not configured in environment variables'}), 500
+
+        if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+            return jsonify({'error': 'Send the audio as the raw request body, or use /transcribe-batch-async for form uploads'}), 400
+
+        filename = request.args.get('filename') or request.headers.get('X-Filename')
+        if not filename:
+            return jsonify({'error': 'filename query parameter (or X-Filename header) is required'}), 400
+
+        job_name, s3_key, file_extension = new_batch_job(filename)
+
+        format_error = unsupported_format_error(file_extension)
+        if format_error:
+            return jsonify({'error': format_error}), 400
+
+        notify_error = notification_error(request.args.get('webhook_url'), request.args.get('notify_sid'))
+        if notify_error:
+            return jsonify({'error': notify_error}), 400
+
+        # Refuse bodies the server cannot delimit before anything is written to S3
+        stream = request_body_stream()
+        if stream is None:
+            return jsonify({'error': 'Content-Length or Transfer-Encoding: chunked is required'}), 411
+        if request.content_length == 0:
+            return jsonify({'error': 'Empty request body'}), 400
+
+        # Pipe the body into S3; the stream reads the socket directly (no temp file)
+        body = HashingReader(stream)
+        upload_start = time.time()
+        with trace_span('s3.upload_stream', 'client', key=s3_key):
+            stream_body_to_s3(body, s3_key)
+        upload_time = time.time() - upload_start
+        s3_upload_seconds.observe(upload_time, path='stream')
+
+        if body.bytes_read == 0:
+            return jsonify({'error': 'Empty request body'}), 400
+
+        # The hash is only known once the body has streamed through; on a
+        # duplicate, drop the new object and skip the paid job
+        language_code = request.args.get('language_code', 'en-US')
+        content_hash = body.sha256.hexdigest()
+        existing = run_blocking(claim_content, content_hash, language_code, job_name, s3_key)
+        if existing:
+            run_blocking(s3_client.delete_object, Bucket=S3_BUCKET, Key=s3_key)
+            follow_existing_job(existing, request.args.get('webhook_url'), request.args.get('notify_sid'))
+            return jsonify(existing), 200
+
+        try:
+            job_status = run_blocking(
+                start_batch_job, job_name, s3_key, file_extension, language_code,
+                webhook_url=request.args.get('webhook_url')
+            )
+        except Exception:
+            content_index.release(content_hash, language_code, job_name)
+            raise
+        content_index.mark_started(content_hash, language_code)
+        if request.args.get('notify_sid'):
+            join_job_room(job_name, request.args.get('notify_sid'))
+
+        return jsonify({
+            'job_name': job_name,
+            'status': job_status,
+            'dedup_hit': False,
+            'content_sha256': content_hash,
+            'audio_url': s3_to_https_url(f"s3://{S3_BUCKET}/{s3_key}"),
+            'bytes': body.bytes_read,
+            'upload_time_seconds': round(upload_time, 2),
+            'upload_mb_per_second': round(body.bytes_read / (1024 * 1024) / max(upload_time, 1e-6), 2),
+            'language_code': language_code,
+            'message': 'Transcription job started. Use /transcribe-job/<job_name> to check status.',
+            'status_endpoint': f'/transcribe-job/{job_name}'
+        }), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Lifetime of presigned upload URLs (and of the pending upload records behind them)
+PRESIGNED_URL_EXPIRY = int(os.getenv('PRESIGNED_URL_EXPIRY', 3600))
+
+# Optional shared secret expected in the X-S3-Event-Token header of /s3-events callbacks
+S3_EVENT_TOKEN = os.getenv('S3_EVENT_TOKEN')
+
+
+class PendingUploads:
+    """Direct-to-S3 uploads handed out by /upload-url that have not started a job yet"""
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._uploads = {}  # job_name -> dict(s3_key, file_extension, language_code, ...)
+        self._lock = threading.Lock()
+
+    def add(self, job_name, upload):
+        with self._lock:
+            self._expire()
+            self._uploads[job_name] = {**upload, 'expires_at': time.time() + self.ttl}
+
+    def get(self, job_name):
+        with self._lock:
+            self._expire()
+            return self._uploads.get(job_name)
+
+    def pop(self, job_name):
+        """Claim an upload; only the first caller gets it, so a job starts once"""
+        with self._lock:
+            return self._uploads.pop(job_name, None)
+
+    def restore(self, job_name, upload):
+        with self._lock:
+            self._uploads[job_name] = upload
+
+    def _expire(self):
+        now = time.time()
+        for job_name in [name for name, upload in self._uploads.items() if upload['expires_at'] < now]:
+            del self._uploads[job_name]
+
+
+class RedisPendingUploads(PendingUploads):
+    """
+    Pending uploads shared by all workers through Redis, so /start, /s3-events
+    and subscribe_job work on any worker. Each record is a JSON string under
+    stt:upload:<job_name> that expires with its presigned URLs.
+    """
+    def __init__(self, url, ttl, prefix='stt:'):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, job_name):
+        return f'{self.prefix}upload:{job_name}'
+
+    def add(self, job_name, upload):
+        self.redis.set(self._key(job_name), json.dumps({**upload, 'expires_at': time.time() + self.ttl}), ex=int(self.ttl))
+
+    def get(self, job_name):
+        raw = self.redis.get(self._key(job_name))
+        return json.loads(raw) if raw else None
+
+    def pop(self, job_name):
+        """Claim an upload; GET and DEL run in one MULTI, so only the first caller gets it"""
+        pipe = self.redis.pipeline()
+        pipe.get(self._key(job_name))
+        pipe.delete(self._key(job_name))
+        raw, deleted = pipe.execute()
+        return json.loads(raw) if raw and deleted else None
+
+    def restore(self, job_name, upload):
+        remaining = max(1, math.ceil(upload['expires_at'] - time.time()))
+        self.redis.set(self._key(job_name), json.dumps(upload), ex=remaining)
+
+
+if REDIS_URL:
+    pending_uploads = RedisPendingUploads(REDIS_URL, PRESIGNED_URL_EXPIRY)
+else:
+    pending_uploads = PendingUploads(PRESIGNED_URL_EXPIRY)
+
+
+def presign_direct_upload(s3_key, parts, content_type=None):
+    """
+    Presigned PUT URL for s3_key, or a multipart upload with one presigned
+    URL per part when parts > 0. Returns (upload_id or None, response fields).
+    """
+    if not parts:
+        params = {'Bucket': S3_BUCKET, 'Key': s3_key}
+        headers = {}
+        if content_type:
+            params['ContentType'] = content_type
+            headers['Content-Type'] = content_type
+        return None, {'upload': {
+            'method': 'PUT',
+            'url': s3_client.generate_presigned_url('put_object', Params=params, ExpiresIn=PRESIGNED_URL_EXPIRY),
+            'headers': headers
+        }}
+
+    create_params = {'Bucket': S3_BUCKET, 'Key': s3_key}
+    if content_type:
+        create_params['ContentType'] = content_type
+    upload_id = s3_client.create_multipart_upload(**create_params)['UploadId']
+    return upload_id, {'multipart': {
+        'upload_id': upload_id,
+        'parts': [{
+            'part_number': part_number,
+            'url': s3_client.generate_presigned_url('upload_part', Params={
+                'Bucket': S3_BUCKET,
+                'Key': s3_key,
+                'UploadId': upload_id,
+                'PartNumber': part_number
+            }, ExpiresIn=PRESIGNED_URL_EXPIRY)
+        } for part_number in range(1, parts + 1)],
+        'message': 'PUT each part, then send [{part_number, etag}] to start_endpoint.'
+    }}
+
+
+@app.route('/transcribe-batch-async/upload-url', methods=['POST'])
+def create_batch_upload_url():
+    """
+    Step 1 of the direct-to-S3 flow: get presigned URL(s) to upload audio.
+
+    Expected JSON:
+    {
+        "filename": "meeting.mp3",
+        "language_code": "en-US",       # optional
+        "content_type": "audio/mpeg",   # optional, must be sent with the PUT
+        "parts": 4,                     # optional: presigned multipart upload with this many parts
+        "webhook_url": "..."            # optional completion webhook
+    }
+    The client uploads straight to S3, then calls the returned start_endpoint
+    (or S3 notifies /s3-events) to start the transcription job.
+    """
+    try:
+        if not S3_BUCKET:
+            return jsonify({'error': 'S3_BUCKET_NAME not configured in environment variables'}), 500
+
+        data = request.get_json(silent=True) or {}
+        filename = data.get('filename')
+        if not filename:
+            return jsonify({'error': 'filename is required'}), 400
+
+        job_name, s3_key, file_extension = new_batch_job(filename)
+
+        format_error = unsupported_format_error(file_extension)
+        if format_error:
+            return jsonify({'error': format_error}), 400
+
+        notify_error = notification_error(data.get('webhook_url'))
+        if notify_error:
+            return jsonify({'error': notify_error}), 400
+
+        try:
+            parts = int(data.get('parts') or 0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'parts must be an integer'}), 400
+        if parts < 0 or parts > 10000:
+            return jsonify({'error': 'parts must be between 0 (single PUT) and 10000'}), 400
+
+        upload = {
+            's3_key': s3_key,
+            'file_extension': file_extension,
+            'language_code': data.get('language_code', 'en-US'),
+            'webhook_url': data.get('webhook_url'),
+            'upload_id': None,
+            'completed': False  # Multipart upload already completed by an earlier start attempt
+        }
+        result = {
+            'job_name': job_name,
+            's3_key': s3_key,
+            'expires_in': PRESIGNED_URL_EXPIRY,
+            'start_endpoint': f'/transcribe-batch-async/{job_name}/start'
+        }
+
+        # Creating the upload and signing up to 10000 part URLs is blocking work: keep it off the hub
+        upload['upload_id'], presigned = run_blocking(presign_direct_upload, s3_key, parts, data.get('content_type'))
+        result.update(presigned)
+
+        pending_uploads.add(job_name, upload)
+        return jsonify(result), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def normalize_upload_parts(parts):
+    """
+    Turn client [{part_number, etag}] into sorted CompleteMultipartUpload parts.
+
+    Returns (parts, error); parts is None when none were sent.
+    """
+    if not parts:
+        return None, None
+    if not isinstance(parts, list):
+        return None, 'parts must be a list of {part_number, etag}'
+    normalized = []
+    for part in parts:
+        if not isinstance(part, dict):
+            return None, 'each part must be an object with part_number and etag'
+        try:
+            part_number = int(part['part_number'])
+        except KeyError:
+            return None, 'each part needs a part_number'
+        except (TypeError, ValueError):
+            return None, f"invalid part_number: {part['part_number']!r}"
+        etag = part.get('etag')
+        if not isinstance(etag, str) or not etag:
+            return None, f'part {part_number} needs a string etag'
+        if not 1 <= part_number <= 10000:
+            return None, f'part_number must be between 1 and 10000, got {part_number}'
+        normalized.append({'PartNumber': part_number, 'ETag': etag})
+    return sorted(normalized, key=lambda part: part['PartNumber']), None
+
+
+def start_pending_upload(job_name, parts=None, notify_sid=None):
+    """
+    Validate a direct-to-S3 upload and start its job.
+
+    Returns (payload, http_status). The pending record is claimed first, so
+    concurrent confirmations (client call and S3 event) start one job only.
+    Any failure before the job starts puts the record back for a retry.
+    """
+    notify_error = notification_error(notify_sid=notify_sid)
+    if notify_error:
+        return {'error': notify_error}, 400
+
+    parts, parts_error = normalize_upload_parts(parts)
+    if parts_error:
+        return {'error': parts_error}, 400
+
+    upload = pending_uploads.pop(job_name)
+    if upload is None:
+        return {'error': f'No pending upload for job: {job_name}'}, 404
+
+    s3_key = upload['s3_key']
+    try:
+        if upload['upload_id'] and not upload['completed']:
+            if not parts:
+                pending_uploads.restore(job_name, upload)
+                return {'error': 'parts ([{part_number, etag}]) are required to complete a multipart upload'}, 400
+            run_blocking(
+                s3_client.complete_multipart_upload,
+                Bucket=S3_BUCKET,
+                Key=s3_key,
+                UploadId=upload['upload_id'],
+                MultipartUpload={'Parts': parts}
+            )
+            # Completing again would fail: a retry only needs the checks and the job
+            upload['completed'] = True
+
+        # The object must exist and be non-empty before we pay for a job
+        head = run_blocking(s3_client.head_object, Bucket=S3_BUCKET, Key=s3_key)
+        if head['ContentLength'] == 0:
+            # Keep the record so the client can upload again and retry
+            pending_uploads.restore(job_name, upload)
+            return {'error': 'Uploaded object is empty'}, 400
+
+    except s3_client.exceptions.ClientError as e:
+        pending_uploads.restore(job_name, upload)
+        return {'error': f'Upload not found or incomplete: {e}'}, 409
+    except Exception:
+        pending_uploads.restore(job_name, upload)
+        raise
+
+    try:
+        job_status = run_blocking(
+            start_batch_job, job_name, s3_key, upload['file_extension'], upload['language_code'],
+            webhook_url=upload['webhook_url']
+        )
+    except Exception:
+        pending_uploads.restore(job_name, upload)
+        raise
+    if notify_sid:
+        # Joined here, on the server thread
+        join_job_room(job_name, notify_sid)
+
+    return {
+        'job_name': job_name,
+        'status': job_status,
+        'audio_url': s3_to_https_url(f"s3://{S3_BUCKET}/{s3_key}"),
+        'bytes': head['ContentLength'],
+        'language_code': upload['language_code'],
+        'message': 'Transcription job started. Use /transcribe-job/<job_name> to check status.',
+        'status_endpoint': f'/transcribe-job/{job_name}'
+    }, 201
+
+
+@app.route('/transcribe-batch-async/<job_name>/start', methods=['POST'])
+def start_uploaded_batch_job(job_name):
+    """
+    Step 2 of the direct-to-S3 flow: validate the uploaded object and start the job.
+
+    Optional JSON: {"parts": [{"part_number": 1, "etag": "..."}], "notify_sid": "..."}
+    (parts are required for multipart uploads).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        payload, status = start_pending_upload(job_name, data.get('parts'), data.get('notify_sid'))
+        return jsonify(payload), status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/s3-events', methods=['POST'])
+def handle_s3_events():
+    """
+    S3 event notification callback (ObjectCreated records, e.g. forwarded by
+    EventBridge or a Lambda). Starts the job for each pending direct upload.
+    """
+    if S3_EVENT_TOKEN and not hmac.compare_digest(request.headers.get('X-S3-Event-Token', '').encode(),
+                                                  S3_EVENT_TOKEN.encode()):
+        return jsonify({'error': 'Invalid event token'}), 403
+
+    try:
+        records = (request.get_json(silent=True) or {}).get('Records', [])
+        results = []
+        for record in records:
+            key = urllib.parse.unquote_plus(record.get('s3', {}).get('object', {}).get('key', ''))
+            if not key.startswith('audio/batch/'):
+                continue
+            job_name = os.path.splitext(os.path.basename(key))[0]
+            upload = pending_uploads.get(job_name)
+            if not upload or upload['s3_key'] != key or (upload['upload_id'] and not upload['completed']):
+                # Unknown key, or multipart uploads, which the client confirms with its ETags
+                continue
+            payload, status = start_pending_upload(job_name)
+            results.append({'s3_key': key, 'http_status': status, **payload})
+
+        return jsonify({'processed': len(results), 'results': results}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def submit_bulk_item(index, language_code, webhook_url, file=None, s3_key=None):
+    """
+    Upload one bulk item (or verify an existing S3 key) and start its job.
+
+    Runs on batch_pool; returns a per-item result dict and never raises.
+    """
+    item = {'index': index, 'success': False}
+    try:
+        if file is not None:
+            item['filename'] = file.filename
+            job_name, s3_key, file_extension = new_batch_job(file.filename)
+        else:
+            item['s3_key'] = s3_key
+            job_name, _, file_extension = new_batch_job(s3_key)
+
+        format_error = unsupported_format_error(file_extension)
+        if format_error:
+            item['error'] = format_error
+            return item
+
+        content_hash = None
+        if file is not None:
+            # Skip files whose audio and language were already submitted
+            content_hash = hash_fileobj(file)
+            existing = claim_content(content_hash, language_code, job_name, s3_key)
+            if existing:
+                item.update(existing, success=True)
+                return item
+
+            # Already on a batch_pool thread, so the upload never blocks the hub
+            uploaded = [0]
+            upload_start = time.time()
+            try:
+                with trace_span('s3.upload_fileobj', 'client', key=s3_key):
+                    s3_client.upload_fileobj(file, S3_BUCKET, s3_key, Config=transfer_config,
+                                             Callback=lambda n: uploaded.__setitem__(0, uploaded[0] + n))
+            except Exception:
+                content_index.release(content_hash, language_code, job_name)
+                raise
+            upload_time = time.time() - upload_start
+            s3_upload_seconds.observe(upload_time, path='bulk')
+            item['bytes'] = uploaded[0]
+            item['upload_time_seconds'] = round(upload_time, 2)
+            item['upload_mb_per_second'] = round(uploaded[0] / (1024 * 1024) / max(upload_time, 1e-6), 2)
+        else:
+            # Manifest entry: the object must already be in the bucket
+            item['bytes'] = s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)['ContentLength']
+
+        try:
+            item['status'] = start_batch_job(job_name, s3_key, file_extension, language_code, webhook_url)
+        except Exception:
+            if content_hash:
+                content_index.release(content_hash, language_code, job_name)
+            raise
+        if content_hash:
+            content_index.mark_started(content_hash, language_code)
+            item['dedup_hit'] = False
+        item.update({
+            'success': True,
+            'job_name': job_name,
+            'language_code': language_code,
+            'audio_url': s3_to_https_url(f"s3://{S3_BUCKET}/{s3_key}"),
+            'status_endpoint': f'/transcribe-job/{job_name}'
+        })
+    except Exception as e:
+        item['error'] = str(e)
+    return item
+
+
+@app.route('/transcribe-batch-async/bulk', methods=['POST'])
+def transcribe_audio_batch_bulk():
+    """
+    Submit many batch transcription jobs in one request.
+
+    Accepts either multipart form data with several 'files' (plus optional
+    'language_code' / 'webhook_url' / 'notify_sid'), or JSON with a manifest
+    of objects already uploaded to S3_BUCKET:
+    {
+        "items": [{"s3_key": "uploads/a.mp3", "language_code": "en-US"}, ...],
+        "language_code": "en-US",  # default for items without one
+        "webhook_url": "...",      # optional
+        "notify_sid": "..."        # optional
+    }
+    Uploads and job submissions run concurrently; every item reports its own
+    success or error. Returns 201 if all items started, 207 otherwise.
+    """
+    try:
+        if not S3_BUCKET:
+            return jsonify({'error': 'S3_BUCKET_NAME not configured in environment variables'}), 500
+
+        if request.is_json:
+            data = request.get_json()
+            if not isinstance(data, dict) or not isinstance(data.get('items', []), list):
+                return jsonify({'error': 'Manifest must be an object with an "items" list'}), 400
+            default_language = data.get('language_code', 'en-US')
+            webhook_url = data.get('webhook_url')
+            notify_sid = data.get('notify_sid')
+            for index, item in enumerate(data.get('items', [])):
+                if not isinstance(item, dict) or not item.get('s3_key'):
+                    return jsonify({'error': f'Manifest item {index} must be an object with an s3_key'}), 400
+            items = [
+                (item.get('language_code', default_language), {'s3_key': item['s3_key']})
+                for item in data.get('items', [])
+            ]
+        else:
+            default_language = request.form.get('language_code', 'en-US')
+            webhook_url = request.form.get('webhook_url')
+            notify_sid = request.form.get('notify_sid')
+            files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+            items = [(default_language, {'file': f}) for f in files]
+
+        if not items:
+            return jsonify({'error': 'No files or manifest items provided'}), 400
+        notify_error = notification_error(webhook_url, notify_sid)
+        if notify_error:
+            return jsonify({'error': notify_error}), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({'error': f'Too many items: {len(items)} (max {BATCH_MAX_ITEMS})'}), 400
+
+        total_start = time.time()
+        futures = [
+            batch_pool.submit(run_in_context(submit_bulk_item), index, language_code, webhook_url, **kwargs)
+            for index, (language_code, kwargs) in enumerate(items)
+        ]
+        # Polled from the hub, so a large batch holds no tpool thread while it uploads
+        results = [wait_for_result(future) for future in futures]
+        total_time = time.time() - total_start
+
+        # Socket.IO rooms are joined here, on the server thread; duplicates follow their existing job
+        for item in results:
+            if item.get('dedup_hit'):
+                follow_existing_job(item, webhook_url, notify_sid)
+            elif item['success'] and notify_sid:
+                join_job_room(item['job_name'], notify_sid)
+
+        submitted = sum(1 for item in results if item['success'])
+        uploaded_bytes = sum(item.get('bytes', 0) for item in results
+                             if item['success'] and 'filename' in item and not item.get('dedup_hit'))
+        return jsonify({
+            'jobs': results,
+            'submitted': submitted,
+            'failed': len(results) - submitted,
+            'total_time_seconds': round(total_time, 2),
+            'uploaded_bytes': uploaded_bytes,
+            'upload_mb_per_second': round(uploaded_bytes / (1024 * 1024) / max(total_time, 1e-6), 2),
+            'message': 'Use /transcribe-job/<job_name> to check the status of each job.'
+        }), 201 if submitted == len(results) else 207
 
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 
+def fetch_job_result(job_name):
+    """
+    Build the status/result payload for a transcription job.
 
+    Downloads the transcript for COMPLETED jobs. Final (COMPLETED/FAILED)
+    results are cached, so later calls make no AWS requests. Raises
+    transcribe_client.exceptions.BadRequestException for unknown jobs.
+    """
+    cached = transcript_cache.get(job_name)
+    if cached is not None:
+        return cached
 
+    with trace_span('transcribe.get_transcription_job', 'client', job_name=job_name), \
+            transcribe_get_job_seconds.time():
+        response = transcribe_client.get_transcription_job(
+            TranscriptionJobName=job_name
+        )
 
+    job = response['TranscriptionJob']
+    status = job['TranscriptionJobStatus']
 
-@app.route('/transcribe-batch-async', methods=['POST'])
-def transcribe_audio_batch_async():
-    """
-    Async batch transcription endpoint using AWS Transcribe with S3.
-    Supports multiple audio formats: MP3, MP4, WAV, FLAC, OGG, AMR, WebM.
-    Starts the transcription job and returns immediately with job details.
-    Use /transcribe-job/<job_name> to check status and retrieve results.
-    """
     try:
-        # Check if S3 bucket is configured
-        if not S3_BUCKET:
-            return jsonify({'error': 'S3_BUCKET_NAME not configured in environment variables'}), 500
+        job_index.update_from_aws(job)
+    except Exception as e:
+        print(f"Error updating job index for {job_name}: {e}")
 
-        # Check if file is present
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+    result = {
+        'job_name': job_name,
+        'status': status,
+        'language_code': job.get('LanguageCode'),
+        'creation_time': job.get('CreationTime').isoformat() if job.get('CreationTime') else None,
+    }
 
-        file = request.files['file']
+    if status == 'COMPLETED':
+        # Get transcript
+        transcript_uri = job['Transcript']['TranscriptFileUri']
 
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        # Fetch transcript from URI
+        with trace_span('http.get transcript', 'client', job_name=job_name), transcript_fetch_seconds.time(), \
+                urllib.request.urlopen(transcript_uri) as url:
+            transcript_data = json.loads(url.read().decode())
 
-        # Generate unique job name and S3 key with date folder
-        from datetime import datetime
-        date_folder = datetime.now().strftime('%Y-%m-%d')
-        job_name = f"transcribe-{uuid.uuid4()}"
-        file_extension = os.path.splitext(file.filename)[1].lstrip('.')
-        s3_key = f"audio/batch/{date_folder}/{job_name}.{file_extension}"
+        transcript_text = transcript_data['results']['transcripts'][0]['transcript']
 
-        # Validate file format
-        supported_formats = ['mp3', 'mp4', 'wav', 'flac', 'ogg', 'amr', 'webm', 'm4a']
-        if file_extension.lower() not in supported_formats:
-            return jsonify({
-                'error': f'Unsupported file format: {file_extension}. Supported formats: {", ".join(supported_formats)}'
-            }), 400
+        # Add transcript and metadata
+        result['transcript'] = transcript_text
+        result['completion_time'] = job.get('CompletionTime').isoformat() if job.get('CompletionTime') else None
+        result['media_format'] = job.get('MediaFormat')
+        result['media_sample_rate_hz'] = job.get('MediaSampleRateHertz')
 
-        # Upload file to S3
-        upload_start = time.time()
-        s3_client.upload_fileobj(file, S3_BUCKET, s3_key)
-        upload_time = time.time() - upload_start
+        # Get audio URL from media URI and convert to HTTPS
+        media_uri = job.get('Media', {}).get('MediaFileUri')
+        if media_uri:
+            result['audio_url'] = s3_to_https_url(media_uri)
 
-        # Start transcription job (non-blocking)
-        file_uri = f"s3://{S3_BUCKET}/{s3_key}"
+        transcript_cache.put(job_name, result)
 
-        response = transcribe_client.start_transcription_job(
-            TranscriptionJobName=job_name,
-            Media={'MediaFileUri': file_uri},
-            MediaFormat=file_extension.lower(),
-            LanguageCode=request.form.get('language_code', 'en-US')
-        )
+    elif status == 'FAILED':
+        result['failure_reason'] = job.get('FailureReason', 'Unknown error')
+        transcript_cache.put(job_name, result)
 
-        # Return job details immediately
-        job_status = response['TranscriptionJob']['TranscriptionJobStatus']
+    elif status == 'IN_PROGRESS':
+        result['start_time'] = job.get('StartTime').isoformat() if job.get('StartTime') else None
+        result['message'] = 'Transcription is still in progress. Check again in a few seconds.'
 
-        return jsonify({
-            'job_name': job_name,
-            'status': job_status,
-            'audio_url': s3_to_https_url(file_uri),
-            'upload_time_seconds': round(upload_time, 2),
-            'language_code': request.form.get('language_code', 'en-US'),
-            'message': 'Transcription job started. Use /transcribe-job/<job_name> to check status.',
-            'status_endpoint': f'/transcribe-job/{job_name}'
-        }), 201
+    else:
+        # Handle any other status (e.g., QUEUED)
+        result['message'] = f'Job status: {status}'
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return result
 
 
 @app.route('/transcribe-job/<job_name>', methods=['GET'])
@@ -293,58 +4147,11 @@ def get_transcription_job_status(job_name):
     - IN_PROGRESS: Job is still processing
     - COMPLETED: Job finished successfully, transcript included
     - FAILED: Job failed, failure reason included
+
+    Finished jobs are served from transcript_cache without calling AWS.
     """
     try:
-        response = transcribe_client.get_transcription_job(
-            TranscriptionJobName=job_name
-        )
-
-        job = response['TranscriptionJob']
-        status = job['TranscriptionJobStatus']
-
-        result = {
-            'job_name': job_name,
-            'status': status,
-            'language_code': job.get('LanguageCode'),
-            'creation_time': job.get('CreationTime').isoformat() if job.get('CreationTime') else None,
-        }
-
-        if status == 'COMPLETED':
-            # Get transcript
-            transcript_uri = job['Transcript']['TranscriptFileUri']
-
-            # Fetch transcript from URI
-            with urllib.request.urlopen(transcript_uri) as url:
-                transcript_data = json.loads(url.read().decode())
-
-            transcript_text = transcript_data['results']['transcripts'][0]['transcript']
-
-            # Add transcript and metadata
-            result['transcript'] = transcript_text
-            result['completion_time'] = job.get('CompletionTime').isoformat() if job.get('CompletionTime') else None
-            result['media_format'] = job.get('MediaFormat')
-            result['media_sample_rate_hz'] = job.get('MediaSampleRateHertz')
-
-            # Get audio URL from media URI and convert to HTTPS
-            media_uri = job.get('Media', {}).get('MediaFileUri')
-            if media_uri:
-                result['audio_url'] = s3_to_https_url(media_uri)
-
-            return jsonify(result), 200
-
-        elif status == 'FAILED':
-            result['failure_reason'] = job.get('FailureReason', 'Unknown error')
-            return jsonify(result), 200
-
-        elif status == 'IN_PROGRESS':
-            result['start_time'] = job.get('StartTime').isoformat() if job.get('StartTime') else None
-            result['message'] = 'Transcription is still in progress. Check again in a few seconds.'
-            return jsonify(result), 200
-
-        else:
-            # Handle any other status (e.g., QUEUED)
-            result['message'] = f'Job status: {status}'
-            return jsonify(result), 200
+        return jsonify(fetch_job_result(job_name)), 200
 
     except transcribe_client.exceptions.BadRequestException:
         return jsonify({
@@ -358,64 +4165,73 @@ def get_transcription_job_status(job_name):
 @app.route('/transcribe-jobs', methods=['GET'])
 def list_transcription_jobs():
     """
-    List recent transcription jobs with optional filtering.
+    List transcription jobs started by this service, from the local job index.
 
     Query parameters:
     - status: Filter by status (QUEUED, IN_PROGRESS, COMPLETED, FAILED)
-    - max_results: Maximum number of jobs to return (default: 20, max: 100)
+    - language_code: Filter by language (e.g. en-US)
+    - created_after / created_before: ISO 8601 date or datetime bounds on creation time
+    - order: desc (newest first, default) or asc
+    - max_results: Maximum number of jobs to return (default: 20, max: 1000)
+    - cursor: next_cursor from the previous page
+    - source=aws: list straight from AWS instead (account-wide, max 100, uses next_token)
     """
     try:
-        # Get query parameters
-        status_filter = request.args.get('status')
-        max_results = min(int(request.args.get('max_results', 20)), 100)
-
-        # Build list_transcription_jobs parameters
-        list_params = {
-            'MaxResults': max_results
-        }
+        if request.args.get('source') == 'aws':
+            return list_transcription_jobs_from_aws()
 
+        status_filter = request.args.get('status')
         if status_filter:
-            valid_statuses = ['QUEUED', 'IN_PROGRESS', 'COMPLETED', 'FAILED']
-            if status_filter.upper() not in valid_statuses:
+            if status_filter.upper() not in JOB_STATUSES:
                 return jsonify({
-                    'error': f'Invalid status filter. Must be one of: {", ".join(valid_statuses)}'
+                    'error': f'Invalid status filter. Must be one of: {", ".join(JOB_STATUSES)}'
                 }), 400
-            list_params['Status'] = status_filter.upper()
-
-        # List jobs
-        response = transcribe_client.list_transcription_jobs(**list_params)
-
-        # Format job summaries
-        jobs = []
-        for job_summary in response.get('TranscriptionJobSummaries', []):
-            job_info = {
-                'job_name': job_summary.get('TranscriptionJobName'),
-                'status': job_summary.get('TranscriptionJobStatus'),
-                'language_code': job_summary.get('LanguageCode'),
-                'creation_time': job_summary.get('CreationTime').isoformat() if job_summary.get('CreationTime') else None,
-                'start_time': job_summary.get('StartTime').isoformat() if job_summary.get('StartTime') else None,
-                'completion_time': job_summary.get('CompletionTime').isoformat() if job_summary.get('CompletionTime') else None,
-            }
+            status_filter = status_filter.upper()
 
-            # Add failure reason if failed
-            if job_summary.get('FailureReason'):
-                job_info['failure_reason'] = job_summary.get('FailureReason')
+        order = request.args.get('order', 'desc').lower()
+        if order not in ('asc', 'desc'):
+            return jsonify({'error': 'order must be asc or desc'}), 400
 
-            jobs.append(job_info)
+        try:
+            max_results = max(1, min(int(request.args.get('max_results', 20)), 1000))
+            created_after = utc_iso(request.args.get('created_after'))
+            created_before = utc_iso(request.args.get('created_before'))
+        except ValueError as e:
+            return jsonify({'error': f'Invalid parameter: {e}'}), 400
+
+        cursor = request.args.get('cursor') or request.args.get('next_token')
+        language_code = request.args.get('language_code')
+        try:
+            jobs, next_cursor, total, status_counts = job_index.query(
+                status=status_filter,
+                language_code=language_code,
+                created_after=created_after,
+                created_before=created_before,
+                order=order,
+                limit=max_results,
+                cursor=cursor
+            )
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
 
         result = {
             'jobs': jobs,
             'count': len(jobs),
+            'total': total,
+            'status_counts': status_counts,
             'filters': {
                 'status': status_filter if status_filter else 'all',
+                'language_code': language_code or 'all',
+                'created_after': created_after,
+                'created_before': created_before,
+                'order': order,
                 'max_results': max_results
             }
         }
 
-        # Add next token if available (for pagination)
-        if 'NextToken' in response:
-            result['next_token'] = response['NextToken']
-            result['message'] = 'More results available. Use next_token parameter to fetch next page.'
+        if next_cursor:
+            result['next_cursor'] = next_cursor
+            result['message'] = 'More results available. Use the cursor parameter to fetch the next page.'
 
         return jsonify(result), 200
 
@@ -423,7 +4239,64 @@ def list_transcription_jobs():
         return jsonify({'error': str(e)}), 500
 
 
+def list_transcription_jobs_from_aws():
+    """Account-wide listing straight from AWS (the original /transcribe-jobs behaviour)"""
+    # Get query parameters
+    status_filter = request.args.get('status')
+    max_results = min(int(request.args.get('max_results', 20)), 100)
+
+    # Build list_transcription_jobs parameters
+    list_params = {
+        'MaxResults': max_results
+    }
+
+    if status_filter:
+        if status_filter.upper() not in JOB_STATUSES:
+            return jsonify({
+                'error': f'Invalid status filter. Must be one of: {", ".join(JOB_STATUSES)}'
+            }), 400
+        list_params['Status'] = status_filter.upper()
+
+    if request.args.get('next_token'):
+        list_params['NextToken'] = request.args.get('next_token')
+
+    # List jobs
+    response = transcribe_client.list_transcription_jobs(**list_params)
+
+    # Format job summaries
+    jobs = []
+    for job_summary in response.get('TranscriptionJobSummaries', []):
+        job_info = {
+            'job_name': job_summary.get('TranscriptionJobName'),
+            'status': job_summary.get('TranscriptionJobStatus'),
+            'language_code': job_summary.get('LanguageCode'),
+            'creation_time': job_summary.get('CreationTime').isoformat() if job_summary.get('CreationTime') else None,
+            'start_time': job_summary.get('StartTime').isoformat() if job_summary.get('StartTime') else None,
+            'completion_time': job_summary.get('CompletionTime').isoformat() if job_summary.get('CompletionTime') else None,
+        }
+
+        # Add failure reason if failed
+        if job_summary.get('FailureReason'):
+            job_info['failure_reason'] = job_summary.get('FailureReason')
+
+        jobs.append(job_info)
+
+    result = {
+        'jobs': jobs,
+        'count': len(jobs),
+        'filters': {
+            'status': status_filter if status_filter else 'all',
+            'max_results': max_results,
+            'source': 'aws'
+        }
+    }
 
+    # Add next token if available (for pagination)
+    if 'NextToken' in response:
+        result['next_token'] = response['NextToken']
+        result['message'] = 'More results available. Use next_token parameter to fetch next page.'
+
+    return jsonify(result), 200
 
 
 # Old S3-based implementation (commented out for reference)
@@ -517,6 +4390,442 @@ def list_transcription_jobs():
 #         return jsonify({'error': str(e)}), 500
 
 
+# ============================================================================
+# Gemini Summarization Executor
+# ============================================================================
+
+# Maximum Gemini calls in flight, and how many more may wait before requests get 429
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 4))
+GEMINI_MAX_QUEUE = int(os.getenv('GEMINI_MAX_QUEUE', 32))
+
+# Retries for quota (429) errors, with jittered exponential backoff from this base delay
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 1.0))
+
+GEMINI_QUOTA_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+# Longest wait (seconds) for the next streamed chunk before an SSE summary gives up
+GEMINI_STREAM_IDLE_TIMEOUT = float(os.getenv('GEMINI_STREAM_IDLE_TIMEOUT', 120))
+
+
+class SummarizerBusy(Exception):
+    """Raised when the Gemini request queue is full"""
+    def __init__(self, retry_after):
+        super().__init__(f'Summarization queue is full. Retry after {retry_after} seconds.')
+        self.retry_after = retry_after
+
+
+class SummaryStream(queue.Queue):
+    """
+    Events of one streaming Gemini call: ('delta', text) items, then
+    ('end', None) or ('error', exception). cancel() stops the call at its
+    next chunk and frees its pool slot.
+    """
+    def __init__(self):
+        super().__init__()
+        self.cancelled = threading.Event()
+        self.closed = False
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def close(self, kind, value=None):
+        """Put the final 'end' / 'error' item (only the first one counts)"""
+        if not self.closed:
+            self.closed = True
+            self.put((kind, value))
+
+
+class SummarizationExecutor:
+    """
+    Shared gateway for every Gemini call.
+
+    Reuses GenerativeModel instances and runs calls on a fixed pool of
+    max_concurrency threads. Up to max_queue further calls wait in the pool's
+    queue; beyond that submit() raises SummarizerBusy. Quota errors are
+    retried with jittered exponential backoff.
+    """
+    def __init__(self, max_concurrency, max_queue, max_retries, retry_base_delay):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='gemini')
+        self._models = {}
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def model(self, model_name):
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = genai.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def _admit(self):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise SummarizerBusy(self.retry_after())
+            self.queued += 1
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from queue depth and average call latency"""
+        average = self.latency_total / self.completed if self.completed else 10.0
+        return max(1, math.ceil((self.queued + 1) / self.max_concurrency * average))
+
+    def _backoff(self, attempt):
+        delay = self.retry_base_delay * (2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def submit(self, model_name, prompt):
+        """Queue a generate_content call; returns a Future of the response"""
+        self._admit()
+        return self._pool.submit(run_in_context(self._run), self._generate, model_name, prompt, time.monotonic())
+
+    def generate(self, model_name, prompt):
+        """Blocking generate_content call through the shared pool; returns the text"""
+        return wait_for_result(self.submit(model_name, prompt)).text
+
+    def stream(self, model_name, prompt):
+        """
+        Queue a streaming generate_content call.
+
+        Returns a SummaryStream. The call holds its pool slot until the
+        stream finishes or is cancelled.
+        """
+        self._admit()
+        events = SummaryStream()
+        future = self._pool.submit(run_in_context(self._run), self._stream_into, model_name, prompt,
+                                   time.monotonic(), events)
+
+        def end_stream_on_failure(future):
+            # Failures before _stream_into runs (e.g. creating the model) must still end the stream
+            error = concurrent.futures.CancelledError() if future.cancelled() else future.exception()
+            if error is not None:
+                events.close('error', error)
+
+        future.add_done_callback(end_stream_on_failure)
+        return events
+
+    def proxy(self, model_name):
+        """Model-like object whose generate_content() goes through this executor"""
+        executor = self
+
+        class _ExecutorModel:
+            def generate_content(self, prompt):
+                return wait_for_result(executor.submit(model_name, prompt))
+
+        return _ExecutorModel()
+
+    def _run(self, call, model_name, prompt, enqueued_at, *args):
+        started = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+            wait = started - enqueued_at
+            self.wait_time_total += wait
+            self.wait_time_max = max(self.wait_time_max, wait)
+
+        ok = False
+        try:
+            with trace_span('gemini.generate_content', 'client', model=model_name,
+                            stream=call == self._stream_into, queue_wait_seconds=round(wait, 3)):
+                result = call(self.model(model_name), prompt, *args)
+            ok = True
+            return result
+        finally:
+            latency = time.monotonic() - started
+            gemini_call_seconds.observe(latency, call='stream' if call == self._stream_into else 'generate')
+            with self._lock:
+                self.in_flight -= 1
+                if ok:
+                    self.completed += 1
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+                else:
+                    self.failed += 1
+
+    def _generate(self, model, prompt):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return model.generate_content(prompt)
+            except GEMINI_QUOTA_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(self._backoff(attempt))
+
+    def _stream_into(self, model, prompt, events):
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                for chunk in model.generate_content(prompt, stream=True):
+                    if events.cancelled.is_set():
+                        # Client went away: stop reading and release the slot
+                        events.close('end')
+                        return
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunk without text parts (e.g. only safety metadata)
+                        continue
+                    if text:
+                        started = True
+                        events.put(('delta', text))
+                events.close('end')
+                return
+            except GEMINI_QUOTA_ERRORS as e:
+                # Only retry if nothing has been sent to the client yet
+                if started or attempt == self.max_retries or events.cancelled.is_set():
+                    events.close('error', e)
+                    raise
+                self.retries += 1
+                time.sleep(self._backoff(attempt))
+            except Exception as e:
+                events.close('error', e)
+                raise
+
+    def stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'queue_depth': self.queued,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'retries': self.retries,
+            'avg_wait_seconds': round(self.wait_time_total / max(1, self.completed + self.failed), 3),
+            'max_wait_seconds': round(self.wait_time_max, 3),
+            'avg_latency_seconds': round(self.latency_total / max(1, self.completed), 3),
+            'max_latency_seconds': round(self.latency_max, 3)
+        }
+
+
+summarizer = SummarizationExecutor(GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE, GEMINI_MAX_RETRIES, GEMINI_RETRY_BASE_DELAY)
+
+
+# ============================================================================
+# Long-Transcript (Map-Reduce) Summarization
+# ============================================================================
+
+# Transcripts longer than this (characters) are summarized chunk by chunk
+SUMMARY_MAP_REDUCE_THRESHOLD = int(os.getenv('SUMMARY_MAP_REDUCE_THRESHOLD', 60000))
+
+# Approximate token budget per chunk, and how many chunk calls run at once
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 8000))
+SUMMARY_MAP_WORKERS = int(os.getenv('SUMMARY_MAP_WORKERS', 4))
+
+# Map-reduce runs coordinate their chunk calls on these threads, so requests wait on the hub
+map_reduce_pool = concurrent.futures.ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY,
+                                                        thread_name_prefix='map-reduce')
+
+# Sentence = run of text up to and including its terminal punctuation (Latin or CJK)
+_SENTENCE_RE = re.compile(r'[^.!?。！？]+[.!?。！？]*\s*|[.!?。！？]+\s*')
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    """Rough token count: ~1 token per CJK character, ~4 characters per token otherwise"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_transcript(transcript, max_tokens):
+    """Split a transcript at sentence boundaries into chunks of at most ~max_tokens"""
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for sentence in _SENTENCE_RE.findall(transcript):
+        tokens = estimate_tokens(sentence)
+
+        # A single overlong sentence is cut into evenly sized pieces
+        pieces = [sentence]
+        if tokens > max_tokens:
+            piece_chars = max(1, len(sentence) * max_tokens // tokens)
+            pieces = [sentence[i:i + piece_chars] for i in range(0, len(sentence), piece_chars)]
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(''.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append(''.join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def build_map_prompt(chunk, index, total, language_name):
+    return f"""The following is part {index} of {total} of a longer transcript. Write concise notes in {language_name} covering:
+- The main topics discussed
+- Key points
+- Any tasks, decisions, or follow-up actions mentioned
+- Any specific dates, numbers, names, or technical details mentioned
+
+Use bullet points and only include information found in this part.
+
+Transcript part {index} of {total}:
+{chunk}"""
+
+
+def build_reduce_prompt(notes, language_name, custom_prompt=None):
+    combined = '\n\n'.join(f'Notes for part {i} of {len(notes)}:\n{note}' for i, note in enumerate(notes, 1))
+    if custom_prompt:
+        return custom_prompt.replace('{transcript}', combined)
+    return f"""The following are notes taken from consecutive parts of one long transcript. Using them, provide a comprehensive summary of the whole transcript in {language_name}.
+
+{combined}
+
+Please provide:
+1. **Overall Summary**: A concise overview of the main topic and discussion (2-3 sentences)
+2. **Key Points**: List the main points discussed (bullet points)
+3. **Action Items**: Any tasks, decisions, or follow-up actions mentioned (if any)
+4. **Important Details**: Any specific dates, numbers, names, or technical details mentioned
+
+Format your response in a clear, structured way. Respond entirely in {language_name}."""
+
+
+def summarize_chunks(transcript, language_name, model,
+                     max_chunk_tokens=SUMMARY_CHUNK_TOKENS, max_workers=SUMMARY_MAP_WORKERS):
+    """
+    Map stage: split the transcript and summarize the chunks concurrently.
+
+    Returns (notes, info) with one note per chunk, in transcript order.
+    """
+    split_start = time.time()
+    chunks = split_transcript(transcript, max_chunk_tokens)
+    split_time = time.time() - split_start
+
+    def summarize_chunk(indexed_chunk):
+        index, chunk = indexed_chunk
+        return model.generate_content(build_map_prompt(chunk, index, len(chunks), language_name)).text
+
+    map_start = time.time()
+    workers = max(1, min(max_workers, len(chunks)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        notes = list(pool.map(run_in_context(summarize_chunk), enumerate(chunks, 1)))
+    map_time = time.time() - map_start
+
+    return notes, {
+        'chunk_count': len(chunks),
+        'map_workers': workers,
+        'timings_seconds': {
+            'split': round(split_time, 3),
+            'map': round(map_time, 3)
+        }
+    }
+
+
+def map_reduce_summarize(transcript, language_name, model, custom_prompt=None,
+                         max_chunk_tokens=SUMMARY_CHUNK_TOKENS, max_workers=SUMMARY_MAP_WORKERS):
+    """
+    Summarize a long transcript: summarize sentence-aligned chunks concurrently,
+    then combine the chunk notes in a final reduce call.
+
+    `model` is anything with generate_content(prompt) returning an object with
+    a .text attribute, so a stub can stand in for Gemini.
+
+    Returns (summary_text, info) where info holds chunk counts and stage timings.
+    """
+    total_start = time.time()
+    notes, info = summarize_chunks(transcript, language_name, model, max_chunk_tokens, max_workers)
+
+    reduce_start = time.time()
+    summary = model.generate_content(build_reduce_prompt(notes, language_name, custom_prompt)).text
+
+    info['timings_seconds']['reduce'] = round(time.time() - reduce_start, 3)
+    info['timings_seconds']['total'] = round(time.time() - total_start, 3)
+    return summary, info
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_summary(model_name, prompt, cache_key, metadata, first_events=None, map_reduce_info=None,
+                   start=None):
+    """
+    Generator of SSE events for a summary: 'delta' events with text as Gemini
+    produces it, then one 'done' event with metadata and timings.
+
+    first_events is an already admitted summarizer.stream() queue. For
+    map-reduce it streams the reduce pass, and map_reduce_info (from the map
+    stage the caller ran) adds a 'progress' event and the done metadata.
+    """
+    start = start or time.time()
+    first_token_time = None
+    timings = {}
+    events = first_events
+
+    try:
+        entry = summary_cache.get(cache_key)
+        if entry is not None:
+            summary_cache.hits += 1
+            yield sse_event('delta', {'text': entry[0]})
+            timings['time_to_first_token'] = round(time.time() - start, 3)
+            timings['total'] = timings['time_to_first_token']
+            yield sse_event('done', {**metadata, 'cached': True,
+                                     'cache_age_seconds': round(time.time() - entry[1], 1),
+                                     'timings_seconds': timings})
+            return
+
+        summary_cache.misses += 1
+        done_metadata = dict(metadata)
+
+        if map_reduce_info:
+            done_metadata['map_reduce'] = map_reduce_info
+            yield sse_event('progress', {'stage': 'reduce', 'chunk_count': map_reduce_info['chunk_count']})
+
+        if events is None:
+            events = summarizer.stream(model_name, prompt)
+        parts = []
+        while True:
+            # Poll for each streamed chunk on the hub: an open stream holds no tpool thread
+            try:
+                kind, value = wait_for_item(events, timeout=GEMINI_STREAM_IDLE_TIMEOUT)
+            except queue.Empty:
+                raise TimeoutError(f'No summary output for {GEMINI_STREAM_IDLE_TIMEOUT:g} seconds')
+            if kind == 'end':
+                break
+            if kind == 'error':
+                raise value
+            if first_token_time is None:
+                first_token_time = time.time() - start
+            parts.append(value)
+            yield sse_event('delta', {'text': value})
+
+        summary = ''.join(parts)
+        summary_cache.put(cache_key, summary, time.time())
+
+        timings['time_to_first_token'] = round(first_token_time, 3) if first_token_time is not None else None
+        timings['total'] = round(time.time() - start, 3)
+        yield sse_event('done', {**done_metadata, 'cached': False, 'cache_age_seconds': 0,
+                                 'timings_seconds': timings})
+
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+
+    finally:
+        # Client disconnected, cache hit or failure: stop a Gemini stream nobody reads
+        if events is not None:
+            events.cancel()
+
+
 @app.route('/summarize-transcript', methods=['POST'])
 def summarize_transcript():
     """
@@ -524,6 +4833,10 @@ def summarize_transcript():
     Accepts JSON with 'transcript' field or form data with 'transcript'.
     Optional 'custom_prompt' to customize the summarization prompt.
     Optional 'summary_language' to specify output language (zh-HK, zh-CN, en).
+    Transcripts longer than SUMMARY_MAP_REDUCE_THRESHOLD characters are
+    summarized with map_reduce_summarize().
+    With ?stream=1 (or "stream": true) the summary is streamed as
+    Server-Sent Events instead of one JSON body.
     """
     try:
         # Check if Gemini is configured
@@ -538,10 +4851,13 @@ def summarize_transcript():
             transcript = data.get('transcript')
             custom_prompt = data.get('custom_prompt')
             summary_language = data.get('summary_language', 'en')
+            stream = data.get('stream') in (True, 1, '1', 'true')
         else:
             transcript = request.form.get('transcript')
             custom_prompt = request.form.get('custom_prompt')
             summary_language = request.form.get('summary_language', 'en')
+            stream = request.form.get('stream') in ('1', 'true')
+        stream = stream or request.args.get('stream') in ('1', 'true')
 
         if not transcript:
             return jsonify({'error': 'No transcript provided'}), 400
@@ -567,22 +4883,73 @@ Please provide:
 Format your response in a clear, structured way. Respond entirely in {language_name}."""
 
         # Use Gemini 2.5 Flash model
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model_name = 'gemini-2.5-flash'
+
+        use_map_reduce = len(transcript) > SUMMARY_MAP_REDUCE_THRESHOLD
+        map_reduce_info = {}
+        cache_key = SummaryCache.make_key(model_name, summary_language, prompt)
+
+        if stream:
+            metadata = {
+                'model': model_name,
+                'summary_language': summary_language,
+                'transcript_length': len(transcript),
+                'mode': 'map_reduce' if use_map_reduce else 'single'
+            }
+            # Every Gemini call is admitted before the response starts, so a full queue
+            # is still a clean 429: the map stage runs here and only the final pass streams
+            stream_start = time.time()
+            first_events = None
+            if summary_cache.get(cache_key) is None:
+                if use_map_reduce:
+                    notes, map_reduce_info = wait_for_result(map_reduce_pool.submit(
+                        run_in_context(summarize_chunks), transcript, language_name, summarizer.proxy(model_name)))
+                    first_events = summarizer.stream(
+                        model_name, build_reduce_prompt(notes, language_name, custom_prompt))
+                else:
+                    first_events = summarizer.stream(model_name, prompt)
+
+            return Response(
+                stream_with_context(stream_summary(model_name, prompt, cache_key, metadata, first_events,
+                                                   map_reduce_info, stream_start)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
 
-        # Generate summary
-        response = model.generate_content(prompt)
+        def generate():
+            if use_map_reduce:
+                summary, info = wait_for_result(map_reduce_pool.submit(
+                    run_in_context(map_reduce_summarize), transcript, language_name,
+                    summarizer.proxy(model_name), custom_prompt))
+                map_reduce_info.update(info)
+                return summary
+            return summarizer.generate(model_name, prompt)
 
-        # Create response with explicit UTF-8 encoding for proper Unicode display
-        result = jsonify({
+        # Generate summary (or reuse a cached / in-flight one for the same prompt)
+        summary, created_at, cached = summary_cache.get_or_generate(cache_key, generate)
+
+        payload = {
             'success': True,
-            'summary': response.text,
-            'model': 'gemini-2.5-flash',
+            'summary': summary,
+            'model': model_name,
             'summary_language': summary_language,
-            'transcript_length': len(transcript)
-        })
+            'transcript_length': len(transcript),
+            'mode': 'map_reduce' if use_map_reduce else 'single',
+            'cached': cached,
+            'cache_age_seconds': round(time.time() - created_at, 1) if cached else 0
+        }
+        if map_reduce_info:
+            payload['map_reduce'] = map_reduce_info
+
+        # Create response with explicit UTF-8 encoding for proper Unicode display
+        result = jsonify(payload)
         result.headers['Content-Type'] = 'application/json; charset=utf-8'
         return result, 200
 
+    except SummarizerBusy as e:
+        result = jsonify({'error': str(e), 'retry_after_seconds': e.retry_after})
+        result.headers['Retry-After'] = str(e.retry_after)
+        return result, 429
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -593,6 +4960,113 @@ def health_check():
     return jsonify({'status': 'healthy'}), 200
 
 
+@app.route('/stats', methods=['GET'])
+def service_stats():
+    """Runtime gauges for capacity planning"""
+    sessions = list(active_sessions.values())
+    queues = [session._chunk_queue for session in sessions if session._chunk_queue]
+    return jsonify({
+        'realtime': {
+            'active_sessions': len(sessions),
+            'max_sessions': REALTIME_MAX_SESSIONS,
+            'language_limits': REALTIME_MAX_SESSIONS_PER_LANGUAGE,
+            'admission_refusals': admission_refusals,
+            'queued_chunks': sum(len(chunk_queue) for chunk_queue in queues),
+            'chunks_dropped': sum(chunk_queue.dropped for chunk_queue in queues),
+            'chunks_rejected': sum(chunk_queue.rejected for chunk_queue in queues),
+            'audio_memory_bytes': AudioBuffer.memory_bytes,
+            'audio_spilled_bytes': AudioBuffer.spilled_bytes,
+            'audio_memory_limit_bytes': REALTIME_MAX_BUFFERED_BYTES,
+            'sessions': [{
+                'session_id': session.session_id,
+                'language_code': session.language_code,
+                'bytes_held': session.bytes_held,
+                'media_encoding': session.media_encoding,
+                'queue': session._chunk_queue.stats() if session._chunk_queue else None,
+                'input_format': session.converter.describe() if session.converter else None,
+                'convert_seconds': round(session.convert_seconds, 3),
+                'chunks_received': session.chunks_received,
+                'vad': session.vad.stats() if session.vad else None,
+                'rechunker': session.rechunker.stats() if session.rechunker else None,
+                'results': session.handler.stats() if session.handler else None,
+                'spilled': session.audio_buffer is not None and session.audio_buffer.spilled,
+                'handshake_ms': round(session.handshake_seconds * 1000, 1) if session.handshake_seconds is not None else None,
+                'start_ms': round(session.start_seconds * 1000, 1) if session.start_seconds is not None else None
+            } for session in sessions]
+        },
+        'session_start': {
+            'time_to_started': session_start_seconds.stats(),
+            'stream_handshake': stream_handshake_seconds.stats(),
+            'clients': streaming_clients.stats()
+        },
+        'transcript_cache': transcript_cache.stats(),
+        'job_watcher': job_watcher.stats(),
+        'summary_cache': summary_cache.stats(),
+        'dedup_index': content_index.stats(),
+        'job_index': job_index_reconciler.stats(),
+        'workers': run_blocking(session_registry.stats),
+        'gemini': summarizer.stats(),
+        'tracing': tracer.stats()
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Latency histograms, gauges and counters in the Prometheus text format"""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def debug_request_allowed():
+    """The debug token comes from a header only, never the query string (which ends up in access logs)"""
+    token = request.headers.get('X-Debug-Token')
+    if token is None:
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        token = credentials.strip() if scheme.lower() == 'bearer' else None
+    return debug_token_valid(token)
+
+
+@app.route('/debug/traces', methods=['GET'])
+def debug_traces():
+    """
+    Recently finished spans as OTLP/JSON (ExportTraceServiceRequest)
+
+    Query parameters: trace_id (only that trace), limit (most recent N spans)
+    """
+    if not debug_request_allowed():
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        limit = request.args.get('limit', type=int)
+        payload = tracer.otlp(tracer.find(request.args.get('trace_id'), limit))
+        payload['stats'] = tracer.stats()
+        return jsonify(payload), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/debug/profiles', methods=['GET'])
+def debug_profiles():
+    """Profiles kept in memory, oldest first"""
+    if not debug_request_allowed():
+        return jsonify({'error': 'Not found'}), 404
+    with profiles_lock:
+        summaries = [profiler.summary() for profiler in profiles.values()]
+    return jsonify({'profiles': summaries}), 200
+
+
+@app.route('/debug/profiles/<profile_id>', methods=['GET'])
+def debug_profile(profile_id):
+    """One profile as folded stacks (flamegraph.pl / speedscope input)"""
+    if not debug_request_allowed():
+        return jsonify({'error': 'Not found'}), 404
+    with profiles_lock:
+        profiler = profiles.get(profile_id)
+    if not profiler:
+        return jsonify({'error': f'Profile not found: {profile_id}'}), 404
+    if profiler.duration is None:
+        return jsonify({'error': 'Profile still running', **profiler.summary()}), 409
+    return Response(profiler.folded(), content_type='text/plain; charset=utf-8')
+
+
 # ============================================================================
 # WebSocket Real-Time Transcription Endpoints
 # ============================================================================
@@ -605,62 +5079,237 @@ def handle_connect():
 
 
 @socketio.on('disconnect')
+@traced_event('ws disconnect')
 def handle_disconnect():
     """Handle client disconnection and cleanup"""
     print(f"Client disconnected: {request.sid}")
+    job_subscriptions.pop(request.sid, None)
 
     # Cleanup session if exists
-    if request.sid in active_sessions:
-        session = active_sessions[request.sid]
-
-        # Run cleanup in async context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    session = release_session(request.sid)
+    if session:
         try:
-            loop.run_until_complete(session.stop())
-        finally:
-            loop.close()
+            wait_for_result(session.runner.submit(session.stop()))
+            wait_for_result(session.runner.submit(session.discard_audio()))
+        except Exception as e:
+            print(f"Error stopping session on disconnect: {e}")
 
-        del active_sessions[request.sid]
         print(f"Session cleaned up for: {request.sid}")
 
 
+# sid -> job names followed through subscribe_job (bounded by JOB_SUBSCRIBE_MAX_PER_SID)
+job_subscriptions = {}
+
+
+def is_known_job(job_name):
+    """Whether a job was started (or handed an upload URL) by this deployment"""
+    return (transcript_cache.get(job_name) is not None
+            or job_watcher.is_tracking(job_name)
+            or pending_uploads.get(job_name) is not None
+            or job_index.get(job_name) is not None)
+
+
+@socketio.on('subscribe_job')
+def handle_subscribe_job(data):
+    """
+    Receive job_completed / job_failed events for a batch job
+
+    Expected data format:
+    {
+        "job_name": "transcribe-..."
+    }
+    """
+    job_name = (data or {}).get('job_name')
+    if not job_name or not isinstance(job_name, str):
+        emit('error', {'message': 'job_name is required'})
+        return
+
+    subscriptions = job_subscriptions.setdefault(request.sid, set())
+    if job_name not in subscriptions:
+        if len(subscriptions) >= JOB_SUBSCRIBE_MAX_PER_SID:
+            emit('error', {'message': f'At most {JOB_SUBSCRIBE_MAX_PER_SID} jobs can be followed per connection',
+                           'code': 'too_many_subscriptions'})
+            return
+        if not run_blocking(is_known_job, job_name):
+            emit('error', {'message': f'Unknown job: {job_name}', 'code': 'unknown_job'})
+            return
+        subscriptions.add(job_name)
+
+    join_room(f'job:{job_name}')
+
+    # Already finished: answer now instead of waiting for the watcher. A job finished
+    # before a restart is not in the cache, so untracked jobs are checked with AWS
+    result = transcript_cache.get(job_name)
+    if result is None and not job_watcher.is_tracking(job_name):
+        try:
+            result = run_blocking(fetch_job_result, job_name)
+        except Exception as e:
+            # Not started yet (pending direct upload) or AWS unreachable: the watcher picks it up
+            print(f"Could not check status of {job_name}: {e}")
+    if result is not None and result.get('status') in ('COMPLETED', 'FAILED'):
+        emit('job_completed' if result['status'] == 'COMPLETED' else 'job_failed', result)
+    elif not job_watcher.is_tracking(job_name):
+        job_watcher.track(job_name)
+
+
+@socketio.on('unsubscribe_job')
+def handle_unsubscribe_job(data):
+    """Stop receiving events for a batch job"""
+    job_name = (data or {}).get('job_name')
+    if job_name:
+        leave_room(f'job:{job_name}')
+        job_subscriptions.get(request.sid, set()).discard(job_name)
+
+
 @socketio.on('start_transcription')
+@traced_event('ws start_transcription')
 def handle_start_transcription(data):
     """
     Start a new real-time transcription session
 
     Expected data format:
     {
-        "language_code": "en-US"  # Optional, defaults to en-US
+        "language_code": "en-US",  # Optional, defaults to en-US
+        "sample_rate": 48000,      # Optional, input sample rate in Hz (default 16000)
+        "channels": 2,             # Optional, interleaved input channels (default 1)
+        "sample_format": "f32",    # Optional, s16 or f32 little-endian (default s16)
+        "vad": true,               # Optional, skip silence (default REALTIME_VAD)
+        "result_mode": "delta",    # Optional, full or delta results (default REALTIME_RESULT_MODE)
+        "media_encoding": "pcm",   # Optional, pcm, flac or ogg-opus (default pcm)
+        "traceparent": "00-...",   # Optional, W3C trace context to continue
+        "profile": "<token>"       # Optional, DEBUG_TOKEN: profile this session's event loop
     }
+
+    With flac / ogg-opus, chunks are consecutive pieces of one mono encoded
+    stream at sample_rate; they are forwarded and archived without decoding.
     """
+    received = time.monotonic()
     try:
+        # One session per connection: a second start would orphan the running stream and upload
+        if request.sid in active_sessions:
+            emit('error', {'message': 'A transcription session is already active. Stop it first.',
+                           'code': 'session_active'})
+            return
+
         language_code = data.get('language_code', 'en-US')
 
-        print(f"Starting transcription for {request.sid} with language: {language_code}")
+        media_encoding = data.get('media_encoding', 'pcm')
+        if media_encoding not in MEDIA_ENCODINGS:
+            emit('error', {'message': f'media_encoding must be one of: {", ".join(MEDIA_ENCODINGS)}'})
+            return
+
+        if media_encoding == 'pcm':
+            # Convert on the server unless the client already sends 16 kHz mono s16
+            try:
+                # Designing the resampling filter is CPU work: keep it off the hub
+                converter = run_blocking(
+                    AudioConverter,
+                    data.get('sample_rate', TARGET_SAMPLE_RATE),
+                    data.get('channels', 1),
+                    data.get('sample_format', 's16')
+                )
+            except (TypeError, ValueError) as e:
+                emit('error', {'message': f'Invalid audio format: {str(e)}'})
+                return
+            media_sample_rate = TARGET_SAMPLE_RATE
+            input_format = {'media_encoding': media_encoding, **converter.describe()}
+            use_vad = data.get('vad', REALTIME_VAD)
+        else:
+            # No decoder on the server: compressed audio goes to Transcribe as sent
+            converter = None
+            try:
+                media_sample_rate = int(data.get('sample_rate', TARGET_SAMPLE_RATE))
+                channels = int(data.get('channels', 1))
+            except (TypeError, ValueError) as e:
+                emit('error', {'message': f'Invalid audio format: {str(e)}'})
+                return
+            if not COMPRESSED_SAMPLE_RATES[0] <= media_sample_rate <= COMPRESSED_SAMPLE_RATES[1]:
+                emit('error', {'message': f'Invalid audio format: sample_rate must be between '
+                                          f'{COMPRESSED_SAMPLE_RATES[0]} and {COMPRESSED_SAMPLE_RATES[1]} for {media_encoding}'})
+                return
+            if channels != 1:
+                emit('error', {'message': f'Invalid audio format: {media_encoding} audio must be mono'})
+                return
+            if data.get('vad'):
+                emit('error', {'message': f'VAD needs PCM input and is not available with {media_encoding}'})
+                return
+            input_format = {'media_encoding': media_encoding, 'sample_rate': media_sample_rate, 'channels': 1}
+            use_vad = False
+
+        print(f"Starting transcription for {request.sid} with language: {language_code}, input: {input_format}")
+
+        # Create new session, pinned to one of the shared event loops
+        runner = loop_pool.runner_for(request.sid)
+        result_mode = data.get('result_mode', REALTIME_RESULT_MODE)
+        if result_mode not in RESULT_MODES:
+            emit('error', {'message': f'result_mode must be one of: {", ".join(RESULT_MODES)}'})
+            return
+
+        vad = new_vad() if use_vad else None
+        session = TranscriptionSession(request.sid, language_code, runner,
+                                       None if not converter or converter.is_passthrough else converter,
+                                       vad, result_mode, media_encoding, media_sample_rate)
+        with trace_span('registry.register'):
+            refused = run_blocking(session_registry.register, request.sid,
+                                   max_sessions=REALTIME_MAX_SESSIONS,
+                                   max_language_sessions=language_session_limit(language_code),
+                                   language_code=language_code, media_encoding=media_encoding)
+        if refused:
+            refuse_session(refused, language_code)
+            return
+        if active_sessions.setdefault(request.sid, session) is not session:
+            # Lost a race with a concurrent start on this connection; its registry entry is kept
+            emit('error', {'message': 'A transcription session is already active. Stop it first.',
+                           'code': 'session_active'})
+            return
 
-        # Create new session
-        session = TranscriptionSession(request.sid, language_code)
-        active_sessions[request.sid] = session
+        # Opt-in profile of the event loop thread the session runs on (shared with other sessions)
+        if debug_token_valid(data.get('profile')):
+            session.profiler = start_profile(f'session {request.sid} on {runner.name}', runner._thread.ident)
 
-        # Start AWS Transcribe stream
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Start AWS Transcribe stream on the session's loop
         try:
-            loop.run_until_complete(session.start())
-            emit('transcription_started', {
+            with trace_span('transcribe.start_stream_transcription', 'client') as span:
+                wait_for_result(runner.submit(session.start()))
+                span.set(handshake_ms=round(session.handshake_seconds * 1000, 1))
+
+            if active_sessions.get(request.sid) is not session:
+                # The client disconnected while the stream was opening; its cleanup found nothing to close yet
+                print(f"Client {request.sid} left during session start, closing its stream")
+                try:
+                    wait_for_result(runner.submit(session.stop()))
+                    wait_for_result(runner.submit(session.discard_audio()))
+                except Exception as stop_error:
+                    print(f"Error stopping abandoned session: {stop_error}")
+                return
+
+            # Lets another worker abandon the S3 upload if this one dies mid-session
+            with trace_span('registry.update'):
+                run_blocking(session_registry.update, request.sid, s3_key=session.s3_key,
+                             upload_id=session.upload.upload_id if session.upload else None)
+
+            started = {
                 'status': 'success',
                 'message': 'Transcription session started. Send audio chunks now.',
-                'language_code': language_code
-            })
+                'language_code': language_code,
+                'input_format': input_format,
+                'vad': vad is not None,
+                'result_mode': result_mode
+            }
+            if session.profiler:
+                started['profile_id'] = session.profiler.profile_id
+            emit('transcription_started', started)
+            session.start_seconds = time.monotonic() - received
+            session_start_seconds.observe(session.start_seconds)
         except Exception as e:
             emit('error', {'message': f'Failed to start transcription: {str(e)}'})
-            if request.sid in active_sessions:
-                del active_sessions[request.sid]
-        finally:
-            # Don't close the loop - we need it for the session
-            pass
+            release_session(request.sid)
+            # The stream and upload may already be open (e.g. the registry update failed)
+            try:
+                wait_for_result(runner.submit(session.stop()))
+                wait_for_result(runner.submit(session.discard_audio()))
+            except Exception as stop_error:
+                print(f"Error stopping session after failed start: {stop_error}")
 
     except Exception as e:
         print(f"Error starting transcription: {e}")
@@ -674,30 +5323,81 @@ def handle_audio_chunk(data):
 
     Expected data format:
     {
-        "chunk": <base64 encoded audio data or raw bytes>
+        "chunk": <raw bytes (binary attachment) or base64 encoded audio data>
     }
     """
+    receive_audio(data)
+
+
+@socketio.on('audio_frame')
+def handle_audio_frame(data):
+    """
+    Receive a binary audio frame: the event's only argument is the raw audio
+    bytes, with no JSON wrapper (the lightest form on the wire)
+    """
+    receive_audio(data)
+
+
+# Sessions refused by admission control, by limit
+admission_refusals = {'global': 0, 'language': 0}
+
+
+def refuse_session(limit, language_code):
+    """Tell the client the server is at capacity and when to try again"""
+    admission_refusals[limit] += 1
+    retry_after = round(REALTIME_BUSY_RETRY_SECONDS * random.uniform(1, 2), 1)
+    if limit == 'global':
+        message = f'Server is at capacity ({REALTIME_MAX_SESSIONS} sessions). Retry in {retry_after}s.'
+    else:
+        message = (f'Too many {language_code} sessions ({language_session_limit(language_code)}). '
+                   f'Retry in {retry_after}s.')
+    payload = {'message': message, 'code': 'busy', 'limit': limit, 'retry_after': retry_after}
+    print(f"Refused session for {request.sid}: {message}")
+    emit('busy', payload)
+    # Also as an error for clients that only listen for errors
+    emit('error', payload)
+
+
+def receive_audio(data):
     try:
         session = active_sessions.get(request.sid)
 
         if not session:
+            owner = run_blocking(session_registry.owner, request.sid)
+            if owner and owner != WORKER_ID:
+                # The connection moved to another worker: sticky routing is not in place
+                emit('error', {'message': f'Session is owned by worker {owner}; audio must reach the same worker.'})
+                return
             emit('error', {'message': 'No active transcription session. Call start_transcription first.'})
             return
 
-        # Extract audio chunk (handle both base64 and raw bytes)
-        chunk = data.get('chunk')
-        if isinstance(chunk, str):
-            # If base64 string, decode it
-            import base64
-            chunk = base64.b64decode(chunk)
+        if not session.is_active:
+            return
+
+        # Binary attachments are used as-is; base64 strings are decoded (legacy clients)
+        chunk, encoding = audio_payload(data)
+        session.chunks_received[encoding] += 1
+        realtime_chunks_received.inc(session_id=request.sid, encoding=encoding)
+        realtime_bytes_received.inc(len(chunk), session_id=request.sid)
+        if session.handler and session.handler.first_audio_at is None:
+            session.handler.first_audio_at = time.monotonic()
+
+        # Hand the chunk to the session's event loop; results arrive asynchronously
+        if session.enqueue_audio_chunk(chunk):
+            session.overflowing = False
+            return
 
-        # Send chunk to AWS Transcribe
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(session.send_audio_chunk(chunk))
-        finally:
-            loop.close()
+        # Queue full and the policy refuses new chunks
+        if REALTIME_QUEUE_OVERFLOW == 'disconnect':
+            print(f"Audio queue overflow for {request.sid}, disconnecting")
+            emit('error', {'message': 'Audio is arriving faster than it can be processed; session ended.',
+                           'code': 'queue_overflow'})
+            disconnect()
+        elif not session.overflowing:
+            # Report once per overflow episode rather than for every refused chunk
+            session.overflowing = True
+            emit('error', {'message': 'Audio queue is full; chunks are being rejected. Slow down.',
+                           'code': 'queue_full'})
 
     except Exception as e:
         print(f"Error processing audio chunk: {e}")
@@ -705,6 +5405,7 @@ def handle_audio_chunk(data):
 
 
 @socketio.on('stop_transcription')
+@traced_event('ws stop_transcription')
 def handle_stop_transcription():
     """Stop the transcription session and save audio to S3"""
     try:
@@ -714,20 +5415,22 @@ def handle_stop_transcription():
             emit('error', {'message': 'No active transcription session'})
             return
 
-        # Stop the stream and save audio to S3
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Stop the transcription stream, then save buffered audio to S3
+        saved = False
         try:
-            # Stop the transcription stream
-            loop.run_until_complete(session.stop())
-
-            # Save buffered audio to S3
-            s3_url = loop.run_until_complete(session.save_to_s3())
+            with trace_span('session.stop'):
+                wait_for_result(session.runner.submit(session.stop()))
+            with trace_span('session.save_to_s3', 'client'):
+                s3_url = wait_for_result(session.runner.submit(session.save_to_s3()))
+            saved = True
         finally:
-            loop.close()
-
-        # Remove session
-        del active_sessions[request.sid]
+            # Free the session and its registry slot even if stopping failed, so the client can start again
+            release_session(request.sid)
+            if not saved:
+                try:
+                    wait_for_result(session.runner.submit(session.discard_audio()))
+                except Exception as e:
+                    print(f"Error discarding audio for {request.sid}: {e}")
 
         # Prepare response
         response = {
@@ -739,6 +5442,12 @@ def handle_stop_transcription():
         if s3_url:
             response['audio_url'] = s3_to_https_url(s3_url)
 
+        if session.vad:
+            response['vad'] = session.vad.stats()
+
+        if session.profiler:
+            response['profile_id'] = session.profiler.profile_id
+
         emit('transcription_stopped', response)
 
         print(f"Transcription stopped for: {request.sid}")
@@ -763,4 +5472,5 @@ if __name__ == '__main__':
     print("=" * 50 + "\n")
 
     # Use socketio.run instead of app.run to enable WebSocket support
-    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
+    # PORT lets several workers run side by side (see "Scaling Out" in WEBSOCKET_IMPLEMENTATION.md)
+    socketio.run(app, host='0.0.0.0', port=int(os.getenv('PORT', 5001)), debug=True)
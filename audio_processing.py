@@ -0,0 +1,308 @@
+"""
+Audio conversion for real-time transcription.
+
+AWS Transcribe Streaming is fed 16 kHz mono 16-bit little-endian PCM.
+AudioConverter turns whatever the client records (common sample rates, 1-8
+channels, s16 or f32 samples) into that format chunk by chunk, keeping
+resampler state between chunks so the output is continuous.
+"""
+
+import binascii
+import functools
+import math
+from collections import deque
+
+import numpy as np
+
+
+TARGET_SAMPLE_RATE = 16000
+
+# Little-endian sample types accepted from clients
+SAMPLE_FORMATS = {
+    's16': np.dtype('<i2'),
+    'f32': np.dtype('<f4'),
+}
+
+# Input rates with small up/down ratios to 16 kHz. The filter grows with the reduced
+# ratio, so arbitrary rates (e.g. 44101 Hz) would cost seconds and hundreds of MB to design
+SUPPORTED_SAMPLE_RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000, 96000)
+MAX_CHANNELS = 8
+
+
+def audio_payload(data):
+    """
+    Extract the audio bytes from an audio_chunk / audio_frame payload.
+
+    Binary payloads (a Socket.IO attachment, bare or as {"chunk": ...}) are
+    returned as-is without copying; base64 strings are decoded. Returns
+    (chunk, 'binary' | 'base64').
+    """
+    if isinstance(data, dict):
+        data = data.get('chunk')
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data, 'binary'
+    if isinstance(data, str):
+        # a2b_base64 takes the str directly, avoiding b64decode's ASCII re-encode
+        return binascii.a2b_base64(data), 'base64'
+    raise ValueError('Audio payload must be binary or a base64 string')
+
+
+@functools.lru_cache(maxsize=None)
+def design_lowpass(up, down, zero_crossings=16, rolloff=0.9, beta=8.6):
+    """
+    Kaiser-windowed sinc lowpass for resampling by up/down.
+
+    Returned as a read-only polyphase matrix of shape (up, taps_per_phase),
+    scaled by `up` so the passband gain after zero-stuffing is 1. Cached, so
+    sessions at the same rate share one matrix.
+    """
+    cutoff = rolloff * 0.5 / max(up, down)  # cycles per sample at the upsampled rate
+    taps_per_phase = int(math.ceil(2 * zero_crossings * max(up, down) / up / rolloff))
+    length = taps_per_phase * up
+
+    n = np.arange(length) - (length - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * up
+
+    # phases[p, k] = taps[p + k * up]
+    phases = taps.reshape(taps_per_phase, up).T.astype(np.float32)
+    phases.flags.writeable = False
+    return phases
+
+
+class StreamingResampler:
+    """
+    Rational polyphase resampler (input_rate -> output_rate) for a mono
+    float32 stream delivered in arbitrary-sized pieces.
+
+    The last taps_per_phase - 1 input samples and the output phase are kept
+    between calls, so resampling a stream piecewise gives the same samples
+    as resampling it in one go.
+    """
+    def __init__(self, input_rate, output_rate=TARGET_SAMPLE_RATE):
+        g = math.gcd(input_rate, output_rate)
+        self.up = output_rate // g
+        self.down = input_rate // g
+        self.phases = design_lowpass(self.up, self.down)
+        self.taps_per_phase = self.phases.shape[1]
+
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        # Upsampled-time index of the next output sample, relative to the start of _history
+        self._next = (self.taps_per_phase - 1) * self.up
+        self._tap_offsets = np.arange(self.taps_per_phase)
+
+    def process(self, samples):
+        """Resample the next piece of the stream; returns float32 output samples"""
+        buffer = np.concatenate((self._history, samples))
+        count = (len(buffer) * self.up - 1 - self._next) // self.down + 1
+        if count <= 0:
+            self._history = buffer[-(self.taps_per_phase - 1):]
+            self._next -= (len(buffer) - len(self._history)) * self.up
+            return np.zeros(0, dtype=np.float32)
+
+        times = self._next + np.arange(count) * self.down
+        base = times // self.up
+        # Input window for every output sample (newest first) against its phase's taps
+        windows = buffer[base[:, None] - self._tap_offsets]
+        output = np.einsum('nk,nk->n', windows, self.phases[times % self.up])
+
+        consumed = len(buffer) - (self.taps_per_phase - 1)
+        self._history = buffer[consumed:]
+        self._next += count * self.down - consumed * self.up
+        return output
+
+
+class AudioConverter:
+    """
+    Converts interleaved client audio to 16 kHz mono s16le PCM.
+
+    Bytes that do not make up a whole frame are held until the next chunk.
+    When the input is already 16 kHz mono s16 the converter is not needed
+    (see `is_passthrough`).
+    """
+    def __init__(self, sample_rate=TARGET_SAMPLE_RATE, channels=1, sample_format='s16'):
+        sample_rate = int(sample_rate)
+        channels = int(channels)
+        if sample_rate not in SUPPORTED_SAMPLE_RATES:
+            raise ValueError(f'sample_rate must be one of: {", ".join(map(str, SUPPORTED_SAMPLE_RATES))}')
+        if not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f'channels must be between 1 and {MAX_CHANNELS}')
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f'sample_format must be one of: {", ".join(SAMPLE_FORMATS)}')
+
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_format = sample_format
+        self.dtype = SAMPLE_FORMATS[sample_format]
+        self.frame_size = self.dtype.itemsize * channels
+        self.resampler = StreamingResampler(sample_rate) if sample_rate != TARGET_SAMPLE_RATE else None
+        self._remainder = b''
+
+    @property
+    def is_passthrough(self):
+        return self.sample_rate == TARGET_SAMPLE_RATE and self.channels == 1 and self.sample_format == 's16'
+
+    def describe(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+            'sample_format': self.sample_format
+        }
+
+    def convert(self, chunk):
+        """Convert one client chunk; returns s16le bytes (possibly empty)"""
+        if self._remainder:
+            chunk = self._remainder + bytes(chunk)
+        usable = len(chunk) - len(chunk) % self.frame_size
+        self._remainder = bytes(chunk[usable:])
+        if not usable:
+            return b''
+
+        samples = np.frombuffer(chunk, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        if self.sample_format == 's16':
+            samples = samples.astype(np.float32) * (1.0 / 32768.0)
+
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+
+        if self.resampler:
+            samples = self.resampler.process(samples)
+
+        scaled = samples * 32768.0
+        np.clip(scaled, -32768, 32767, out=scaled)
+        return np.rint(scaled).astype('<i2').tobytes()
+
+
+class VoiceActivityDetector:
+    """
+    Drops silence from a 16 kHz mono s16le stream before it is forwarded.
+
+    Audio is judged in fixed frames by energy (dBFS, against the larger of a
+    fixed threshold and an adaptive noise floor). The floor falls to any
+    quieter frame, creeps up during silence, and is never below the quietest
+    frame of the last `floor_window_ms`, so stationary noise (which has no
+    pauses) is absorbed within that window while speech (which does) is not.
+    Zero-crossing rate only rescues short onsets (`zcr_onset_ms`) of quiet
+    unvoiced sounds that sit clearly above the floor; broadband noise has a
+    high ZCR too, so it never counts on its own for longer. Speech keeps flowing for
+    `hangover_ms` after the last speech frame, and the `preroll_ms` before a
+    speech onset is sent ahead of it. Suppressed stretches are replaced by
+    one frame of digital silence every `keepalive_ms` of audio so the
+    downstream stream stays open.
+    """
+    def __init__(self, threshold_db=-45.0, hangover_ms=300, preroll_ms=200,
+                 keepalive_ms=1000, frame_ms=20, sample_rate=TARGET_SAMPLE_RATE,
+                 noise_margin_db=10.0, zcr_threshold=0.25, zcr_onset_ms=100, floor_window_ms=1500):
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.frame_bytes = self.frame_samples * 2
+        self.frame_seconds = frame_ms / 1000
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.zcr_threshold = zcr_threshold
+        self.hangover_frames = max(0, int(hangover_ms / frame_ms))
+        self.preroll_frames = max(0, int(preroll_ms / frame_ms))
+        self.keepalive_frames = max(1, int(keepalive_ms / frame_ms))
+        self.zcr_onset_frames = max(0, int(zcr_onset_ms / frame_ms))
+        self.silence_frame = bytes(self.frame_bytes)
+
+        self.noise_floor_db = threshold_db - noise_margin_db
+        self._remainder = b''
+        self._preroll = deque(maxlen=self.preroll_frames or None)  # Recent suppressed frames, sent ahead of the next onset
+        self._hangover_left = 0
+        self._since_keepalive = 0
+        self._zcr_run = 0  # Consecutive frames passed on zero-crossing rate alone
+        self._recent_energy = deque(maxlen=max(1, int(floor_window_ms / frame_ms)))
+
+        self.frames_total = 0
+        self.frames_forwarded = 0
+        self.frames_suppressed = 0
+        self.keepalives_sent = 0
+
+    def _classify(self, frames):
+        """Energy (dBFS) and zero-crossing rate of each row of int16 samples"""
+        samples = frames.astype(np.float32) * (1.0 / 32768.0)
+        energy_db = 10 * np.log10(np.mean(samples * samples, axis=1) + 1e-10)
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_samples - 1)
+        return energy_db, zcr
+
+    def process(self, chunk):
+        """Return the part of the stream (plus keep-alives) to forward for this chunk"""
+        carried = bool(self._remainder)
+        if carried:
+            chunk = self._remainder + bytes(chunk)
+        count = len(chunk) // self.frame_bytes
+        self._remainder = bytes(chunk[count * self.frame_bytes:])
+        if not count:
+            return b''
+        whole_chunk = not carried and not self._remainder
+
+        frames = np.frombuffer(chunk, dtype='<i2', count=count * self.frame_samples).reshape(count, self.frame_samples)
+        energy_db, zcr = self._classify(frames)
+
+        view = memoryview(chunk)
+        output = []
+        for index in range(count):
+            frame = view[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+            energy = float(energy_db[index])
+            threshold = max(self.threshold_db, self.noise_floor_db + self.noise_margin_db)
+            loud = energy > threshold
+            # Quiet unvoiced onset: high ZCR, clearly above the floor, and only briefly
+            high_zcr = not loud and zcr[index] > self.zcr_threshold and (
+                energy > threshold - self.noise_margin_db and energy > self.noise_floor_db + self.noise_margin_db / 2
+            )
+            self._zcr_run = self._zcr_run + 1 if high_zcr else 0
+            unvoiced = high_zcr and self._zcr_run <= self.zcr_onset_frames
+            speech = loud or unvoiced
+
+            if loud:
+                # Track slow rises in background noise even while someone is talking
+                self.noise_floor_db += 0.002 * (energy - self.noise_floor_db)
+                self._hangover_left = self.hangover_frames
+            elif energy < self.noise_floor_db:
+                self.noise_floor_db = energy
+            else:
+                self.noise_floor_db += 0.05 * (energy - self.noise_floor_db)
+
+            # Speech pauses within the window keep the floor down; stationary noise lifts it
+            self._recent_energy.append(energy)
+            if len(self._recent_energy) == self._recent_energy.maxlen:
+                self.noise_floor_db = max(self.noise_floor_db, min(self._recent_energy))
+
+            self.frames_total += 1
+            if speech or self._hangover_left > 0:
+                if not speech:
+                    self._hangover_left -= 1
+                if self._preroll:
+                    output.extend(self._preroll)
+                    self.frames_forwarded += len(self._preroll)
+                    self.frames_suppressed -= len(self._preroll)
+                    self._preroll.clear()
+                output.append(frame)
+                self.frames_forwarded += 1
+                self._since_keepalive = 0
+                continue
+
+            self.frames_suppressed += 1
+            if self.preroll_frames:
+                self._preroll.append(frame)
+            self._since_keepalive += 1
+            if self._since_keepalive >= self.keepalive_frames:
+                output.append(self.silence_frame)
+                self.keepalives_sent += 1
+                self._since_keepalive = 0
+
+        # Every frame of the chunk forwarded in order: hand back the original bytes
+        if whole_chunk and len(output) == count and all(
+            isinstance(frame, memoryview) and frame.obj is view.obj for frame in output
+        ):
+            return chunk
+        return b''.join(output)
+
+    def stats(self):
+        return {
+            'audio_seconds': round(self.frames_total * self.frame_seconds, 2),
+            'forwarded_seconds': round(self.frames_forwarded * self.frame_seconds, 2),
+            'suppressed_seconds': round(self.frames_suppressed * self.frame_seconds, 2),
+            'suppressed_ratio': round(self.frames_suppressed / self.frames_total, 3) if self.frames_total else 0.0,
+            'keepalives_sent': self.keepalives_sent
+        }
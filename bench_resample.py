@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark for server-side audio conversion (audio_processing.AudioConverter)
+
+Feeds synthetic audio through the converter in client-sized chunks and
+reports the CPU cost per second of audio for common client formats. Also
+checks that converting chunk by chunk gives exactly the same samples as
+converting the whole stream at once (no clicks at chunk boundaries).
+
+Usage:
+    python bench_resample.py [seconds_of_audio] [chunk_ms]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from audio_processing import AudioConverter
+
+
+FORMATS = [
+    # (sample_rate, channels, sample_format)
+    (16000, 1, 's16'),
+    (16000, 2, 's16'),
+    (8000, 1, 's16'),
+    (22050, 1, 's16'),
+    (44100, 1, 's16'),
+    (44100, 2, 's16'),
+    (48000, 1, 'f32'),
+    (48000, 2, 'f32'),
+]
+
+
+def make_audio(sample_rate, channels, sample_format, seconds):
+    """Speech-band tone mix plus a little noise, interleaved, as raw bytes"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    mono = 0.4 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 1800 * t) + 0.02 * rng.standard_normal(len(t))
+    frames = np.repeat(mono[:, None], channels, axis=1)
+    if sample_format == 'f32':
+        return frames.astype('<f4').tobytes()
+    return np.round(frames * 32767).astype('<i2').tobytes()
+
+
+def bench(sample_rate, channels, sample_format, seconds, chunk_ms):
+    raw = make_audio(sample_rate, channels, sample_format, seconds)
+    frame_size = channels * (4 if sample_format == 'f32' else 2)
+    chunk_size = int(sample_rate * chunk_ms / 1000) * frame_size
+
+    converter = AudioConverter(sample_rate, channels, sample_format)
+    if converter.is_passthrough:
+        return None, True
+
+    output = []
+    start = time.perf_counter()
+    for offset in range(0, len(raw), chunk_size):
+        output.append(converter.convert(raw[offset:offset + chunk_size]))
+    elapsed = time.perf_counter() - start
+
+    whole = AudioConverter(sample_rate, channels, sample_format).convert(raw)
+    return elapsed, b''.join(output) == whole
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    chunk_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print("=" * 72)
+    print(f"AUDIO CONVERSION BENCHMARK ({seconds:g}s of audio, {chunk_ms:g}ms chunks)")
+    print("=" * 72)
+    print(f"{'input':<22}{'ms CPU / s audio':>18}{'x realtime':>14}{'chunked == whole':>18}")
+    print("-" * 72)
+
+    for sample_rate, channels, sample_format in FORMATS:
+        label = f"{sample_rate} Hz {channels}ch {sample_format}"
+        elapsed, identical = bench(sample_rate, channels, sample_format, seconds, chunk_ms)
+        if elapsed is None:
+            print(f"{label:<22}{'passthrough':>18}{'-':>14}{'-':>18}")
+            continue
+        per_second_ms = elapsed / seconds * 1000
+        print(f"{label:<22}{per_second_ms:>18.3f}{seconds / elapsed:>14.0f}{str(identical):>18}")
+
+
+if __name__ == '__main__':
+    main()
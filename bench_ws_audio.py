@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark for WebSocket audio payload modes
+
+Compares the three ways a client can send audio:
+  - base64:  emit('audio_chunk', {'chunk': '<base64>'})          (legacy)
+  - binary:  emit('audio_chunk', {'chunk': <bytes>})              (Socket.IO attachment)
+  - frame:   emit('audio_frame', <bytes>)                         (bare binary frame)
+
+For each mode it reports bytes on the wire per second of audio (Socket.IO
+packets plus Engine.IO and WebSocket framing, client -> server) and the
+server CPU spent decoding packets and extracting the chunk, using the same
+python-socketio packet codec and payload handling as the server.
+
+Usage:
+    python bench_ws_audio.py [seconds_of_audio] [chunk_ms]
+"""
+
+import base64
+import sys
+import time
+
+from socketio import packet
+
+from audio_processing import audio_payload
+
+
+BYTES_PER_SECOND = 16000 * 2  # 16 kHz mono s16
+
+
+def websocket_frame_size(payload_length):
+    """Client -> server WebSocket frame: header + 4-byte mask + payload"""
+    if payload_length < 126:
+        header = 2
+    elif payload_length < 65536:
+        header = 4
+    else:
+        header = 10
+    return header + 4 + payload_length
+
+
+def encode(mode, chunk):
+    """Encoded Engine.IO messages for one chunk (str for text frames, bytes for binary)"""
+    if mode == 'base64':
+        data = ['audio_chunk', {'chunk': base64.b64encode(chunk).decode('ascii')}]
+    elif mode == 'binary':
+        data = ['audio_chunk', {'chunk': chunk}]
+    else:
+        data = ['audio_frame', chunk]
+
+    encoded = packet.Packet(packet.EVENT, data=data).encode()
+    if not isinstance(encoded, list):
+        encoded = [encoded]
+    # Engine.IO prefixes text messages with the packet type ('4' = message)
+    return ['4' + encoded[0]] + encoded[1:]
+
+
+def wire_bytes(messages):
+    total = 0
+    for message in messages:
+        payload = message.encode('utf-8') if isinstance(message, str) else message
+        total += websocket_frame_size(len(payload))
+    return total
+
+
+def server_decode(messages):
+    """What the server does per chunk: parse the packet, attach binaries, extract audio"""
+    pkt = packet.Packet(encoded_packet=messages[0][1:])
+    for attachment in messages[1:]:
+        pkt.add_attachment(attachment)
+    chunk, _ = audio_payload(pkt.data[1])
+    return chunk
+
+
+def bench(mode, seconds, chunk_ms):
+    chunk_size = int(BYTES_PER_SECOND * chunk_ms / 1000)
+    chunk = bytes(range(256)) * (chunk_size // 256) + bytes(chunk_size % 256)
+    chunk_count = int(seconds * 1000 / chunk_ms)
+
+    messages = encode(mode, chunk)
+    wire = wire_bytes(messages) * chunk_count
+
+    start = time.process_time()
+    for _ in range(chunk_count):
+        decoded = server_decode(messages)
+    elapsed = time.process_time() - start
+
+    assert bytes(decoded) == chunk
+    return wire / seconds, elapsed / seconds * 1000, len(messages)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    chunk_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print("=" * 78)
+    print(f"WEBSOCKET AUDIO PAYLOAD BENCHMARK ({seconds:g}s of audio, {chunk_ms:g}ms chunks)")
+    print("=" * 78)
+    print(f"Raw audio: {BYTES_PER_SECOND:,} bytes/s")
+    print(f"{'mode':<10}{'frames/chunk':>14}{'wire bytes/s':>16}{'overhead':>12}{'server CPU ms/s':>18}")
+    print("-" * 78)
+
+    for mode in ('base64', 'binary', 'frame'):
+        wire_per_second, cpu_ms, frames = bench(mode, seconds, chunk_ms)
+        overhead = (wire_per_second / BYTES_PER_SECOND - 1) * 100
+        print(f"{mode:<10}{frames:>14}{wire_per_second:>16,.0f}{overhead:>11.1f}%{cpu_ms:>18.4f}")
+
+
+if __name__ == '__main__':
+    main()
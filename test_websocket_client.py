@@ -7,7 +7,10 @@ audio streaming transcription. It reads a PCM audio file and streams it
 in chunks to simulate real-time recording.
 
 Usage:
-    python test_websocket_client.py <path_to_pcm_file>
+    python test_websocket_client.py <path_to_pcm_file> [language_code] [--base64]
+
+Chunks are sent as binary audio_frame events; --base64 uses the legacy
+base64 audio_chunk payload instead.
 
 Audio format requirements:
     - Format: PCM (raw audio, no headers)
@@ -62,7 +65,7 @@ def on_error(data):
 def on_disconnect():
     print("Disconnected from server")
 
-def stream_audio_file(file_path, chunk_size=3200, delay=0.1):
+def stream_audio_file(file_path, chunk_size=3200, delay=0.1, use_base64=False):
     """
     Stream audio file in chunks to simulate real-time recording
 
@@ -70,6 +73,7 @@ def stream_audio_file(file_path, chunk_size=3200, delay=0.1):
         file_path: Path to PCM audio file
         chunk_size: Size of each chunk in bytes (default: 3200 = ~100ms at 16kHz)
         delay: Delay between chunks in seconds (default: 0.1 = 100ms)
+        use_base64: Send base64 audio_chunk payloads instead of binary frames
     """
     if not os.path.exists(file_path):
         print(f"❌ Error: File not found: {file_path}")
@@ -91,9 +95,13 @@ def stream_audio_file(file_path, chunk_size=3200, delay=0.1):
                 if not chunk:
                     break
 
-                # Encode to base64 and send
-                base64_chunk = base64.b64encode(chunk).decode('utf-8')
-                sio.emit('audio_chunk', {'chunk': base64_chunk})
+                if use_base64:
+                    # Legacy: encode to base64 and send
+                    base64_chunk = base64.b64encode(chunk).decode('utf-8')
+                    sio.emit('audio_chunk', {'chunk': base64_chunk})
+                else:
+                    # Send raw bytes as a binary frame
+                    sio.emit('audio_frame', chunk)
 
                 chunks_sent += 1
                 bytes_sent += len(chunk)
@@ -112,15 +120,18 @@ def stream_audio_file(file_path, chunk_size=3200, delay=0.1):
 
 def main():
     """Main function"""
-    if len(sys.argv) < 2:
-        print("Usage: python test_websocket_client.py <path_to_pcm_file> [language_code]")
+    use_base64 = '--base64' in sys.argv
+    args = [arg for arg in sys.argv if arg != '--base64']
+
+    if len(args) < 2:
+        print("Usage: python test_websocket_client.py <path_to_pcm_file> [language_code] [--base64]")
         print("\nExample:")
         print("  python test_websocket_client.py audio.pcm en-US")
         print("\nNote: Audio file must be PCM format, 16kHz, mono, 16-bit")
         sys.exit(1)
 
-    audio_file = sys.argv[1]
-    language_code = sys.argv[2] if len(sys.argv) > 2 else 'en-US'
+    audio_file = args[1]
+    language_code = args[2] if len(args) > 2 else 'en-US'
 
     server_url = 'http://44.223.62.169:5001'
 
@@ -147,7 +158,7 @@ def main():
         time.sleep(1)
 
         # Stream the audio file
-        stream_audio_file(audio_file)
+        stream_audio_file(audio_file, use_base64=use_base64)
 
         # Wait a bit for final results
         print("\nWaiting for final results...")
@@ -0,0 +1,53 @@
+"""
+Shared fixtures.
+
+app.py creates its AWS clients at import time, so the moto mock is started
+and the environment is set before it is imported.
+"""
+
+import os
+import sys
+
+import pytest
+from moto import mock_aws
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_BUCKET = 'stt-test-bucket'
+
+os.environ.update({
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_REGION': 'us-east-1',
+    'S3_BUCKET_NAME': TEST_BUCKET,
+    'JOB_INDEX_DB': ':memory:',
+    'JOB_INDEX_RECONCILE_INTERVAL': '0',
+    'TRANSCRIBE_CLIENT_WARM_INTERVAL': '3600',
+})
+os.environ.pop('AWS_SESSION_TOKEN', None)
+os.environ.pop('REDIS_URL', None)
+
+_mock = mock_aws()
+_mock.start()
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    yield app_module
+
+
+@pytest.fixture
+def bucket(app):
+    """Empty test bucket (recreated for every test)"""
+    s3 = app.s3_client
+    try:
+        s3.create_bucket(Bucket=TEST_BUCKET)
+    except s3.exceptions.BucketAlreadyOwnedByYou:
+        pass
+    yield TEST_BUCKET
+    for item in s3.list_objects_v2(Bucket=TEST_BUCKET).get('Contents', []):
+        s3.delete_object(Bucket=TEST_BUCKET, Key=item['Key'])
+    for upload in s3.list_multipart_uploads(Bucket=TEST_BUCKET).get('Uploads', []):
+        s3.abort_multipart_upload(Bucket=TEST_BUCKET, Key=upload['Key'], UploadId=upload['UploadId'])
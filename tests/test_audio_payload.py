@@ -0,0 +1,82 @@
+"""audio_chunk / audio_frame payloads: binary attachments pass through, base64 strings are decoded"""
+
+import base64
+import concurrent.futures
+
+import pytest
+
+from audio_processing import audio_payload
+
+PCM = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize('data', [PCM, bytearray(PCM), memoryview(PCM), {'chunk': PCM}])
+def test_binary_payloads_are_used_without_copying(data):
+    chunk, encoding = audio_payload(data)
+    assert encoding == 'binary'
+    assert chunk is (data['chunk'] if isinstance(data, dict) else data)
+
+
+@pytest.mark.parametrize('data', [base64.b64encode(PCM).decode(), {'chunk': base64.b64encode(PCM).decode()}])
+def test_base64_payloads_are_decoded(data):
+    assert audio_payload(data) == (PCM, 'base64')
+
+
+@pytest.mark.parametrize('data', [None, 42, {}, {'audio': PCM}, ['not', 'audio']])
+def test_other_payloads_are_rejected(data):
+    with pytest.raises(ValueError):
+        audio_payload(data)
+
+
+class FakeSession:
+    """Records the chunks receive_audio hands to the session's event loop"""
+    def __init__(self):
+        self.is_active = True
+        self.handler = None
+        self.profiler = None
+        self.overflowing = False
+        self.chunks_received = {'binary': 0, 'base64': 0}
+        self.queued = []
+
+    def enqueue_audio_chunk(self, chunk):
+        self.queued.append(chunk)
+        return True
+
+
+@pytest.fixture
+def session(app):
+    session = FakeSession()
+    app.active_sessions['sid-audio'] = session
+    yield session
+    app.release_session('sid-audio')
+
+
+def send(app, monkeypatch, sid, handler, data):
+    """Run an audio event handler for `sid`; returns the events it emitted"""
+    emitted = []
+    monkeypatch.setattr(app, 'emit', lambda event, payload=None, **kwargs: emitted.append((event, payload)))
+
+    def handle():
+        with app.app.test_request_context('/socket.io/'):
+            app.request.sid = sid
+            handler(data)
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        executor.submit(handle).result(timeout=30)
+    return emitted
+
+
+def test_audio_frame_forwards_bare_binary(app, monkeypatch, session):
+    assert send(app, monkeypatch, 'sid-audio', app.handle_audio_frame, PCM) == []
+    assert send(app, monkeypatch, 'sid-audio', app.handle_audio_chunk, {'chunk': base64.b64encode(PCM).decode()}) == []
+
+    assert session.queued[0] is PCM
+    assert session.queued[1] == PCM
+    assert session.chunks_received == {'binary': 1, 'base64': 1}
+
+
+def test_invalid_audio_frame_reports_an_error(app, monkeypatch, session):
+    emitted = send(app, monkeypatch, 'sid-audio', app.handle_audio_frame, 12345)
+    assert emitted == [('error', {'message': 'Failed to process audio chunk: '
+                                             'Audio payload must be binary or a base64 string'})]
+    assert session.queued == []
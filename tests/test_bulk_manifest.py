@@ -0,0 +1,16 @@
+"""JSON manifests for /transcribe-batch-async/bulk are validated before any job starts"""
+
+import pytest
+
+
+@pytest.mark.parametrize('manifest, error', [
+    ({'items': ['uploads/a.mp3']}, 'Manifest item 0 must be an object with an s3_key'),
+    ({'items': [{'s3_key': 'uploads/a.mp3'}, {'language_code': 'en-US'}]},
+     'Manifest item 1 must be an object with an s3_key'),
+    ({'items': 'uploads/a.mp3'}, 'Manifest must be an object with an "items" list'),
+    (['uploads/a.mp3'], 'Manifest must be an object with an "items" list'),
+])
+def test_invalid_manifest_is_refused(app, bucket, manifest, error):
+    response = app.app.test_client().post('/transcribe-batch-async/bulk', json=manifest)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
@@ -0,0 +1,32 @@
+"""Bulk form uploads run on batch_pool while the request waits on the hub"""
+
+import io
+import os
+import threading
+
+import pytest
+
+
+def test_bulk_uploads_run_off_the_hub_without_parking_tpool(app, bucket, monkeypatch):
+    monkeypatch.setattr(app.transcribe_client, 'start_transcription_job',
+                        lambda **kwargs: {'TranscriptionJob': {'TranscriptionJobStatus': 'IN_PROGRESS'}})
+    monkeypatch.setattr(app.job_watcher, 'track', lambda job_name, **kwargs: None)
+    monkeypatch.setattr(app, 'run_blocking', lambda fn, *args, **kwargs: pytest.fail(f'{fn} parked a tpool thread'))
+
+    upload_threads = []
+    upload_fileobj = app.s3_client.upload_fileobj
+
+    def recording_upload(*args, **kwargs):
+        upload_threads.append(threading.current_thread())
+        return upload_fileobj(*args, **kwargs)
+
+    monkeypatch.setattr(app.s3_client, 'upload_fileobj', recording_upload)
+
+    response = app.app.test_client().post('/transcribe-batch-async/bulk', data={
+        'files': [(io.BytesIO(b'ID3' + os.urandom(1024)), f'part-{index}.mp3') for index in range(3)]
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 201
+    assert response.get_json()['submitted'] == 3
+    assert len(upload_threads) == 3
+    assert threading.main_thread() not in upload_threads
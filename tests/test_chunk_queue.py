@@ -0,0 +1,86 @@
+"""Per-session inbound ChunkQueue: byte bound, overflow policies, archiving of evicted audio"""
+
+import asyncio
+import time
+
+
+def make_queue(app, max_bytes, overflow):
+    return app.ChunkQueue(asyncio.new_event_loop(), max_bytes, overflow)
+
+
+def drain(queue):
+    results = []
+    while len(queue):
+        results.append(queue._loop.run_until_complete(queue.get()))
+    queue._loop.close()
+    return results
+
+
+def test_default_policy_rejects(app):
+    assert app.REALTIME_QUEUE_OVERFLOW == 'reject'
+
+
+def test_bound_is_in_bytes_not_chunks(app):
+    queue = make_queue(app, 1000, 'reject')
+    # Many small chunks fit...
+    for _ in range(100):
+        assert queue.put(b'x', 1)
+    # ...but a large one that would pass the byte bound does not
+    assert not queue.put(b'x' * 901, 901)
+    assert queue.put(b'x' * 900, 900)
+    assert queue.stats()['rejected'] == 1
+    assert queue.bytes == 1000
+
+    drain(queue)
+    assert queue.bytes == 0
+
+
+def test_oversized_chunk_is_accepted_when_empty(app):
+    queue = make_queue(app, 100, 'reject')
+    assert queue.put(b'x' * 500, 500)
+    assert not queue.put(b'x', 1)
+    # The sentinel always gets in
+    assert queue.put(None)
+    drain(queue)
+
+
+def test_drop_oldest_hands_evicted_items_to_consumer(app):
+    queue = make_queue(app, 300, 'drop_oldest')
+    for index in range(5):
+        assert queue.put(index, 100)
+    queue.put(None)
+
+    results = drain(queue)
+    assert results[0] == ([0, 1], 2)
+    assert results[1:] == [([], 3), ([], 4), ([], None)]
+    assert queue.stats()['dropped'] == 2
+
+
+def test_pump_archives_dropped_audio(app):
+    session = app.TranscriptionSession('sid-queue', runner=app.loop_pool.runners[0])
+    session.audio_buffer = app.AudioBuffer()
+    session.is_active = True
+    sent = []
+
+    async def send_audio_chunk(chunk):
+        await session._archive_chunk(chunk)
+        sent.append(chunk)
+
+    session.send_audio_chunk = send_audio_chunk
+    chunks = [bytes([index]) * 100 for index in range(6)]
+
+    async def scenario():
+        session._chunk_queue = app.ChunkQueue(asyncio.get_running_loop(), 300, 'drop_oldest')
+        # Queue everything before the pump runs, so the oldest chunks overflow
+        for chunk in chunks:
+            assert session._chunk_queue.put((time.monotonic(), chunk), len(chunk))
+        session._chunk_queue.put(None)
+        await session._pump_audio()
+
+    try:
+        session.runner.submit(scenario()).result(timeout=30)
+        # Only the newest audio reached Transcribe, but the archive has all of it, in order
+        assert sent == chunks[3:]
+        assert session.audio_buffer.reader().read() == b''.join(chunks)
+    finally:
+        session.audio_buffer.close()
@@ -0,0 +1,26 @@
+"""/debug endpoints take the debug token from a header only"""
+
+import pytest
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(app, 'DEBUG_TOKEN', 'debug-secret')
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('headers', [{'X-Debug-Token': 'debug-secret'},
+                                     {'Authorization': 'Bearer debug-secret'},
+                                     {'Authorization': 'bearer debug-secret'}])
+def test_token_in_header_is_accepted(client, headers):
+    assert client.get('/debug/traces', headers=headers).status_code == 200
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Debug-Token': 'wrong'}, {'X-Debug-Token': 'sécret'},
+                                     {'Authorization': 'Basic debug-secret'}])
+def test_missing_or_wrong_token_is_not_found(client, headers):
+    assert client.get('/debug/traces', headers=headers).status_code == 404
+
+
+def test_token_in_query_string_is_ignored(client):
+    assert client.get('/debug/traces?token=debug-secret').status_code == 404
@@ -0,0 +1,122 @@
+"""Duplicate batch submissions reuse the existing job and still get their own notifications"""
+
+import io
+import os
+
+import pytest
+
+WEBHOOK_A = 'https://hooks.example.com/a'
+WEBHOOK_B = 'https://hooks.example.com/b'
+
+
+@pytest.fixture
+def jobs(app, monkeypatch):
+    """Stub Transcribe (every job stays IN_PROGRESS) and a watcher that records instead of polling"""
+    started = []
+
+    def start_transcription_job(**kwargs):
+        started.append(kwargs['TranscriptionJobName'])
+        return {'TranscriptionJob': {'TranscriptionJobStatus': 'IN_PROGRESS'}}
+
+    def get_transcription_job(TranscriptionJobName):
+        return {'TranscriptionJob': {'TranscriptionJobName': TranscriptionJobName,
+                                     'TranscriptionJobStatus': 'IN_PROGRESS'}}
+
+    monkeypatch.setattr(app.transcribe_client, 'start_transcription_job', start_transcription_job)
+    monkeypatch.setattr(app.transcribe_client, 'get_transcription_job', get_transcription_job)
+    monkeypatch.setattr(app.job_watcher, '_jobs', {})
+    monkeypatch.setattr(app.job_watcher, '_thread', object())
+    monkeypatch.setattr(app, 'WEBHOOK_ALLOWED_HOSTS', ['hooks.example.com'])
+    return started
+
+
+def submit(app, audio, **form):
+    client = app.app.test_client()
+    return client.post('/transcribe-batch-async', data={
+        'file': (io.BytesIO(audio), 'meeting.mp3'), **form
+    }, content_type='multipart/form-data')
+
+
+def test_duplicate_registers_its_webhook_on_the_running_job(app, bucket, jobs):
+    audio = b'ID3' + os.urandom(2048)
+    first = submit(app, audio, webhook_url=WEBHOOK_A).get_json()
+    second = submit(app, audio, webhook_url=WEBHOOK_B)
+
+    assert second.status_code == 200
+    assert second.get_json()['dedup_hit'] is True
+    assert second.get_json()['job_name'] == first['job_name']
+    assert second.get_json()['status'] == 'IN_PROGRESS'
+    assert jobs == [first['job_name']]
+    assert first['job_name'] in app.job_watcher._jobs
+    assert app.job_index.pop_webhooks(first['job_name']) == [WEBHOOK_A, WEBHOOK_B]
+
+
+def test_pending_duplicate_reports_real_state_and_is_watched(app, bucket, jobs):
+    audio = b'ID3' + os.urandom(2048)
+    content_hash = app.hash_fileobj(io.BytesIO(audio))
+    app.content_index.claim(content_hash, 'en-US', 'transcribe-still-uploading', 'audio/batch/x.mp3')
+    try:
+        response = submit(app, audio, webhook_url=WEBHOOK_B)
+        assert response.get_json()['status'] == 'UPLOADING'
+        assert 'transcribe-still-uploading' in app.job_watcher._jobs
+        assert app.job_index.pop_webhooks('transcribe-still-uploading') == [WEBHOOK_B]
+        assert not jobs
+    finally:
+        app.content_index.release(content_hash, 'en-US', 'transcribe-still-uploading')
+
+
+def test_duplicate_of_finished_job_is_notified_at_once(app, bucket, jobs, monkeypatch):
+    audio = b'ID3' + os.urandom(2048)
+    first = submit(app, audio).get_json()
+    result = {'job_name': first['job_name'], 'status': 'COMPLETED', 'transcript': 'hello'}
+    monkeypatch.setattr(app, 'fetch_job_result', lambda job_name: dict(result))
+    posted = []
+    monkeypatch.setattr(app.webhook_pool, 'submit', lambda fn, *args: posted.append(args))
+
+    response = submit(app, audio, webhook_url=WEBHOOK_B)
+    assert response.get_json()['transcript'] == 'hello'
+    assert posted == [(WEBHOOK_B, {'event': 'job_completed', **result})]
+
+
+def test_form_upload_keeps_blocking_calls_off_the_hub(app, bucket, jobs, monkeypatch):
+    offloaded = []
+    run_blocking = app.run_blocking
+
+    def recording_run_blocking(fn, *args, **kwargs):
+        offloaded.append(getattr(fn, '__name__', fn))
+        return run_blocking(fn, *args, **kwargs)
+
+    monkeypatch.setattr(app, 'run_blocking', recording_run_blocking)
+    audio = b'ID3' + os.urandom(2048)
+    first = submit(app, audio).get_json()
+    assert {'hash_fileobj', 'claim_content', 'upload_fileobj', 'start_batch_job'} <= set(offloaded)
+
+    def fetch_job_result(job_name):
+        return {'job_name': job_name, 'status': 'COMPLETED', 'transcript': 'hello'}
+
+    # A duplicate of a finished job looks it up (AWS + transcript download) off the hub too
+    offloaded.clear()
+    monkeypatch.setattr(app, 'fetch_job_result', fetch_job_result)
+    assert submit(app, audio).get_json()['job_name'] == first['job_name']
+    assert offloaded == ['hash_fileobj', 'claim_content', 'fetch_job_result']
+
+
+def test_claim_is_won_after_repeated_stale_entries(app, monkeypatch):
+    stale = iter(['transcribe-stale-1', 'transcribe-stale-2', 'transcribe-stale-3'])
+    claim = app.content_index.claim
+
+    def claim_with_stale_entries(content_hash, language_code, job_name, s3_key):
+        # Other requests keep registering jobs that turn out to be failed
+        name = next(stale, None)
+        if name:
+            claim(content_hash, language_code, name, 'audio/batch/stale.mp3')
+            app.content_index.mark_started(content_hash, language_code)
+        return claim(content_hash, language_code, job_name, s3_key)
+
+    monkeypatch.setattr(app.content_index, 'claim', claim_with_stale_entries)
+    monkeypatch.setattr(app, 'dedup_hit_payload', lambda entry: None)
+
+    assert app.claim_content('feedface', 'en-US', 'transcribe-mine', 'audio/batch/mine.mp3') is None
+    entry = claim('feedface', 'en-US', 'transcribe-other', 'audio/batch/other.mp3')
+    assert entry['job_name'] == 'transcribe-mine'
+    app.content_index.release('feedface', 'en-US', 'transcribe-mine')
@@ -0,0 +1,42 @@
+"""Real-time sessions share long-lived event loops instead of creating one per event"""
+
+import asyncio
+import threading
+
+
+async def loop_identity():
+    return asyncio.get_running_loop(), threading.current_thread()
+
+
+def test_runner_reuses_one_loop_on_its_own_thread(app):
+    runner = app.EventLoopRunner('test-loop')
+    first_loop, first_thread = runner.submit(loop_identity()).result(timeout=5)
+    second_loop, second_thread = runner.submit(loop_identity()).result(timeout=5)
+
+    assert first_loop is second_loop is runner.loop
+    assert first_thread is second_thread
+    assert first_thread is not threading.current_thread()
+    assert first_loop.is_running()
+
+
+def test_call_soon_runs_callbacks_on_the_loop_thread(app):
+    runner = app.EventLoopRunner('test-loop-callbacks')
+    done = threading.Event()
+    threads = []
+
+    def callback(value):
+        threads.append((value, threading.current_thread().name))
+        done.set()
+
+    runner.call_soon(callback, 42)
+    assert done.wait(5)
+    assert threads == [(42, 'test-loop-callbacks')]
+
+
+def test_pool_pins_each_session_to_one_runner(app):
+    pool = app.EventLoopPool(3)
+    assert len(pool.runners) == 3
+    assert len({runner.loop for runner in pool.runners}) == 3
+    assert all(pool.runner_for('sid-a') is pool.runner_for('sid-a') for _ in range(5))
+    assert {pool.runner_for(f'sid-{index}') for index in range(50)} <= set(pool.runners)
+    assert len(app.EventLoopPool(0).runners) == 1
@@ -0,0 +1,60 @@
+"""Waiting on worker-thread results from the eventlet hub without tying up tpool threads"""
+
+import concurrent.futures
+import threading
+import time
+
+import eventlet
+import pytest
+
+
+def resolve_later(future, value, delay):
+    timer = threading.Timer(delay, future.set_result, (value,))
+    timer.start()
+    return timer
+
+
+def test_many_waiters_share_the_hub(app):
+    futures = [concurrent.futures.Future() for _ in range(40)]
+    for index, future in enumerate(futures):
+        resolve_later(future, index, 0.2)
+
+    # More waiters than the tpool has threads, plus a greenlet that must keep running meanwhile
+    ticks = []
+
+    def ticker():
+        while len(ticks) < 10:
+            ticks.append(time.monotonic())
+            eventlet.sleep(0.01)
+
+    ticking = eventlet.spawn(ticker)
+    waiters = [eventlet.spawn(app.wait_for_result, future) for future in futures]
+
+    assert [waiter.wait() for waiter in waiters] == list(range(40))
+    ticking.wait()
+    assert len(ticks) == 10
+
+
+def test_timeout_and_exceptions(app):
+    future = concurrent.futures.Future()
+    with pytest.raises(concurrent.futures.TimeoutError):
+        app.wait_for_result(future, timeout=0.05)
+
+    failed = concurrent.futures.Future()
+    failed.set_exception(ValueError('boom'))
+    with pytest.raises(ValueError):
+        app.wait_for_result(failed)
+
+
+def test_wait_for_item_polls_on_the_hub(app):
+    items = app.queue.Queue()
+    threading.Timer(0.1, items.put, (('end', None),)).start()
+    ticker = eventlet.spawn(eventlet.sleep, 0.01)
+
+    assert app.wait_for_item(items) == ('end', None)
+    assert ticker.dead
+
+
+def test_wait_for_item_timeout(app):
+    with pytest.raises(app.queue.Empty):
+        app.wait_for_item(app.queue.Queue(), timeout=0.05)
@@ -0,0 +1,88 @@
+"""The local job index serves /transcribe-jobs with keyset pagination, filters and counts"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    """A fresh in-memory index with ten jobs, two of them sharing a creation time"""
+    index = app.JobIndex(':memory:')
+    for minute in range(10):
+        index.upsert(f'transcribe-{minute:02d}', status='COMPLETED' if minute % 3 else 'FAILED',
+                     language_code='en-US' if minute < 6 else 'zh-HK',
+                     creation_time=app.utc_iso(START + timedelta(minutes=min(minute, 8))))
+    monkeypatch.setattr(app, 'job_index', index)
+    return index
+
+
+def all_pages(index, **filters):
+    names, cursor = [], None
+    while True:
+        jobs, cursor, _, _ = index.query(limit=3, cursor=cursor, **filters)
+        names.extend(job['job_name'] for job in jobs)
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+def test_cursor_pages_cover_every_job_once(index, order):
+    names = all_pages(index, order=order)
+    expected = [f'transcribe-{minute:02d}' for minute in range(10)]
+    assert names == (expected if order == 'asc' else expected[::-1])
+
+
+def test_status_filter_and_counts(index):
+    jobs, cursor, total, status_counts = index.query(status='FAILED', limit=20)
+    assert [job['job_name'] for job in jobs] == ['transcribe-09', 'transcribe-06', 'transcribe-03', 'transcribe-00']
+    assert cursor is None
+    assert total == 4
+    # Counts per status ignore the status filter but not the others
+    assert status_counts == {'COMPLETED': 6, 'FAILED': 4}
+    assert index.query(language_code='zh-HK', limit=1)[2:] == (4, {'COMPLETED': 2, 'FAILED': 2})
+    assert all_pages(index, status='FAILED', language_code='en-US') == ['transcribe-03', 'transcribe-00']
+
+
+def test_endpoint_round_trips_cursor(app, index):
+    client = app.app.test_client()
+    first = client.get('/transcribe-jobs?max_results=4&status=COMPLETED').get_json()
+    assert first['total'] == 6 and first['count'] == 4
+    second = client.get(f"/transcribe-jobs?max_results=4&status=COMPLETED&cursor={first['next_cursor']}").get_json()
+    assert 'next_cursor' not in second
+    assert len({job['job_name'] for job in first['jobs'] + second['jobs']}) == 6
+    assert client.get('/transcribe-jobs?cursor=not-a-cursor').status_code == 400
+
+
+def test_reconciler_refreshes_only_indexed_jobs(app, index, monkeypatch):
+    index.upsert('transcribe-running', status='IN_PROGRESS', language_code='en-US',
+                 creation_time=app.utc_iso(START + timedelta(hours=1)))
+    pages = {
+        None: {'TranscriptionJobSummaries': [
+            {'TranscriptionJobName': 'transcribe-running', 'TranscriptionJobStatus': 'COMPLETED',
+             'CreationTime': START + timedelta(hours=1), 'CompletionTime': START + timedelta(hours=2)},
+            {'TranscriptionJobName': 'transcribe-someone-elses-job', 'TranscriptionJobStatus': 'COMPLETED',
+             'CreationTime': START + timedelta(minutes=30)},
+        ], 'NextToken': 'page-2'},
+        'page-2': {'TranscriptionJobSummaries': [
+            {'TranscriptionJobName': 'transcribe-04', 'TranscriptionJobStatus': 'FAILED',
+             'CreationTime': START + timedelta(minutes=4), 'FailureReason': 'bad audio'},
+        ]},
+    }
+    monkeypatch.setattr(app.transcribe_client, 'list_transcription_jobs',
+                        lambda **params: pages[params.get('NextToken')])
+
+    reconciler = app.JobIndexReconciler(interval=0)
+    reconciler.reconcile()
+
+    assert reconciler.last_synced_jobs == 2
+    assert index.get('transcribe-someone-elses-job') is None
+    running = index.get('transcribe-running')
+    assert running['status'] == 'COMPLETED'
+    assert running['completion_time'] == app.utc_iso(START + timedelta(hours=2))
+    # The creation time recorded on submit is kept, so cursors stay stable
+    assert running['creation_time'] == app.utc_iso(START + timedelta(hours=1))
+    assert index.get('transcribe-04')['failure_reason'] == 'bad audio'
+    assert index.get('transcribe-04')['language_code'] == 'en-US'
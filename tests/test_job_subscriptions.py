@@ -0,0 +1,63 @@
+"""subscribe_job only follows jobs this server knows about, and at most JOB_SUBSCRIBE_MAX_PER_SID per connection"""
+
+import concurrent.futures
+
+import pytest
+
+
+@pytest.fixture
+def watcher(app, monkeypatch):
+    tracked = []
+    monkeypatch.setattr(app.job_watcher, 'track', lambda job_name, **kwargs: tracked.append(job_name))
+    monkeypatch.setattr(app, 'join_room', lambda room, **kwargs: None)
+    monkeypatch.setattr(app, 'JOB_SUBSCRIBE_MAX_PER_SID', 2)
+    yield tracked
+    app.job_subscriptions.clear()
+
+
+def subscribe(app, monkeypatch, sid, job_name):
+    """Run the subscribe_job handler for `sid`; returns the events it emitted"""
+    emitted = []
+    monkeypatch.setattr(app, 'emit', lambda event, payload=None, **kwargs: emitted.append((event, payload)))
+
+    def handle():
+        with app.app.test_request_context('/socket.io/'):
+            app.request.sid = sid
+            app.handle_subscribe_job({'job_name': job_name})
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        executor.submit(handle).result(timeout=30)
+    return emitted
+
+
+def test_unknown_job_is_refused(app, monkeypatch, watcher):
+    emitted = subscribe(app, monkeypatch, 'sid-a', 'transcribe-someone-elses-job')
+    assert emitted == [('error', {'message': 'Unknown job: transcribe-someone-elses-job', 'code': 'unknown_job'})]
+    assert not watcher
+
+
+def test_subscriptions_are_capped_per_connection(app, monkeypatch, watcher):
+    for index in range(3):
+        app.job_index.upsert(f'transcribe-sub-{index}', status='IN_PROGRESS')
+
+    assert subscribe(app, monkeypatch, 'sid-b', 'transcribe-sub-0') == []
+    assert subscribe(app, monkeypatch, 'sid-b', 'transcribe-sub-1') == []
+    # Re-subscribing to a followed job does not use another slot
+    assert subscribe(app, monkeypatch, 'sid-b', 'transcribe-sub-1') == []
+    emitted = subscribe(app, monkeypatch, 'sid-b', 'transcribe-sub-2')
+    assert [payload['code'] for _, payload in emitted] == ['too_many_subscriptions']
+    assert watcher == ['transcribe-sub-0', 'transcribe-sub-1', 'transcribe-sub-1']
+
+    # Another connection has its own allowance
+    assert subscribe(app, monkeypatch, 'sid-c', 'transcribe-sub-2') == []
+
+
+def test_finished_job_missing_from_cache_is_answered_at_once(app, monkeypatch, watcher):
+    # e.g. finished before a restart: only the job index knows it
+    app.job_index.upsert('transcribe-finished-earlier', status='IN_PROGRESS')
+    result = {'job_name': 'transcribe-finished-earlier', 'status': 'COMPLETED', 'transcript': 'hello'}
+    monkeypatch.setattr(app, 'fetch_job_result', lambda job_name: dict(result))
+
+    emitted = subscribe(app, monkeypatch, 'sid-d', 'transcribe-finished-earlier')
+    assert emitted == [('job_completed', result)]
+    assert not watcher
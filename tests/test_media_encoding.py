@@ -0,0 +1,126 @@
+"""Compressed real-time input: flac / ogg-opus negotiation, pass-through to Transcribe and the archive format"""
+
+import concurrent.futures
+
+import pytest
+
+
+def start_transcription(app, monkeypatch, sid, data):
+    """Run the start_transcription handler for `sid`; returns the events it emitted"""
+    emitted = []
+    monkeypatch.setattr(app, 'emit', lambda event, payload=None, **kwargs: emitted.append((event, payload)))
+
+    def handle():
+        with app.app.test_request_context('/socket.io/'):
+            app.request.sid = sid
+            app.handle_start_transcription(data)
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        executor.submit(handle).result(timeout=30)
+    return emitted
+
+
+@pytest.fixture
+def started_sessions(app, monkeypatch):
+    """Sessions whose start() only records them (no Transcribe stream)"""
+    sessions = []
+
+    async def fake_start(session):
+        session.handshake_seconds = 0.01
+        session.is_active = True
+        sessions.append(session)
+
+    monkeypatch.setattr(app.TranscriptionSession, 'start', fake_start)
+    yield sessions
+    for session in sessions:
+        app.release_session(session.session_id)
+
+
+@pytest.mark.parametrize('media_encoding, sample_rate', [('flac', 44100), ('ogg-opus', 48000)])
+def test_compressed_input_is_passed_through(app, monkeypatch, started_sessions, media_encoding, sample_rate):
+    emitted = start_transcription(app, monkeypatch, 'sid-compressed',
+                                  {'media_encoding': media_encoding, 'sample_rate': sample_rate})
+
+    assert emitted[-1][0] == 'transcription_started'
+    assert emitted[-1][1]['input_format'] == {'media_encoding': media_encoding, 'sample_rate': sample_rate,
+                                              'channels': 1}
+    assert emitted[-1][1]['vad'] is False
+    session = started_sessions[0]
+    assert (session.media_encoding, session.media_sample_rate) == (media_encoding, sample_rate)
+    assert session.converter is None and session.vad is None
+
+
+@pytest.mark.parametrize('data, message', [
+    ({'media_encoding': 'mp3'}, 'media_encoding must be one of: pcm, flac, ogg-opus'),
+    ({'media_encoding': 'flac', 'sample_rate': 96000},
+     'Invalid audio format: sample_rate must be between 8000 and 48000 for flac'),
+    ({'media_encoding': 'ogg-opus', 'sample_rate': 48000, 'channels': 2},
+     'Invalid audio format: ogg-opus audio must be mono'),
+    ({'media_encoding': 'flac', 'vad': True}, 'VAD needs PCM input and is not available with flac'),
+])
+def test_unsupported_compressed_input_is_refused(app, monkeypatch, started_sessions, data, message):
+    emitted = start_transcription(app, monkeypatch, 'sid-refused', data)
+
+    assert emitted == [('error', {'message': message})]
+    assert started_sessions == []
+    assert 'sid-refused' not in app.active_sessions
+
+
+class FakeInputStream:
+    def __init__(self):
+        self.sent = []
+
+    async def send_audio_event(self, audio_chunk):
+        self.sent.append(audio_chunk)
+
+    async def end_stream(self):
+        pass
+
+
+async def no_results():
+    return
+    yield
+
+
+class FakeStream:
+    def __init__(self):
+        self.input_stream = FakeInputStream()
+        self.output_stream = no_results()
+
+
+@pytest.mark.parametrize('media_encoding, extension, content_type', [
+    ('flac', 'flac', 'audio/flac'), ('ogg-opus', 'ogg', 'audio/ogg')])
+def test_compressed_session_is_forwarded_and_archived_as_sent(app, monkeypatch, bucket, media_encoding, extension,
+                                                              content_type):
+    stream = FakeStream()
+    requested = {}
+
+    class FakeClient:
+        async def start_stream_transcription(self, **kwargs):
+            requested.update(kwargs)
+            return stream
+
+    monkeypatch.setattr(app.streaming_clients, 'client_for', lambda runner: FakeClient())
+    audio = bytes(range(256)) * 8
+
+    runner = app.loop_pool.runner_for('sid-compressed')
+    session = app.TranscriptionSession('sid-compressed', 'en-US', runner, media_encoding=media_encoding,
+                                       media_sample_rate=48000)
+    runner.submit(session.start()).result(timeout=10)
+    try:
+        assert session.enqueue_audio_chunk(audio[:1000])
+        assert session.enqueue_audio_chunk(audio[1000:])
+        runner.submit(session.stop()).result(timeout=10)
+        s3_url = runner.submit(session.save_to_s3()).result(timeout=10)
+    finally:
+        runner.submit(session.discard_audio()).result(timeout=10)
+
+    assert requested == {'language_code': 'en-US', 'media_sample_rate_hz': 48000, 'media_encoding': media_encoding}
+    # Compressed frames are neither re-framed nor converted
+    assert stream.input_stream.sent == [audio[:1000], audio[1000:]]
+    assert session.s3_key.endswith(f'/session-sid-compressed.{extension}')
+    assert s3_url == f's3://{bucket}/{session.s3_key}'
+    archived = app.s3_client.get_object(Bucket=bucket, Key=session.s3_key)
+    assert archived['ContentType'] == content_type
+    assert archived['Body'].read() == audio
+
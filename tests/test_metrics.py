@@ -0,0 +1,91 @@
+"""GET /metrics: Prometheus text exposition of counters, gauges and histograms"""
+
+import re
+
+import pytest
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+@pytest.fixture
+def registry(app, monkeypatch):
+    """Fresh registry so test metrics do not leak into the app's /metrics"""
+    metrics = []
+    monkeypatch.setattr(app, 'metrics_registry', metrics)
+    return metrics
+
+
+def test_counter_and_gauge_exposition(app, registry):
+    requests = app.Counter('test_requests_total', 'Requests handled', ['method'])
+    requests.inc(method='GET')
+    requests.inc(2, method='GET')
+    requests.inc(method='POST')
+    app.Gauge('test_queue_depth', 'Items waiting', lambda: 7)
+
+    assert app.render_metrics().splitlines() == [
+        '# HELP test_requests_total Requests handled',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{method="GET"} 3',
+        'test_requests_total{method="POST"} 1',
+        '# HELP test_queue_depth Items waiting',
+        '# TYPE test_queue_depth gauge',
+        'test_queue_depth 7',
+    ]
+
+
+def test_label_values_are_escaped(app, registry):
+    counter = app.Counter('test_escaped_total', 'Escaping', ['path'])
+    counter.inc(path='C:\\audio\n"quoted"')
+
+    line = app.render_metrics().splitlines()[-1]
+    assert line == r'test_escaped_total{path="C:\\audio\n\"quoted\""} 1'
+    assert SAMPLE.match(line)
+
+    counter.remove(path='C:\\audio\n"quoted"')
+    assert app.render_metrics().splitlines()[-1] == '# TYPE test_escaped_total counter'
+
+
+def test_histogram_buckets_are_cumulative(app, registry):
+    latency = app.Histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0), labelnames=['call'])
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, call='fetch')
+
+    assert app.render_metrics().splitlines() == [
+        '# HELP test_latency_seconds Latency',
+        '# TYPE test_latency_seconds histogram',
+        'test_latency_seconds_bucket{call="fetch",le="0.1"} 2',
+        'test_latency_seconds_bucket{call="fetch",le="1.0"} 3',
+        'test_latency_seconds_bucket{call="fetch",le="+Inf"} 4',
+        'test_latency_seconds_sum{call="fetch"} 3.65',
+        'test_latency_seconds_count{call="fetch"} 4',
+    ]
+    assert latency.stats(call='fetch')['p50_le'] == 0.1
+
+
+def test_metrics_endpoint_is_valid_exposition(app):
+    app.transcribe_get_job_seconds.observe(0.3)
+    response = app.app.test_client().get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+
+    types, samples = {}, {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert name not in types, f'{name} declared twice'
+            types[name] = kind
+        elif not line.startswith('# HELP '):
+            match = SAMPLE.match(line)
+            assert match, line
+            samples[match.group(1) + (match.group(2) or '')] = float(match.group(3))
+
+    # Every sample belongs to a declared metric
+    for series in samples:
+        name = series.split('{')[0]
+        base = re.sub(r'_(bucket|sum|count)$', '', name)
+        assert name in types or types.get(base) == 'histogram', series
+
+    assert samples['stt_transcribe_get_job_seconds_bucket{le="+Inf"}'] == \
+        samples['stt_transcribe_get_job_seconds_count'] >= 1
+    assert types['stt_realtime_active_sessions'] == 'gauge'
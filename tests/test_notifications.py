@@ -0,0 +1,136 @@
+"""Completion notification targets (webhook_url / notify_sid) are checked before any paid work"""
+
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.mark.parametrize('url', [
+    'ftp://hooks.example.com/x',
+    'http://127.0.0.1:8080/hook',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://10.1.2.3/hook',
+    'http://[::1]/hook',
+    'http://localhost/hook',
+    'not a url',
+])
+def test_private_and_non_http_webhooks_are_refused(app, url):
+    assert app.webhook_url_error(url)
+
+
+def test_allow_list_overrides_address_check(app, monkeypatch):
+    monkeypatch.setattr(app, 'WEBHOOK_ALLOWED_HOSTS', ['localhost', '.hooks.example.com'])
+    assert app.webhook_url_error('http://localhost:9000/hook') is None
+    assert app.webhook_url_error('https://a.hooks.example.com/hook') is None
+    assert app.webhook_url_error('https://evil.example.com/hook')
+
+
+def test_refused_webhook_is_never_sent(app, monkeypatch):
+    monkeypatch.setattr(app.webhook_opener, 'open', lambda *args, **kwargs: pytest.fail('webhook was sent'))
+    app.post_webhook('http://127.0.0.1/hook', {'event': 'job_completed'})
+
+
+@pytest.mark.parametrize('form', [{'notify_sid': 'not-connected'}, {'webhook_url': 'http://127.0.0.1/hook'}])
+def test_bad_notification_target_rejected_before_upload(app, bucket, monkeypatch, form):
+    monkeypatch.setattr(app.transcribe_client, 'start_transcription_job',
+                        lambda **kwargs: pytest.fail('job was started'))
+    client = app.app.test_client()
+
+    response = client.post('/transcribe-batch-async', data={
+        'file': (io.BytesIO(b'ID3' + bytes(1024)), 'meeting.mp3'), **form
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert not app.s3_client.list_objects_v2(Bucket=bucket).get('Contents')
+
+
+def test_join_job_room_tolerates_departed_client(app):
+    with app.app.test_request_context():
+        assert app.join_job_room('transcribe-x', 'gone') is False
+
+
+@pytest.fixture
+def watcher(app):
+    watcher = app.JobCompletionWatcher(min_interval=1, max_interval=10, max_age=86400)
+    watcher._thread = object()  # Polled by hand instead of by a background thread
+    return watcher
+
+
+def test_watcher_pages_back_to_the_creation_time_of_old_jobs(app, monkeypatch, watcher):
+    now = datetime.now(timezone.utc)
+    app.job_index.upsert('transcribe-two-days-old', status='IN_PROGRESS',
+                         creation_time=app.utc_iso(now - timedelta(days=2)))
+    newer = [{'TranscriptionJobName': f'transcribe-newer-{index}', 'CreationTime': now - timedelta(hours=1)}
+             for index in range(100)]
+    pages = {
+        None: {'TranscriptionJobSummaries': newer, 'NextToken': 'page-2'},
+        'page-2': {'TranscriptionJobSummaries': [
+            {'TranscriptionJobName': 'transcribe-two-days-old', 'CreationTime': now - timedelta(days=2)}
+        ]},
+    }
+
+    def list_transcription_jobs(**params):
+        if params['Status'] != 'COMPLETED':
+            return {'TranscriptionJobSummaries': []}
+        return pages[params.get('NextToken')]
+
+    monkeypatch.setattr(app.transcribe_client, 'list_transcription_jobs', list_transcription_jobs)
+    notified = []
+    monkeypatch.setattr(watcher, '_notify', notified.append)
+
+    watcher.track('transcribe-two-days-old')
+    assert watcher._poll() == 1
+    assert notified == ['transcribe-two-days-old']
+
+
+def test_webhooks_are_kept_in_the_job_index_and_sent_once(app, monkeypatch, watcher):
+    watcher.track('transcribe-with-hooks', webhook_url='https://hooks.example.com/a')
+    watcher.track('transcribe-with-hooks', webhook_url='https://hooks.example.com/b')
+    assert 'transcribe-with-hooks' in app.job_index.jobs_with_webhooks()
+
+    result = {'job_name': 'transcribe-with-hooks', 'status': 'FAILED', 'failure_reason': 'bad audio'}
+    monkeypatch.setattr(app, 'fetch_job_result', lambda job_name: dict(result))
+    monkeypatch.setattr(app, 'call_in_socketio', lambda fn, *args, **kwargs: None)
+    posted = []
+    monkeypatch.setattr(app.webhook_pool, 'submit', lambda fn, url, payload: posted.append(url))
+
+    watcher._notify('transcribe-with-hooks')
+    watcher._notify('transcribe-with-hooks')
+    assert posted == ['https://hooks.example.com/a', 'https://hooks.example.com/b']
+    assert 'transcribe-with-hooks' not in app.job_index.jobs_with_webhooks()
+
+
+def test_job_is_watched_again_when_its_result_cannot_be_fetched(app, monkeypatch, watcher):
+    app.job_index.upsert('transcribe-flaky-fetch', status='IN_PROGRESS')
+    monkeypatch.setattr(app.transcribe_client, 'list_transcription_jobs', lambda **params: {
+        'TranscriptionJobSummaries': [{'TranscriptionJobName': 'transcribe-flaky-fetch'}]
+        if params['Status'] == 'COMPLETED' else []
+    })
+    emitted = []
+    monkeypatch.setattr(app, 'call_in_socketio', lambda fn, event, result, **kwargs: emitted.append(event))
+    attempts = []
+
+    def fetch_job_result(job_name):
+        attempts.append(job_name)
+        if len(attempts) == 1:
+            raise RuntimeError('ThrottlingException')
+        return {'job_name': job_name, 'status': 'COMPLETED', 'transcript': 'hello'}
+
+    monkeypatch.setattr(app, 'fetch_job_result', fetch_job_result)
+    watcher.track('transcribe-flaky-fetch')
+
+    watcher._poll()
+    assert watcher.is_tracking('transcribe-flaky-fetch')
+    assert emitted == []
+
+    watcher._poll()
+    assert not watcher.is_tracking('transcribe-flaky-fetch')
+    assert emitted == ['job_completed']
+
+
+def test_webhook_dns_lookup_runs_off_the_hub(app, monkeypatch):
+    offloaded = []
+    monkeypatch.setattr(app, 'run_blocking', lambda fn, *args: offloaded.append(fn) or None)
+    assert app.notification_error('https://hooks.example.com/a') is None
+    assert offloaded == [app.webhook_url_error]
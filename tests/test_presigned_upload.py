@@ -0,0 +1,213 @@
+"""Direct-to-S3 batch flow: /upload-url, then /start or /s3-events starts the job"""
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def started_jobs(app, monkeypatch):
+    """Records start_transcription_job calls instead of calling Transcribe"""
+    jobs = []
+
+    def start_transcription_job(**kwargs):
+        jobs.append(kwargs)
+        return {'TranscriptionJob': {'TranscriptionJobStatus': 'IN_PROGRESS'}}
+
+    monkeypatch.setattr(app.transcribe_client, 'start_transcription_job', start_transcription_job)
+    monkeypatch.setattr(app.job_watcher, 'track', lambda job_name, **kwargs: None)
+    return jobs
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+
+def upload_url(client, **data):
+    response = client.post('/transcribe-batch-async/upload-url', json={'filename': 'meeting.mp3', **data})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def start(client, job_name, **data):
+    return client.post(f'/transcribe-batch-async/{job_name}/start', json=data)
+
+
+def test_single_put_flow(app, bucket, client, started_jobs):
+    result = upload_url(client)
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(4096))
+
+    response = start(client, result['job_name'])
+    assert response.status_code == 201
+    assert response.get_json()['bytes'] == 4099
+    assert started_jobs[0]['Media']['MediaFileUri'] == f"s3://{bucket}/{result['s3_key']}"
+
+    # The pending record is claimed: a second start does not start another job
+    assert start(client, result['job_name']).status_code == 404
+    assert len(started_jobs) == 1
+
+
+def test_missing_object_keeps_pending_record(app, bucket, client, started_jobs):
+    result = upload_url(client)
+    assert start(client, result['job_name']).status_code == 409
+
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(16))
+    assert start(client, result['job_name']).status_code == 201
+
+
+def test_empty_object_keeps_pending_record(app, bucket, client, started_jobs):
+    result = upload_url(client)
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'')
+
+    response = start(client, result['job_name'])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Uploaded object is empty'
+    assert not started_jobs
+
+    # The client can upload again and retry
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(16))
+    assert start(client, result['job_name']).status_code == 201
+
+
+def test_multipart_flow_retries_after_job_start_failure(app, bucket, client, started_jobs, monkeypatch):
+    result = upload_url(client, parts=2)
+    upload_id = result['multipart']['upload_id']
+    part_size = 5 * 1024 * 1024
+    parts = []
+    for part_number, body in ((1, bytes(part_size)), (2, b'tail')):
+        etag = app.s3_client.upload_part(Bucket=bucket, Key=result['s3_key'], UploadId=upload_id,
+                                         PartNumber=part_number, Body=body)['ETag']
+        parts.append({'part_number': part_number, 'etag': etag})
+
+    # ETags are required to complete the upload
+    assert start(client, result['job_name']).status_code == 400
+
+    def failing_start(**kwargs):
+        raise RuntimeError('Transcribe unavailable')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app.transcribe_client, 'start_transcription_job', failing_start)
+        assert start(client, result['job_name'], parts=parts).status_code == 500
+
+    # The upload was completed by the first attempt; the record still links it and the retry starts the job
+    assert app.pending_uploads.get(result['job_name'])['upload_id'] == upload_id
+    response = start(client, result['job_name'], parts=parts)
+    assert response.status_code == 201
+    assert response.get_json()['bytes'] == part_size + 4
+    assert len(started_jobs) == 1
+
+
+
+@pytest.mark.parametrize('parts', [
+    [{'part_number': 1}],
+    [{'part_number': 'x', 'etag': '"abc"'}],
+    [{'part_number': 1, 'etag': 5}],
+    ['not-an-object'],
+    {'part_number': 1, 'etag': '"abc"'},
+])
+def test_malformed_parts_are_refused_and_keep_pending_record(app, bucket, client, started_jobs, parts):
+    result = upload_url(client, parts=2)
+
+    for _ in range(2):
+        assert start(client, result['job_name'], parts=parts).status_code == 400
+    assert app.pending_uploads.get(result['job_name'])['upload_id'] == result['multipart']['upload_id']
+    assert not started_jobs
+
+
+def test_unexpected_failure_keeps_pending_record(app, bucket, client, started_jobs, monkeypatch):
+    result = upload_url(client)
+
+    def failing_head(**kwargs):
+        raise RuntimeError('connection reset')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app.s3_client, 'head_object', failing_head)
+        assert start(client, result['job_name']).status_code == 500
+
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(16))
+    assert start(client, result['job_name']).status_code == 201
+
+
+def test_non_integer_part_count_is_refused(client):
+    response = client.post('/transcribe-batch-async/upload-url', json={'filename': 'meeting.mp3', 'parts': 'two'})
+    assert response.status_code == 400
+
+
+def s3_event(key):
+    return {'Records': [{'s3': {'object': {'key': key}}}]}
+
+
+def test_s3_event_starts_single_put_upload(app, bucket, client, started_jobs, monkeypatch):
+    monkeypatch.setattr(app, 'S3_EVENT_TOKEN', 'secret-token')
+    result = upload_url(client)
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(16))
+
+    response = client.post('/s3-events', json=s3_event(result['s3_key']), headers={'X-S3-Event-Token': 'secret-token'})
+    assert response.status_code == 200
+    assert response.get_json()['processed'] == 1
+    assert len(started_jobs) == 1
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-S3-Event-Token': 'wrong'}, {'X-S3-Event-Token': 'sécret'}])
+def test_s3_event_with_bad_token_is_refused(app, bucket, client, started_jobs, monkeypatch, headers):
+    monkeypatch.setattr(app, 'S3_EVENT_TOKEN', 'secret-token')
+    result = upload_url(client)
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(16))
+
+    response = client.post('/s3-events', json=s3_event(result['s3_key']), headers=headers)
+    assert response.status_code == 403
+    assert not started_jobs
+    assert app.pending_uploads.get(result['job_name'])
+
+
+def test_pending_uploads_are_shared_through_redis(app, bucket, client, started_jobs, monkeypatch):
+    server = fakeredis.FakeServer()
+
+    def worker():
+        uploads = app.RedisPendingUploads('redis://localhost:6379/0', ttl=60)
+        uploads.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        return uploads
+
+    # /upload-url is served by one worker...
+    monkeypatch.setattr(app, 'pending_uploads', worker())
+    result = upload_url(client)
+    app.s3_client.put_object(Bucket=bucket, Key=result['s3_key'], Body=b'ID3' + bytes(16))
+    assert 0 < app.pending_uploads.redis.ttl(f"stt:upload:{result['job_name']}") <= 60
+
+    # ...and /start by another, which sees the same record and claims it once
+    monkeypatch.setattr(app, 'pending_uploads', worker())
+    assert start(client, result['job_name']).status_code == 201
+    assert start(client, result['job_name']).status_code == 404
+    assert len(started_jobs) == 1
+
+
+def test_redis_pending_upload_restore_keeps_expiry(app):
+    uploads = app.RedisPendingUploads('redis://localhost:6379/0', ttl=60)
+    uploads.redis = fakeredis.FakeRedis(decode_responses=True)
+    uploads.add('transcribe-x', {'s3_key': 'audio/x.mp3', 'upload_id': None, 'completed': False})
+
+    upload = uploads.pop('transcribe-x')
+    assert upload['s3_key'] == 'audio/x.mp3'
+    assert uploads.pop('transcribe-x') is None
+
+    uploads.restore('transcribe-x', upload)
+    assert uploads.get('transcribe-x') == upload
+    assert 0 < uploads.redis.ttl('stt:upload:transcribe-x') <= 60
+
+
+def test_s3_calls_run_off_the_hub(app, bucket, client, started_jobs, monkeypatch):
+    offloaded = []
+    run_blocking = app.run_blocking
+
+    def recording_run_blocking(fn, *args, **kwargs):
+        offloaded.append(getattr(fn, '__name__', fn))
+        return run_blocking(fn, *args, **kwargs)
+
+    monkeypatch.setattr(app, 'run_blocking', recording_run_blocking)
+    result = upload_url(client, parts=1)
+    upload_id = result['multipart']['upload_id']
+    etag = app.s3_client.upload_part(Bucket=bucket, Key=result['s3_key'], UploadId=upload_id,
+                                     PartNumber=1, Body=b'ID3' + bytes(16))['ETag']
+
+    assert start(client, result['job_name'], parts=[{'part_number': 1, 'etag': etag}]).status_code == 201
+    assert offloaded == ['presign_direct_upload', 'complete_multipart_upload', 'head_object', 'start_batch_job']
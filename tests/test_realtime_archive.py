@@ -0,0 +1,127 @@
+"""Real-time session audio archival to S3 (multipart upload + AudioBuffer recycling)"""
+
+import pytest
+
+
+PART_SIZE = None  # Set from app.REALTIME_UPLOAD_PART_SIZE in the fixture
+
+
+@pytest.fixture
+def session(app, bucket):
+    """A session with its multipart archive started, as start() would leave it (no Transcribe stream)"""
+    global PART_SIZE
+    PART_SIZE = app.REALTIME_UPLOAD_PART_SIZE
+    start_memory = app.AudioBuffer.memory_bytes
+
+    session = app.TranscriptionSession('sid-archive', runner=app.loop_pool.runners[0])
+    session.s3_key = 'audio/realtime/test/session-sid-archive.pcm'
+    session.upload = app.S3MultipartUpload(bucket, session.s3_key, session.content_type)
+    session.upload.start()
+    session.audio_buffer = session._new_buffer()
+    yield session
+
+    # Every buffer the session created has been closed again
+    assert app.AudioBuffer.memory_bytes == start_memory
+    assert app.AudioBuffer.spilled_bytes == 0
+
+
+def run(session, coro):
+    return session.runner.submit(coro).result(timeout=60)
+
+
+async def wait(task):
+    await task
+
+
+async def archive(session, data, chunk_size=64 * 1024):
+    for offset in range(0, len(data), chunk_size):
+        await session._archive_chunk(data[offset:offset + chunk_size])
+
+
+def audio(size):
+    return bytes(range(256)) * (size // 256) + bytes(size % 256)
+
+
+def stored(app, bucket, key):
+    return app.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+@pytest.mark.parametrize('size_parts', [0.5, 1, 2, 2.4])
+def test_multipart_round_trip(app, bucket, session, size_parts):
+    data = audio(int(PART_SIZE * size_parts))
+    upload = session.upload
+
+    run(session, archive(session, data))
+    url = run(session, session.save_to_s3())
+
+    assert url == f's3://{bucket}/{session.s3_key}'
+    assert stored(app, bucket, session.s3_key) == data
+    # Full parts while recording, plus the short tail on stop
+    assert len(upload.parts) == max(1, -(-len(data) // PART_SIZE))
+    assert not app.s3_client.list_multipart_uploads(Bucket=bucket).get('Uploads')
+
+
+def test_part_boundary_flushes_exactly_at_part_size(app, bucket, session):
+    run(session, archive(session, audio(PART_SIZE - 1), chunk_size=PART_SIZE - 1))
+    assert session._part_task is None
+    assert session.bytes_held == PART_SIZE - 1
+
+    run(session, archive(session, b'\x00'))
+    assert session._part_task is not None
+    run(session, wait(session._part_task))
+    assert [part['PartNumber'] for part in session.upload.parts] == [1]
+    assert session.bytes_held == 0
+
+    assert run(session, session.save_to_s3())
+    assert len(stored(app, bucket, session.s3_key)) == PART_SIZE
+
+
+def test_buffers_are_recycled_and_closed(app, bucket, session):
+    created = []
+    original_init = app.AudioBuffer.__init__
+
+    def counting_init(buffer, *args, **kwargs):
+        created.append(buffer)
+        original_init(buffer, *args, **kwargs)
+
+    app.AudioBuffer.__init__ = counting_init
+    try:
+        run(session, archive(session, audio(int(PART_SIZE * 4.5))))
+        assert run(session, session.save_to_s3())
+    finally:
+        app.AudioBuffer.__init__ = original_init
+
+    # One extra buffer for double-buffering; later parts reuse the spare
+    assert len(created) == 1
+    assert session.audio_buffer is None and session._spare_buffer is None
+
+
+def test_empty_session_is_not_saved(app, bucket, session):
+    assert run(session, session.save_to_s3()) is None
+    assert not app.s3_client.list_multipart_uploads(Bucket=bucket).get('Uploads')
+
+
+def test_buffers_stop_growing_at_one_part(app, bucket, session):
+    start_memory = app.AudioBuffer.memory_bytes
+    limit = PART_SIZE + app.AudioBuffer.INITIAL_CAPACITY
+
+    run(session, archive(session, audio(int(PART_SIZE * 2.5))))
+    run(session, wait(session._part_task))
+
+    # Active buffer plus the recycled spare, each capped at one part plus a chunk of slack
+    assert session.audio_buffer.capacity <= limit
+    assert session._spare_buffer.capacity <= limit
+    assert app.AudioBuffer.memory_bytes - start_memory <= 2 * limit
+    assert run(session, session.save_to_s3())
+
+
+def test_spare_is_released_under_memory_pressure(app, bucket, session, monkeypatch):
+    # Half the cap is already below this session's own footprint
+    monkeypatch.setattr(app, 'REALTIME_MAX_BUFFERED_BYTES', 2 * PART_SIZE)
+
+    run(session, archive(session, audio(int(PART_SIZE * 1.5))))
+    run(session, wait(session._part_task))
+    assert session._spare_buffer is None
+
+    assert run(session, session.save_to_s3())
+    assert len(stored(app, bucket, session.s3_key)) == int(PART_SIZE * 1.5)
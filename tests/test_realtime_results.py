@@ -0,0 +1,105 @@
+"""RealtimeEventHandler: partial throttling, delta offsets, and finals that are always sent"""
+
+import asyncio
+import types
+
+import pytest
+
+
+def transcript_event(*results):
+    """TranscriptEvent stand-in from (result_id, text, is_partial) tuples"""
+    return types.SimpleNamespace(transcript=types.SimpleNamespace(results=[
+        types.SimpleNamespace(result_id=result_id, is_partial=is_partial,
+                              alternatives=[types.SimpleNamespace(transcript=text)])
+        for result_id, text, is_partial in results
+    ]))
+
+
+@pytest.fixture
+def emitted(app, monkeypatch):
+    payloads = []
+
+    def call_in_socketio(fn, event, payload, **kwargs):
+        assert (event, kwargs) == ('transcription_result', {'room': 'sid-results'})
+        payloads.append(payload)
+
+    monkeypatch.setattr(app, 'call_in_socketio', call_in_socketio)
+    return payloads
+
+
+def test_partials_are_throttled_to_the_latest_text(app, emitted):
+    handler = app.RealtimeEventHandler(None, 'sid-results', partials_per_second=10)
+
+    async def run():
+        await handler.handle_transcript_event(transcript_event(('r1', 'the', True)))
+        await handler.handle_transcript_event(transcript_event(('r1', 'the quick', True)))
+        await handler.handle_transcript_event(transcript_event(('r1', 'the quick brown', True)))
+        assert [payload['text'] for payload in emitted] == ['the']
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert [payload['text'] for payload in emitted] == ['the', 'the quick brown']
+    stats = handler.stats()
+    assert (stats['partials_received'], stats['partials_emitted'], stats['partials_skipped']) == (3, 2, 1)
+
+
+def test_finals_are_sent_while_partials_wait(app, emitted):
+    handler = app.RealtimeEventHandler(None, 'sid-results', partials_per_second=1)
+
+    async def run():
+        await handler.handle_transcript_event(transcript_event(('r1', 'hello', True)))
+        await handler.handle_transcript_event(transcript_event(('r1', 'hello there', True)))
+        await handler.handle_transcript_event(transcript_event(('r1', 'Hello there.', False)))
+        # The final replaced the throttled partial, so nothing is left to flush
+        handler.close()
+
+    asyncio.run(run())
+    assert [(payload['text'], payload['is_partial']) for payload in emitted] == [
+        ('hello', True), ('Hello there.', False)]
+    assert handler.stats()['finals_emitted'] == 1
+
+
+def test_unchanged_partials_are_skipped(app, emitted):
+    handler = app.RealtimeEventHandler(None, 'sid-results')
+
+    async def run():
+        for _ in range(3):
+            await handler.handle_transcript_event(transcript_event(('r1', 'same text', True)))
+
+    asyncio.run(run())
+    assert len(emitted) == 1
+    assert handler.stats()['partials_skipped'] == 2
+
+
+def test_delta_mode_sends_text_after_the_common_prefix(app, emitted):
+    handler = app.RealtimeEventHandler(None, 'sid-results', result_mode='delta')
+
+    async def run():
+        for text in ('hello', 'hello wor', 'hello world', 'hello word'):
+            await handler.handle_transcript_event(transcript_event(('r1', text, True)))
+        await handler.handle_transcript_event(transcript_event(('r1', 'Hello, world.', False)))
+        await handler.handle_transcript_event(transcript_event(('r2', 'next', True)))
+
+    asyncio.run(run())
+    assert [(payload['offset'], payload['text']) for payload in emitted] == [
+        (0, 'hello'), (5, ' wor'), (9, 'ld'), (9, 'd'),
+        (0, 'Hello, world.'),  # finals carry the whole text
+        (0, 'next')]
+
+    # Applying each delta at its offset rebuilds every partial the client should show
+    shown = ''
+    for payload in emitted[:4]:
+        shown = shown[:payload['offset']] + payload['text']
+    assert shown == 'hello word'
+
+
+def test_close_flushes_a_throttled_partial(app, emitted):
+    handler = app.RealtimeEventHandler(None, 'sid-results', partials_per_second=1)
+
+    async def run():
+        await handler.handle_transcript_event(transcript_event(('r1', 'first', True)))
+        await handler.handle_transcript_event(transcript_event(('r1', 'first words', True)))
+        handler.close()
+
+    asyncio.run(run())
+    assert [payload['text'] for payload in emitted] == ['first', 'first words']
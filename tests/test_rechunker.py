@@ -0,0 +1,98 @@
+"""AudioRechunker: frame coalescing, the stale-frame timer flush and real-time pacing"""
+
+import asyncio
+import time
+
+import pytest
+
+
+def rechunker(app, **options):
+    """AudioRechunker whose sends are recorded as (monotonic time, frame)"""
+    sent = []
+
+    async def send(frame):
+        sent.append((time.monotonic(), frame))
+
+    return app.AudioRechunker(send, **options), sent
+
+
+def test_small_chunks_are_coalesced_into_frames(app):
+    chunker, sent = rechunker(app, frame_ms=100, lead_ms=0)
+    audio = bytes(range(256)) * 30  # 7680 bytes: two 3200-byte frames and a remainder
+
+    async def run():
+        for offset in range(0, len(audio), 640):
+            await chunker.write(audio[offset:offset + 640])
+        assert [len(frame) for _, frame in sent] == [3200, 3200]
+        await chunker.flush()
+
+    asyncio.run(run())
+    assert [len(frame) for _, frame in sent] == [3200, 3200, 1280]
+    assert b''.join(frame for _, frame in sent) == audio
+    assert chunker.stats()['frames_in'] == 12
+    assert chunker.stats()['frames_out'] == 3
+
+
+def test_frame_sized_chunks_are_sent_as_is(app):
+    chunker, sent = rechunker(app, frame_ms=100, lead_ms=0)
+    frame = bytes(3200)
+
+    asyncio.run(chunker.write(frame))
+    assert sent[0][1] is frame
+
+
+def test_partial_frame_is_flushed_after_max_delay(app):
+    chunker, sent = rechunker(app, frame_ms=100, max_delay_ms=50, lead_ms=0)
+
+    async def run():
+        written = time.monotonic()
+        await chunker.write(bytes(1000))
+        assert sent == []
+        await asyncio.sleep(0.3)
+        return written
+
+    written = asyncio.run(run())
+    assert [len(frame) for _, frame in sent] == [1000]
+    assert sent[0][0] - written >= 0.05
+    assert chunker.stats()['timer_flushes'] == 1
+
+
+def test_timer_send_failure_surfaces_on_next_write(app):
+    async def failing_send(frame):
+        raise ConnectionError('stream closed')
+
+    chunker = app.AudioRechunker(failing_send, frame_ms=100, max_delay_ms=10, lead_ms=0)
+
+    async def run():
+        await chunker.write(bytes(100))
+        await asyncio.sleep(0.1)
+        with pytest.raises(ConnectionError):
+            await chunker.write(bytes(100))
+
+    asyncio.run(run())
+
+
+def test_backlog_is_paced_to_real_time(app):
+    # Ten 20 ms frames at once: only 50 ms of audio may be sent ahead of the wall clock
+    chunker, sent = rechunker(app, frame_ms=20, lead_ms=50)
+
+    async def run():
+        start = time.monotonic()
+        await chunker.write(bytes(640 * 10))
+        return start
+
+    start = asyncio.run(run())
+    assert len(sent) == 10
+    for index, (sent_at, _) in enumerate(sent):
+        assert sent_at - start >= index * 0.02 - 0.05 - 0.005
+    assert sent[-1][0] - start >= 0.12
+    assert chunker.stats()['pacing_wait_seconds'] > 0
+
+
+def test_pacing_can_be_disabled(app):
+    chunker, sent = rechunker(app, frame_ms=20, lead_ms=0)
+
+    asyncio.run(chunker.write(bytes(640 * 10)))
+    assert len(sent) == 10
+    assert sent[-1][0] - sent[0][0] < 0.05
+    assert chunker.stats()['pacing_wait_seconds'] == 0
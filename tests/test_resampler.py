@@ -0,0 +1,80 @@
+"""Server-side downmix and resampling of client audio to 16 kHz mono s16"""
+
+import numpy as np
+import pytest
+
+from audio_processing import SUPPORTED_SAMPLE_RATES, AudioConverter, StreamingResampler
+
+
+def tone(sample_rate, seconds, frequency=440.0, channels=1):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    mono = 0.5 * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(mono[:, None], channels, axis=1).astype(np.float32)
+
+
+@pytest.mark.parametrize('input_rate', [8000, 22050, 44100, 48000])
+def test_chunked_resampling_matches_one_shot(input_rate):
+    samples = tone(input_rate, 1.0)[:, 0]
+    one_shot = StreamingResampler(input_rate).process(samples)
+
+    resampler = StreamingResampler(input_rate)
+    rng = np.random.default_rng(input_rate)
+    pieces, start = [], 0
+    while start < len(samples):
+        size = int(rng.integers(1, 700))
+        pieces.append(resampler.process(samples[start:start + size]))
+        start += size
+
+    np.testing.assert_allclose(np.concatenate(pieces), one_shot, atol=1e-6)
+
+
+@pytest.mark.parametrize('input_rate', [8000, 11025, 44100, 48000, 96000])
+def test_output_length_follows_the_rate_ratio(input_rate):
+    output = StreamingResampler(input_rate).process(tone(input_rate, 2.0)[:, 0])
+    # Only the filter's look-ahead (a few ms) is held back
+    assert 16000 * 2 - 40 <= len(output) <= 16000 * 2
+
+
+def test_converter_downmixes_and_resamples_stereo_f32():
+    audio = tone(48000, 1.0, channels=2)
+    converted = AudioConverter(48000, 2, 'f32').convert(audio.tobytes())
+    pcm = np.frombuffer(converted, dtype='<i2')
+
+    assert abs(len(pcm) - 16000) <= 40
+    # A 440 Hz tone at half scale survives the conversion
+    steady = pcm[1000:-1000].astype(np.float32) / 32768
+    assert 0.45 < np.max(np.abs(steady)) < 0.55
+
+
+def test_partial_frames_are_carried_to_the_next_chunk():
+    raw = (tone(44100, 0.5, channels=2) * 32767).astype('<i2').tobytes()
+    whole = AudioConverter(44100, 2, 's16').convert(raw)
+
+    converter = AudioConverter(44100, 2, 's16')
+    # 4-byte frames split at odd offsets
+    pieces = [converter.convert(raw[start:start + 1001]) for start in range(0, len(raw), 1001)]
+    assert b''.join(pieces) == whole
+    assert converter.convert(b'\x01') == b''
+
+
+def test_passthrough_needs_no_resampler():
+    converter = AudioConverter(16000, 1, 's16')
+    assert converter.is_passthrough
+    assert converter.resampler is None
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'sample_rate': 44101},
+    {'sample_rate': 191999},
+    {'sample_rate': 4000},
+    {'channels': 9},
+    {'sample_format': 's24'},
+])
+def test_unsupported_formats_are_refused(kwargs):
+    with pytest.raises(ValueError):
+        AudioConverter(**kwargs)
+
+
+def test_sessions_at_the_same_rate_share_one_filter():
+    assert AudioConverter(44100).resampler.phases is AudioConverter(44100).resampler.phases
+    assert all(AudioConverter(rate) for rate in SUPPORTED_SAMPLE_RATES)
@@ -0,0 +1,108 @@
+"""Final job results: the LRU memory tier, the SQLite disk tier, hit/miss counters and fetch_job_result caching"""
+
+import datetime
+import time
+
+import pytest
+
+
+def test_lru_evicts_least_recently_used_by_bytes(app):
+    cache = app.LRUCache(max_bytes=10)
+    cache.put('a', 'A', 4)
+    cache.put('b', 'B', 4)
+    assert cache.get('a') == 'A'  # 'b' is now the least recently used
+
+    cache.put('c', 'C', 4)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+    assert (len(cache), cache.current_bytes) == (2, 8)
+
+
+def test_lru_replaces_entries_and_skips_oversized_values(app):
+    cache = app.LRUCache(max_bytes=10)
+    cache.put('a', 'old', 6)
+    cache.put('a', 'new', 3)
+    cache.put('huge', 'H', 11)
+
+    assert cache.get('a') == 'new'
+    assert cache.get('huge') is None
+    assert cache.current_bytes == 3
+
+
+def test_lru_expires_entries_after_ttl(app):
+    cache = app.LRUCache(max_bytes=10, ttl=60)
+    cache.put('fresh', 'F', 2)
+    cache.put('stale', 'S', 2, created_at=time.time() - 120)
+
+    assert cache.get('fresh') == 'F'
+    assert cache.get('stale') is None
+    assert (len(cache), cache.current_bytes) == (1, 2)
+
+
+def test_transcript_cache_counts_hits_and_misses(app):
+    cache = app.TranscriptResultCache(1024 * 1024)
+    assert cache.get('job') is None
+    cache.put('job', {'status': 'COMPLETED'})
+    assert cache.get('job') == {'status': 'COMPLETED'}
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['disk_hits'], stats['misses']) == (1, 0, 1)
+    assert stats['entries'] == 1
+    assert stats['persistent'] is False
+
+
+def test_transcript_cache_falls_back_to_disk(app, tmp_path):
+    db_path = str(tmp_path / 'results.db')
+    app.TranscriptResultCache(1024 * 1024, db_path).put('job', {'status': 'FAILED', 'failure_reason': 'bad audio'})
+
+    # A restarted server serves the result from SQLite, then from memory
+    restarted = app.TranscriptResultCache(1024 * 1024, db_path)
+    assert restarted.get('job')['failure_reason'] == 'bad audio'
+    assert restarted.get('job')['status'] == 'FAILED'
+    stats = restarted.stats()
+    assert (stats['hits'], stats['disk_hits'], stats['misses']) == (2, 1, 0)
+    assert stats['persistent'] is True
+
+
+@pytest.fixture
+def transcribe_calls(app, monkeypatch):
+    """Fake get_transcription_job; returns (calls, statuses) where statuses[job_name] sets each job's status"""
+    calls = []
+    statuses = {}
+
+    def get_transcription_job(TranscriptionJobName):
+        calls.append(TranscriptionJobName)
+        return {'TranscriptionJob': {
+            'TranscriptionJobName': TranscriptionJobName,
+            'TranscriptionJobStatus': statuses[TranscriptionJobName],
+            'LanguageCode': 'en-US',
+            'CreationTime': datetime.datetime.now(datetime.timezone.utc),
+            'FailureReason': 'Unsupported media',
+        }}
+
+    monkeypatch.setattr(app.transcribe_client, 'get_transcription_job', get_transcription_job)
+    monkeypatch.setattr(app, 'transcript_cache', app.TranscriptResultCache(1024 * 1024))
+    return calls, statuses
+
+
+def test_final_job_results_are_fetched_once(app, transcribe_calls):
+    calls, statuses = transcribe_calls
+    statuses['transcribe-failed'] = 'FAILED'
+
+    first = app.fetch_job_result('transcribe-failed')
+    second = app.fetch_job_result('transcribe-failed')
+
+    assert first == second
+    assert first['failure_reason'] == 'Unsupported media'
+    assert calls == ['transcribe-failed']
+
+
+def test_running_jobs_are_not_cached(app, transcribe_calls):
+    calls, statuses = transcribe_calls
+    statuses['transcribe-running'] = 'IN_PROGRESS'
+
+    app.fetch_job_result('transcribe-running')
+    app.fetch_job_result('transcribe-running')
+
+    assert calls == ['transcribe-running', 'transcribe-running']
+    assert app.transcript_cache.stats()['entries'] == 0
@@ -0,0 +1,261 @@
+"""Session registry admission and cleanup (Redis via fakeredis) and session start lifecycle"""
+
+import concurrent.futures
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_registry(app, server, worker_id='worker-a'):
+    registry = app.RedisSessionRegistry('redis://localhost:6379/0', worker_id, ttl=20)
+    registry.redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return registry
+
+
+def test_register_enforces_global_and_language_limits(app, server):
+    registry = make_registry(app, server)
+    assert registry.register('s1', max_sessions=2, max_language_sessions=1, language_code='en-US') is None
+    assert registry.register('s2', max_sessions=2, max_language_sessions=1, language_code='en-US') == 'language'
+    assert registry.register('s2', max_sessions=2, max_language_sessions=1, language_code='zh-HK') is None
+    assert registry.register('s3', max_sessions=2, language_code='fr-FR') == 'global'
+    assert registry.count() == 2
+    assert registry.language_counts() == {'en-US': 1, 'zh-HK': 1}
+
+
+def test_duplicate_register_keeps_one_slot(app, server):
+    registry = make_registry(app, server)
+    for _ in range(3):
+        assert registry.register('s1', max_sessions=1, max_language_sessions=1, language_code='en-US') is None
+    assert registry.count() == 1
+    assert registry.language_counts() == {'en-US': 1}
+
+    # Re-registering under another language moves the slot
+    assert registry.register('s1', max_language_sessions=1, language_code='zh-HK') is None
+    assert registry.language_counts() == {'zh-HK': 1}
+
+    registry.unregister('s1')
+    assert registry.count() == 0
+    assert registry.language_counts() == {}
+
+
+def test_update_and_unregister(app, server):
+    registry = make_registry(app, server)
+    registry.register('s1', language_code='en-US')
+    registry.update('s1', s3_key='audio/x.pcm', upload_id=None)
+    assert registry.redis.hgetall('stt:session:s1')['s3_key'] == 'audio/x.pcm'
+    assert registry.owner('s1') == 'worker-a'
+
+    registry.unregister('s1')
+    registry.unregister('s1')
+    assert registry.owner('s1') is None
+    assert registry.language_counts() == {}
+
+
+def test_reap_removes_sessions_of_dead_workers(app, server):
+    dead = make_registry(app, server, 'worker-dead')
+    live = make_registry(app, server, 'worker-live')
+    dead.heartbeat()
+    live.heartbeat()
+    dead.register('s1', language_code='en-US', s3_key='audio/s1.pcm', upload_id='u1')
+    live.register('s2', language_code='en-US')
+
+    # Nothing is reaped while the heartbeat is alive
+    assert live.reap() == []
+
+    dead.redis.delete('stt:worker:worker-dead:alive')
+    reaped = live.reap()
+    assert [info['sid'] for info in reaped] == ['s1']
+    assert reaped[0]['upload_id'] == 'u1'
+    assert live.count() == 1
+    assert live.language_counts() == {'en-US': 1}
+    assert live.reaped_sessions == 1
+    assert 'worker-dead' not in live.redis.smembers('stt:workers')
+
+
+def test_local_registry_duplicate_register_keeps_one_slot(app):
+    registry = app.LocalSessionRegistry('local')
+    assert registry.register('s1', max_sessions=1, max_language_sessions=1, language_code='en-US') is None
+    assert registry.register('s1', max_sessions=1, max_language_sessions=1, language_code='en-US') is None
+    assert registry.register('s2', max_sessions=1, language_code='en-US') == 'global'
+    assert registry.language_counts() == {'en-US': 1}
+
+
+class FakeInputStream:
+    def __init__(self):
+        self.ended = False
+
+    async def end_stream(self):
+        self.ended = True
+
+
+class FakeStream:
+    def __init__(self):
+        self.input_stream = FakeInputStream()
+
+
+def start_transcription(app, monkeypatch, sid, data):
+    """Run the start_transcription handler for `sid`; returns the events it emitted"""
+    emitted = []
+    monkeypatch.setattr(app, 'emit', lambda event, payload=None, **kwargs: emitted.append((event, payload)))
+
+    def handle():
+        with app.app.test_request_context('/socket.io/'):
+            app.request.sid = sid
+            app.handle_start_transcription(data)
+
+    # Off the main thread run_blocking calls straight through (no eventlet hub in tests)
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        executor.submit(handle).result(timeout=30)
+    return emitted
+
+
+def test_second_start_on_same_connection_is_refused(app, monkeypatch):
+    existing = object()
+    app.active_sessions['sid-dup'] = existing
+    try:
+        emitted = start_transcription(app, monkeypatch, 'sid-dup', {'language_code': 'en-US'})
+        assert emitted == [('error', {'message': 'A transcription session is already active. Stop it first.',
+                                      'code': 'session_active'})]
+        assert app.active_sessions['sid-dup'] is existing
+    finally:
+        app.active_sessions.pop('sid-dup', None)
+
+
+def test_session_is_stopped_when_start_fails_after_stream_opens(app, monkeypatch):
+    streams = []
+
+    async def fake_start(session):
+        session.handshake_seconds = 0.01
+        session.stream = FakeStream()
+        session.is_active = True
+        session.audio_buffer = app.AudioBuffer()
+        streams.append(session.stream)
+
+    def failing_update(sid, **info):
+        raise RuntimeError('registry unavailable')
+
+    monkeypatch.setattr(app.TranscriptionSession, 'start', fake_start)
+    monkeypatch.setattr(app.session_registry, 'update', failing_update)
+    start_memory = app.AudioBuffer.memory_bytes
+
+    emitted = start_transcription(app, monkeypatch, 'sid-fail', {'language_code': 'en-US'})
+    assert [event for event, _ in emitted] == ['error']
+    assert 'registry unavailable' in emitted[0][1]['message']
+    assert streams and streams[0].input_stream.ended
+    assert 'sid-fail' not in app.active_sessions
+    assert app.session_registry.owner('sid-fail') is None
+    assert app.AudioBuffer.memory_bytes == start_memory
+
+
+def test_failed_stop_frees_the_session(app, monkeypatch):
+    async def fake_start(session):
+        session.handshake_seconds = 0.01
+        session.stream = FakeStream()
+        session.is_active = True
+        session.audio_buffer = app.AudioBuffer()
+
+    async def failing_stop(session):
+        raise RuntimeError('stream already closed')
+
+    monkeypatch.setattr(app.TranscriptionSession, 'start', fake_start)
+    monkeypatch.setattr(app.TranscriptionSession, 'stop', failing_stop)
+    start_memory = app.AudioBuffer.memory_bytes
+
+    assert start_transcription(app, monkeypatch, 'sid-stop', {'language_code': 'en-US'})[-1][0] == 'transcription_started'
+
+    emitted = []
+    monkeypatch.setattr(app, 'emit', lambda event, payload=None, **kwargs: emitted.append((event, payload)))
+
+    def stop():
+        with app.app.test_request_context('/socket.io/'):
+            app.request.sid = 'sid-stop'
+            app.handle_stop_transcription()
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        executor.submit(stop).result(timeout=30)
+
+    assert emitted == [('error', {'message': 'stream already closed'})]
+    assert 'sid-stop' not in app.active_sessions
+    assert app.session_registry.owner('sid-stop') is None
+    assert app.AudioBuffer.memory_bytes == start_memory
+
+    # The client can start a new session straight away
+    try:
+        emitted = start_transcription(app, monkeypatch, 'sid-stop', {'language_code': 'en-US'})
+        assert emitted[-1][0] == 'transcription_started'
+    finally:
+        app.release_session('sid-stop')
+
+
+class FakeUpload:
+    upload_id = 'upload-1'
+
+    def __init__(self, *args):
+        self.aborted = False
+
+    def start(self):
+        pass
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_failed_setup_ends_stream_and_aborts_upload(app, monkeypatch):
+    stream = FakeStream()
+    stream.output_stream = None
+    uploads = []
+
+    class FakeClient:
+        async def start_stream_transcription(self, **kwargs):
+            return stream
+
+    def new_upload(*args):
+        uploads.append(FakeUpload())
+        return uploads[-1]
+
+    def failing_queue(*args):
+        raise RuntimeError('no queue')
+
+    monkeypatch.setattr(app, 'REALTIME_UPLOAD_MODE', 'multipart')
+    monkeypatch.setattr(app, 'S3MultipartUpload', new_upload)
+    monkeypatch.setattr(app, 'ChunkQueue', failing_queue)
+    monkeypatch.setattr(app.streaming_clients, 'client_for', lambda runner: FakeClient())
+    start_memory = app.AudioBuffer.memory_bytes
+
+    runner = app.loop_pool.runner_for('sid-setup')
+    session = app.TranscriptionSession('sid-setup', 'en-US', runner)
+    with pytest.raises(RuntimeError):
+        runner.submit(session.start()).result(timeout=10)
+
+    assert not session.is_active
+    assert stream.input_stream.ended
+    assert uploads[0].aborted and session.upload is None
+    assert app.AudioBuffer.memory_bytes == start_memory
+
+
+def test_disconnect_during_start_closes_the_new_stream(app, monkeypatch):
+    streams = []
+
+    async def fake_start(session):
+        session.handshake_seconds = 0.01
+        session.stream = FakeStream()
+        session.audio_buffer = app.AudioBuffer()
+        streams.append(session.stream)
+        # The client disconnects while the handshake is in flight
+        app.release_session(session.session_id)
+        session.is_active = True
+
+    monkeypatch.setattr(app.TranscriptionSession, 'start', fake_start)
+    start_memory = app.AudioBuffer.memory_bytes
+
+    emitted = start_transcription(app, monkeypatch, 'sid-gone', {'language_code': 'en-US'})
+    assert emitted == []
+    assert streams[0].input_stream.ended
+    assert 'sid-gone' not in app.active_sessions
+    assert app.session_registry.owner('sid-gone') is None
+    assert app.AudioBuffer.memory_bytes == start_memory
@@ -0,0 +1,105 @@
+"""Raw-body streaming upload: Content-Length and chunked bodies, and bodies that cannot be delimited"""
+
+import io
+import os
+import threading
+
+import pytest
+
+
+class ChunkedInput(io.BytesIO):
+    """eventlet.wsgi.Input stand-in: a chunked body the server has already de-chunked"""
+    chunked_input = True
+
+
+@pytest.fixture
+def started_jobs(app, monkeypatch):
+    jobs = []
+
+    def start_transcription_job(**kwargs):
+        jobs.append(kwargs)
+        return {'TranscriptionJob': {'TranscriptionJobStatus': 'IN_PROGRESS'}}
+
+    monkeypatch.setattr(app.transcribe_client, 'start_transcription_job', start_transcription_job)
+    monkeypatch.setattr(app.job_watcher, 'track', lambda job_name, **kwargs: None)
+    return jobs
+
+
+def post_stream(app, body, **environ):
+    client = app.app.test_client()
+    return client.post('/transcribe-batch-async/stream?filename=meeting.mp3', data=body,
+                       content_type='application/octet-stream', environ_overrides=environ)
+
+
+def test_content_length_body_is_uploaded(app, bucket, started_jobs):
+    response = post_stream(app, b'ID3' + bytes(4096))
+    assert response.status_code == 201
+    assert response.get_json()['bytes'] == 4099
+    assert len(started_jobs) == 1
+
+
+def test_chunked_body_is_read_from_server_input(app, bucket, started_jobs):
+    audio = b'ID3' + bytes(range(256)) * 64
+    response = post_stream(app, b'', HTTP_TRANSFER_ENCODING='chunked',
+                           **{'wsgi.input': ChunkedInput(audio)})
+    assert response.status_code == 201
+    key = response.get_json()['audio_url'].split('.amazonaws.com/')[-1]
+    assert app.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read() == audio
+
+
+def test_undelimited_body_is_refused_before_s3(app, bucket, started_jobs):
+    # No Content-Length and not chunked: werkzeug would read it as empty
+    response = post_stream(app, b'', **{'wsgi.input': io.BytesIO(b'ID3' + bytes(64))})
+    assert response.status_code == 411
+    assert not app.s3_client.list_objects_v2(Bucket=bucket).get('Contents')
+    assert not started_jobs
+
+
+def test_empty_body_is_refused_before_s3(app, bucket, started_jobs):
+    response = post_stream(app, b'', CONTENT_LENGTH='0')
+    assert response.status_code == 400
+    assert not app.s3_client.list_objects_v2(Bucket=bucket).get('Contents')
+
+
+class ThreadRecordingInput(io.BytesIO):
+    """Server input that records which thread reads it"""
+    chunked_input = True
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.threads = set()
+
+    def read(self, size=-1):
+        self.threads.add(threading.current_thread())
+        return super().read(size)
+
+
+def test_large_body_is_read_on_the_server_thread_and_uploaded_in_parts(app, bucket, started_jobs, monkeypatch):
+    monkeypatch.setattr(app, 'S3_MULTIPART_CHUNK_MB', 5)
+    monkeypatch.setattr(app, 'S3_MAX_CONCURRENCY', 2)
+    audio = b'ID3' + os.urandom(12 * 1024 * 1024)
+    body = ThreadRecordingInput(audio)
+
+    response = post_stream(app, b'', HTTP_TRANSFER_ENCODING='chunked', **{'wsgi.input': body})
+    assert response.status_code == 201
+    assert response.get_json()['bytes'] == len(audio)
+    assert body.threads == {threading.main_thread()}
+
+    key = response.get_json()['audio_url'].split('.amazonaws.com/')[-1]
+    stored = app.s3_client.get_object(Bucket=bucket, Key=key)
+    assert stored['Body'].read() == audio
+    assert stored['ETag'].endswith('-3"')
+
+
+def test_failed_part_aborts_the_upload(app, bucket, started_jobs, monkeypatch):
+    monkeypatch.setattr(app, 'S3_MULTIPART_CHUNK_MB', 5)
+
+    def failing_part(*args):
+        raise RuntimeError('connection reset')
+
+    monkeypatch.setattr(app, 'upload_stream_part', failing_part)
+    response = post_stream(app, b'', HTTP_TRANSFER_ENCODING='chunked',
+                           **{'wsgi.input': ChunkedInput(b'ID3' + bytes(11 * 1024 * 1024))})
+    assert response.status_code == 500
+    assert not app.s3_client.list_multipart_uploads(Bucket=bucket).get('Uploads')
+    assert not started_jobs
@@ -0,0 +1,15 @@
+"""Shared Transcribe streaming clients: pre-warming against the SDK internals"""
+
+
+class RunnerStub:
+    name = 'loop-stub'
+
+
+def test_prewarm_is_disabled_when_sdk_internals_are_missing(app, monkeypatch):
+    pool = app.StreamingClientPool('us-east-1', app.streaming_credentials, warm_interval=3600)
+    monkeypatch.setattr(pool, 'client_for', lambda runner: object())
+
+    app.loop_pool.runners[0].submit(pool._keep_warm(RunnerStub())).result(timeout=10)
+    assert pool.prewarm is False
+    assert pool.stats()['prewarm'] is False
+    assert pool.warm_errors == 0
@@ -0,0 +1,329 @@
+"""Gemini summarization with a stub model: map-reduce, caching, request coalescing and quota (429) handling"""
+
+import json
+import threading
+import time
+import types
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+
+class StubModel:
+    """Stands in for a GenerativeModel: records prompts, returns a deterministic note per prompt"""
+    def __init__(self, failures=0, release=None):
+        self.prompts = []
+        self.failures = failures
+        self.release = release
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            if self.failures:
+                self.failures -= 1
+                raise google_exceptions.ResourceExhausted('quota exceeded')
+        if self.release is not None:
+            self.release.wait(10)
+        if prompt.startswith('The following is part '):
+            return types.SimpleNamespace(text=f"notes {prompt.split()[4]}")
+        return types.SimpleNamespace(text='final summary')
+
+
+def test_map_reduce_summarize_keeps_chunk_order(app):
+    sentences = [f'Sentence number {index} is about topic {index % 7}. ' for index in range(400)]
+    transcript = ''.join(sentences)
+    model = StubModel()
+
+    summary, info = app.map_reduce_summarize(transcript, 'English', model, max_chunk_tokens=200, max_workers=4)
+
+    assert summary == 'final summary'
+    chunk_count = info['chunk_count']
+    assert chunk_count > 4
+    assert info['map_workers'] == 4
+    assert set(info['timings_seconds']) == {'split', 'map', 'reduce', 'total'}
+
+    map_prompts = [prompt for prompt in model.prompts if prompt.startswith('The following is part ')]
+    assert len(map_prompts) == chunk_count
+    # Every sentence lands in exactly one chunk, and no chunk is over budget
+    chunks = app.split_transcript(transcript, 200)
+    assert ''.join(chunks) == transcript
+    assert all(app.estimate_tokens(chunk) <= 200 for chunk in chunks)
+
+    # The reduce prompt lists each chunk's notes in transcript order
+    reduce_prompt = model.prompts[-1]
+    positions = [reduce_prompt.index(f'Notes for part {index} of {chunk_count}:\nnotes {index}\n')
+                 for index in range(1, chunk_count + 1)]
+    assert positions == sorted(positions)
+
+
+def test_map_reduce_custom_prompt_receives_notes(app):
+    model = StubModel()
+    summary, info = app.map_reduce_summarize('One. Two. Three. Four.', 'English', model,
+                                             custom_prompt='Summarize: {transcript}', max_chunk_tokens=2)
+    assert info['chunk_count'] == 4
+    assert model.prompts[-1].startswith('Summarize: Notes for part 1 of 4:\nnotes 1')
+
+
+def test_identical_requests_share_one_generation(app):
+    cache = app.SummaryCache(1024 * 1024, ttl=60)
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def generate():
+        calls.append(1)
+        release.wait(10)
+        return 'shared summary'
+
+    def request():
+        results.append(cache.get_or_generate('key', generate))
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Let the followers find the leader's in-flight entry before it finishes
+    while cache.coalesced < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(calls) == 1
+    assert sorted(cached for _, _, cached in results) == [False, True, True, True, True]
+    assert {summary for summary, _, _ in results} == {'shared summary'}
+    assert cache.stats()['in_flight'] == 0
+
+    # Later requests are served from the cache
+    assert cache.get_or_generate('key', generate)[2] is True
+    assert len(calls) == 1
+
+
+def test_failed_generation_is_not_cached(app):
+    cache = app.SummaryCache(1024 * 1024, ttl=60)
+
+    def failing():
+        raise RuntimeError('gemini down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_generate('key', failing)
+    assert cache.get_or_generate('key', lambda: 'recovered')[:1] == ('recovered',)
+
+
+def test_result_stored_before_the_lock_is_not_regenerated(app):
+    cache = app.SummaryCache(1024 * 1024, ttl=60)
+    lookup = cache.get
+    lookups = []
+
+    def get(key):
+        lookups.append(key)
+        if len(lookups) == 1:
+            # Another leader stores its summary right after this request's first miss
+            cache.put(key, 'leader summary', time.time())
+            return None
+        return lookup(key)
+
+    cache.get = get
+    summary, _, cached = cache.get_or_generate('key', lambda: pytest.fail('generated twice'))
+    assert (summary, cached) == ('leader summary', True)
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_expired_summary_is_regenerated(app):
+    cache = app.SummaryCache(1024 * 1024, ttl=60)
+    cache.put('key', 'stale summary', time.time() - 120)
+
+    summary, created_at, cached = cache.get_or_generate('key', lambda: 'fresh summary')
+    assert (summary, cached) == ('fresh summary', False)
+    assert time.time() - created_at < 5
+    assert cache.get('key')[0] == 'fresh summary'
+
+
+def test_summaries_persist_across_restarts(app, tmp_path):
+    db_path = str(tmp_path / 'summaries.db')
+    app.SummaryCache(1024 * 1024, ttl=60, db_path=db_path).get_or_generate('key', lambda: 'persisted summary')
+    app.SummaryCache(1024 * 1024, ttl=60, db_path=db_path).put('old', 'expired summary', time.time() - 120)
+
+    restarted = app.SummaryCache(1024 * 1024, ttl=60, db_path=db_path)
+    summary, _, cached = restarted.get_or_generate('key', lambda: pytest.fail('not served from disk'))
+    assert (summary, cached) == ('persisted summary', True)
+    assert restarted.get('old') is None
+    assert restarted.stats()['persistent'] is True
+
+
+def test_repeated_request_reports_cache_fields(app, monkeypatch):
+    calls = []
+
+    def generate(model_name, prompt):
+        calls.append(prompt)
+        return 'route summary'
+
+    monkeypatch.setattr(app, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(app.summarizer, 'generate', generate)
+    client = app.app.test_client()
+    request = {'transcript': f'A transcript summarized twice at {time.time()}.'}
+
+    first = client.post('/summarize-transcript', json=request).get_json()
+    second = client.post('/summarize-transcript', json=request).get_json()
+
+    assert len(calls) == 1
+    assert (first['cached'], first['cache_age_seconds']) == (False, 0)
+    assert second['cached'] is True
+    assert 0 <= second['cache_age_seconds'] < 5
+    assert second['summary'] == first['summary'] == 'route summary'
+
+
+def executor_with(app, model, **kwargs):
+    options = {'max_concurrency': 1, 'max_queue': 4, 'max_retries': 3, 'retry_base_delay': 0.0, **kwargs}
+    executor = app.SummarizationExecutor(**options)
+    executor.model = lambda model_name: model
+    return executor
+
+
+def test_quota_errors_are_retried(app):
+    model = StubModel(failures=2)
+    executor = executor_with(app, model)
+
+    response = executor.submit('gemini-test', 'Summarize this').result(timeout=10)
+    assert response.text == 'final summary'
+    assert len(model.prompts) == 3
+    assert executor.stats()['retries'] == 2
+    assert executor.stats()['completed'] == 1
+
+
+def test_quota_errors_give_up_after_max_retries(app):
+    model = StubModel(failures=10)
+    executor = executor_with(app, model, max_retries=2)
+
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        executor.submit('gemini-test', 'Summarize this').result(timeout=10)
+    assert len(model.prompts) == 3
+    assert executor.stats()['failed'] == 1
+
+
+def test_full_queue_raises_busy(app):
+    release = threading.Event()
+    executor = executor_with(app, StubModel(release=release), max_queue=2)
+    try:
+        futures = [executor.submit('gemini-test', 'Summarize this') for _ in range(2)]
+        # Wait until the first call holds the only slot and the second is queued
+        while executor.stats()['in_flight'] < 1:
+            threading.Event().wait(0.01)
+        futures.append(executor.submit('gemini-test', 'Summarize this'))
+
+        with pytest.raises(app.SummarizerBusy) as busy:
+            executor.submit('gemini-test', 'Summarize this')
+        assert busy.value.retry_after >= 1
+        assert executor.stats()['rejected'] == 1
+    finally:
+        release.set()
+    assert all(future.result(timeout=10).text == 'final summary' for future in futures)
+
+
+def test_busy_summarizer_returns_429(app, monkeypatch):
+    def busy(model_name, prompt):
+        raise app.SummarizerBusy(7)
+
+    monkeypatch.setattr(app, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(app.summarizer, 'generate', busy)
+    client = app.app.test_client()
+
+    response = client.post('/summarize-transcript', json={'transcript': 'A short transcript for a busy summarizer.'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '7'
+    assert response.get_json()['retry_after_seconds'] == 7
+
+
+def test_busy_map_stage_returns_429_before_streaming(app, monkeypatch):
+    def busy(model_name, prompt):
+        raise app.SummarizerBusy(5)
+
+    monkeypatch.setattr(app, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(app, 'SUMMARY_MAP_REDUCE_THRESHOLD', 10)
+    monkeypatch.setattr(app.summarizer, 'submit', busy)
+    client = app.app.test_client()
+
+    response = client.post('/summarize-transcript?stream=1',
+                           json={'transcript': f'A long transcript for a busy map stage at {time.time()}.'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '5'
+    assert response.mimetype == 'application/json'
+
+
+class StreamingStubModel:
+    def generate_content(self, prompt, stream=False):
+        assert stream
+        for text in ('Overall ', 'summary.'):
+            time.sleep(0.05)
+            yield types.SimpleNamespace(text=text)
+
+
+def test_streamed_summary_is_delivered_as_sse(app, monkeypatch):
+    monkeypatch.setattr(app, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(app.summarizer, 'model', lambda model_name: StreamingStubModel())
+    client = app.app.test_client()
+
+    response = client.post('/summarize-transcript?stream=1',
+                           json={'transcript': f'A transcript streamed at {time.time()}.'})
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    deltas = [json.loads(line[len('data: '):])['text'] for event in body.split('\n\n') if 'event: delta' in event
+              for line in event.split('\n') if line.startswith('data: ')]
+    assert ''.join(deltas) == 'Overall summary.'
+    assert 'event: done' in body
+
+
+def test_stream_ends_with_error_when_the_call_fails_before_streaming(app, monkeypatch):
+    def broken_model(model_name):
+        raise ValueError('unknown model')
+
+    monkeypatch.setattr(app, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(app.summarizer, 'model', broken_model)
+    client = app.app.test_client()
+
+    response = client.post('/summarize-transcript?stream=1',
+                           json={'transcript': f'A transcript for a broken model at {time.time()}.'})
+    body = response.get_data(as_text=True)
+    assert 'event: error' in body
+    assert 'unknown model' in body
+
+
+class EndlessStreamingModel:
+    def __init__(self):
+        self.chunks = 0
+
+    def generate_content(self, prompt, stream=False):
+        while True:
+            self.chunks += 1
+            time.sleep(0.01)
+            yield types.SimpleNamespace(text='more ')
+
+
+def test_cancelled_stream_releases_its_slot(app):
+    executor = app.SummarizationExecutor(max_concurrency=1, max_queue=4, max_retries=0, retry_base_delay=0.01)
+    model = EndlessStreamingModel()
+    executor.model = lambda model_name: model
+
+    events = executor.stream('stub', 'prompt')
+    assert app.wait_for_item(events, timeout=5) == ('delta', 'more ')
+    events.cancel()
+
+    # The next call gets the single slot once the cancelled stream stops
+    executor.model = lambda model_name: StubModel()
+    assert executor.generate('stub', 'summarize this') == 'final summary'
+    chunks = model.chunks
+    time.sleep(0.05)
+    assert model.chunks == chunks
+    assert executor.in_flight == 0
+
+
+def test_disconnected_sse_client_cancels_the_stream(app):
+    events = app.SummaryStream()
+    events.put(('delta', 'partial '))
+    stream = app.stream_summary('stub', 'prompt', f'disconnect-{time.time()}', {}, first_events=events)
+
+    assert 'event: delta' in next(stream)
+    stream.close()
+    assert events.cancelled.is_set()
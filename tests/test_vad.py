@@ -0,0 +1,102 @@
+"""VoiceActivityDetector on synthetic noise and tones"""
+
+import numpy as np
+import pytest
+
+from audio_processing import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+FRAME_BYTES = 640  # 20 ms
+
+
+def white_noise(db, seconds, seed=0):
+    samples = np.random.default_rng(seed).standard_normal(int(SAMPLE_RATE * seconds))
+    return samples / np.sqrt(np.mean(samples ** 2)) * 10 ** (db / 20)
+
+
+def pink_noise(db, seconds, seed=0):
+    count = int(SAMPLE_RATE * seconds)
+    spectrum = np.fft.rfft(np.random.default_rng(seed).standard_normal(count))
+    spectrum /= np.sqrt(np.maximum(np.arange(len(spectrum)), 1))
+    samples = np.fft.irfft(spectrum, count)
+    return samples / np.sqrt(np.mean(samples ** 2)) * 10 ** (db / 20)
+
+
+def tone(db, seconds, frequency=220):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return np.sqrt(2) * 10 ** (db / 20) * np.sin(2 * np.pi * frequency * t)
+
+
+def pcm(samples):
+    return np.round(np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def run(samples, chunk_bytes=3200, **options):
+    vad = VoiceActivityDetector(**options)
+    data = pcm(samples)
+    for offset in range(0, len(data), chunk_bytes):
+        vad.process(data[offset:offset + chunk_bytes])
+    return vad
+
+
+def forwarded_frames(samples, **options):
+    """Per 20 ms frame: whether the detector forwarded it"""
+    vad = VoiceActivityDetector(**options)
+    data = pcm(samples)
+    flags = []
+    for offset in range(0, len(data) - FRAME_BYTES + 1, FRAME_BYTES):
+        frame = data[offset:offset + FRAME_BYTES]
+        output = vad.process(frame)
+        flags.append(bool(output) and output.endswith(frame) and output != vad.silence_frame)
+    return np.array(flags)
+
+
+@pytest.mark.parametrize('db', [-60, -55, -50, -45, -40, -35, -30])
+def test_stationary_white_noise_is_suppressed(db):
+    assert run(white_noise(db, 30)).stats()['suppressed_ratio'] > 0.9
+
+
+@pytest.mark.parametrize('db', [-55, -46.8, -35])
+def test_stationary_pink_noise_is_suppressed(db):
+    assert run(pink_noise(db, 30)).stats()['suppressed_ratio'] > 0.9
+
+
+def test_keepalives_replace_suppressed_audio():
+    stats = run(white_noise(-50, 10), keepalive_ms=1000).stats()
+    assert 8 <= stats['keepalives_sent'] <= 10
+
+
+@pytest.mark.parametrize('noise_db', [-60, -45])
+def test_tone_bursts_over_noise_are_forwarded_and_gaps_dropped(noise_db):
+    on, off, cycles = 0.4, 1.6, 10
+    burst = np.concatenate([tone(-20, on), np.zeros(int(SAMPLE_RATE * off))])
+    samples = np.tile(burst, cycles) + white_noise(noise_db, (on + off) * cycles)
+
+    flags = forwarded_frames(samples)
+    frames_per_cycle = int((on + off) * 50)
+    cycles_flags = flags[:frames_per_cycle * cycles].reshape(cycles, frames_per_cycle)
+
+    # Skip the first cycle while the noise floor settles
+    assert cycles_flags[1:, :int(on * 50)].all()
+    # Gap beyond the 300 ms hangover (and the 200 ms pre-roll of the next burst) is dropped
+    assert not cycles_flags[1:, int(on * 50) + 20:frames_per_cycle - 15].any()
+
+
+def test_quiet_unvoiced_onset_is_kept_but_not_sustained_noise():
+    silence = white_noise(-70, 2)
+    fricative = white_noise(-42, 0.08, seed=1)  # 80 ms of hiss, clearly above the floor
+    samples = np.concatenate([silence, fricative, white_noise(-70, 1, seed=2)])
+    flags = forwarded_frames(samples, threshold_db=-35, preroll_ms=0, hangover_ms=0)
+    onset = slice(100, 104)
+    assert flags[onset].all()
+
+    # The same hiss sustained only passes for the onset window, not for seconds
+    sustained = np.concatenate([silence, white_noise(-42, 3, seed=1)])
+    flags = forwarded_frames(sustained, threshold_db=-35, preroll_ms=0, hangover_ms=0)
+    assert flags[100:].sum() <= 5
+
+
+def test_whole_chunk_fast_path_returns_original_bytes():
+    chunk = pcm(tone(-20, 0.2))
+    vad = VoiceActivityDetector()
+    assert vad.process(chunk) is chunk